@@ -0,0 +1,114 @@
+import math
+import time
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivfpq", "hnsw", "sq8")
+EXACT_INDEX_NAME = "exact.faiss"
+REPORT_NAME = "build_report.json"
+
+
+def default_build_params(index_type, n_vectors, dimension):
+    """Reasonable starting parameters for a corpus of ``n_vectors``; every value can be overridden"""
+    if index_type == "ivfpq":
+        nlist = max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39 or 1))
+        m = next(m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if dimension % m == 0)
+        return {"nlist": nlist, "m": m, "nbits": 8}
+    if index_type == "hnsw":
+        return {"M": 32, "efConstruction": 200}
+    return {}
+
+
+def default_search_params(index_type, build_params):
+    if index_type == "ivfpq":
+        return {"nprobe": max(1, int(math.sqrt(build_params["nlist"])))}
+    if index_type == "hnsw":
+        return {"efSearch": 64}
+    return {}
+
+
+def build_ann_index(vectors, index_type, params):
+    """Create and fill an index of ``index_type`` from an (n, d) float32 array, using L2 like the flat index"""
+    n_vectors, dimension = vectors.shape
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "ivfpq":
+        if n_vectors < max(params["nlist"], 2 ** params["nbits"]):
+            raise ValueError(
+                f"ivfpq needs at least {max(params['nlist'], 2 ** params['nbits'])} vectors to train, got {n_vectors}"
+            )
+        quantizer = faiss.IndexFlatL2(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, params["nlist"], params["m"], params["nbits"])
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["M"])
+        index.hnsw.efConstruction = params["efConstruction"]
+    elif index_type == "sq8":
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit)
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def apply_search_params(index, search_params):
+    """Set query-time knobs (nprobe, efSearch) on a loaded index; unknown ones are ignored"""
+    if not search_params:
+        return
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and "nprobe" in search_params:
+        ivf.nprobe = int(search_params["nprobe"])
+    if hasattr(index, "hnsw") and "efSearch" in search_params:
+        index.hnsw.efSearch = int(search_params["efSearch"])
+
+
+def index_vectors(index):
+    """All vectors of an exact (flat) index as an (n, d) float32 array"""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def index_memory_bytes(index):
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _latencies_ms(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return np.array(latencies), results
+
+
+def _percentiles(latencies):
+    return {
+        "p50": round(float(np.percentile(latencies, 50)), 4),
+        "p99": round(float(np.percentile(latencies, 99)), 4),
+    }
+
+
+def compare_with_exact(exact_index, ann_index, k=10, n_queries=200, seed=0):
+    """Recall@k of ``ann_index`` against the exact index, plus single-query latency and memory for both"""
+    vectors = index_vectors(exact_index)
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+    # Perturb the probes so they are not exact copies of stored vectors
+    queries = (sample + rng.normal(0, 0.01, sample.shape)).astype("float32")
+    k = min(k, exact_index.ntotal)
+
+    exact_latencies, exact_ids = _latencies_ms(exact_index, queries, k)
+    ann_latencies, ann_ids = _latencies_ms(ann_index, queries, k)
+    hits = sum(len(set(truth) & set(found)) for truth, found in zip(exact_ids, ann_ids))
+
+    return {
+        "k": k,
+        "queries": len(queries),
+        "recall_at_k": round(hits / (k * len(queries)), 4),
+        "latency_ms": {"exact": _percentiles(exact_latencies), "ann": _percentiles(ann_latencies)},
+        "memory_bytes": {"exact": index_memory_bytes(exact_index), "ann": index_memory_bytes(ann_index)},
+    }
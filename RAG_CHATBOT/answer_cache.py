@@ -0,0 +1,196 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import faiss
+import numpy as np
+
+
+def document_ids(docs):
+    """Stable IDs for retrieved chunks: the docstore ID when present, else a content hash"""
+    ids = []
+    for doc in docs:
+        doc_id = getattr(doc, "id", None)
+        if not doc_id:
+            doc_id = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+        ids.append(str(doc_id))
+    return ids
+
+
+def _as_unit_vector(vector):
+    array = np.asarray(vector, dtype="float32").reshape(1, -1).copy()
+    faiss.normalize_L2(array)
+    return array
+
+
+class InMemoryAnswerStore:
+    """Process-local answer store; entries vanish on restart"""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, entry_id):
+        return self._entries.get(entry_id)
+
+    def put(self, entry_id, entry):
+        self._entries[entry_id] = entry
+
+    def delete(self, entry_id):
+        self._entries.pop(entry_id, None)
+
+    def load(self):
+        return []
+
+
+class MongoAnswerStore:
+    """Answer store backed by a Mongo collection with a TTL index, so expired answers are purged server-side"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index("expires_on", expireAfterSeconds=0)
+
+    def get(self, entry_id):
+        return self.collection.find_one({"_id": entry_id}, {"vector": 0})
+
+    def put(self, entry_id, entry):
+        document = dict(entry, _id=entry_id)
+        document["expires_on"] = datetime.fromtimestamp(entry["expires_at"], tz=timezone.utc)
+        self.collection.replace_one({"_id": entry_id}, document, upsert=True)
+
+    def delete(self, entry_id):
+        self.collection.delete_one({"_id": entry_id})
+
+    def load(self):
+        """Unexpired entries with their vectors, used to rebuild the in-process indexes at startup"""
+        return list(self.collection.find({"expires_at": {"$gt": time.time()}}))
+
+
+class SemanticAnswerCache:
+    """Reuse a generated answer when a new query is close enough to a cached one.
+
+    Each domain gets a small FAISS inner-product index over unit-normalized query
+    vectors, so scores are cosine similarities. A lookup only hits when the
+    cosine distance is within ``max_distance`` and the retrieved chunk IDs are
+    identical, i.e. the model would have seen the same context.
+    """
+
+    def __init__(self, store=None, max_distance=0.05, ttl_seconds=3600, max_entries=1000, neighbours=5):
+        self.store = store or InMemoryAnswerStore()
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.neighbours = neighbours
+        self._indexes = {}
+        self._order = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+        self.latency_saved_seconds = 0.0
+
+        for entry in self.store.load():
+            self._add_vector(entry["domain"], entry["_id"], entry["vector"])
+
+    def _domain_index(self, domain, dim):
+        index = self._indexes.get(domain)
+        if index is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+            self._indexes[domain] = index
+            self._order[domain] = OrderedDict()
+        return index
+
+    def _add_vector(self, domain, entry_id, vector):
+        unit = _as_unit_vector(vector)
+        with self._lock:
+            index = self._domain_index(domain, unit.shape[1])
+            index.add_with_ids(unit, np.array([entry_id], dtype="int64"))
+            self._order[domain][entry_id] = None
+
+    def _remove(self, domain, entry_id):
+        with self._lock:
+            index = self._indexes.get(domain)
+            if index is not None:
+                index.remove_ids(np.array([entry_id], dtype="int64"))
+                self._order[domain].pop(entry_id, None)
+        self.store.delete(entry_id)
+
+    def lookup(self, domain, vector, chunk_ids):
+        """Return the cached entry for a near-identical query with the same context, or None"""
+        unit = _as_unit_vector(vector)
+        with self._lock:
+            index = self._indexes.get(domain)
+            if index is None or index.ntotal == 0:
+                self.misses += 1
+                return None
+            scores, ids = index.search(unit, min(self.neighbours, index.ntotal))
+
+        now = time.time()
+        for score, entry_id in zip(scores[0], ids[0]):
+            if entry_id < 0 or 1.0 - float(score) > self.max_distance:
+                break
+            entry_id = int(entry_id)
+            entry = self.store.get(entry_id)
+            if entry is None or entry["expires_at"] <= now:
+                self._remove(domain, entry_id)
+                continue
+            if entry["chunk_ids"] != list(chunk_ids):
+                continue
+            with self._lock:
+                self._order[domain].move_to_end(entry_id, last=True)
+                self.hits += 1
+                self.latency_saved_seconds += entry.get("generation_seconds", 0.0)
+            return entry
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def add(self, domain, query, vector, chunk_ids, answer, generation_seconds):
+        """Cache an answer generated for ``query`` from the chunks in ``chunk_ids``"""
+        entry_id = secrets.randbits(63)
+        now = time.time()
+        entry = {
+            "domain": domain,
+            "query": query,
+            "answer": answer,
+            "chunk_ids": list(chunk_ids),
+            "vector": [float(x) for x in vector],
+            "generation_seconds": generation_seconds,
+            "created_at": now,
+            "expires_at": now + self.ttl_seconds,
+        }
+        self.store.put(entry_id, entry)
+        self._add_vector(domain, entry_id, vector)
+
+        with self._lock:
+            self.stores += 1
+            order = self._order[domain]
+            overflow = list(order)[: max(0, len(order) - self.max_entries)]
+        for old_id in overflow:
+            self._remove(domain, old_id)
+            with self._lock:
+                self.evictions += 1
+        return entry_id
+
+    def note_bypass(self):
+        with self._lock:
+            self.bypassed += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": {domain: index.ntotal for domain, index in self._indexes.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+            }
@@ -0,0 +1,33 @@
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+
+def search_many(retriever, vectors, k=3):
+    """Top-k documents for every query vector, using one multi-vector FAISS search when possible.
+
+    Anything that is not a LangChain FAISS store (e.g. the federated retriever)
+    is searched one vector at a time.
+    """
+    if not vectors:
+        return []
+    if not isinstance(retriever, FAISS):
+        return [retriever.similarity_search_by_vector(vector, k=k) for vector in vectors]
+
+    matrix = np.asarray(vectors, dtype="float32")
+    if getattr(retriever, "_normalize_L2", False):
+        import faiss
+        faiss.normalize_L2(matrix)
+    _, positions = retriever.index.search(matrix, k)
+
+    results = []
+    for row in positions:
+        docs = []
+        for position in row:
+            if position == -1:
+                # Fewer than k vectors in the index (or an IVF probe came back short)
+                continue
+            doc = retriever.docstore.search(retriever.index_to_docstore_id[int(position)])
+            if not isinstance(doc, str):
+                docs.append(doc)
+        results.append(docs)
+    return results
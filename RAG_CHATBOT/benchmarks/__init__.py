@@ -0,0 +1,15 @@
+"""Offline benchmarks for retrieval and for the Flask endpoints.
+
+Run from the RAG_CHATBOT folder:
+
+    python -m benchmarks retrieval --docs 20000 --index-types flat hnsw ivfpq --out results/retrieval.json
+    python -m benchmarks load --concurrency 16 --duration 30 --out results/load.json
+    python -m benchmarks sessions --out results/sessions.json
+    python -m benchmarks startup --web-workers 4 --out results/startup.json
+    python -m benchmarks compare results/baseline.json results/load.json --threshold 0.15
+
+Everything runs without network access: corpora are generated (or read from a
+folder of PDFs/CSVs) and indexed through index_builder, queries are embedded
+with HashingEmbeddings unless --embedding-provider huggingface is passed, the
+model is the FakeLLM and MongoDB is replaced by mongomock.
+"""
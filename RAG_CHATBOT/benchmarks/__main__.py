@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from ann_index import INDEX_TYPES
+from benchmarks.corpus import generate_corpus, generate_queries, sample_corpus
+from benchmarks.load import run_load, start_local_app
+from benchmarks.report import compare_results, run_metadata, save_results
+from domains import DOMAIN_INDEXES
+from embedding_cache import FAKE_EMBEDDING_MODEL, create_embedder
+from index_builder import DEFAULT_EMBEDDING_MODEL, build_index_incrementally
+from ingest import load_file_chunks
+
+
+def _corpus(args, workdir):
+    if args.source_dir:
+        return sample_corpus(args.source_dir)
+    return generate_corpus(
+        os.path.join(workdir, "corpus"), n_docs=args.docs, n_files=args.files,
+        words_per_doc=args.words_per_doc, seed=args.seed,
+    )
+
+
+def _embedder(args):
+    if args.embedding_provider == "fake":
+        return create_embedder("fake"), FAKE_EMBEDDING_MODEL
+    return create_embedder("huggingface", args.model), args.model
+
+
+def retrieval_command(args):
+    from benchmarks.retrieval import run_retrieval
+
+    with tempfile.TemporaryDirectory(prefix="bench-retrieval-", dir=args.workdir) as workdir:
+        source_files = _corpus(args, workdir)
+        embedder, model_name = _embedder(args)
+        build_params = {key: value for key, value in (("nlist", args.nlist), ("M", args.hnsw_m)) if value}
+        search_params = {key: value for key, value in (("nprobe", args.nprobe), ("efSearch", args.ef_search)) if value}
+        results = run_retrieval(
+            workdir,
+            source_files,
+            embedder,
+            model_name,
+            args.index_types,
+            generate_queries(args.queries, seed=args.seed + 1),
+            k=args.k,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            build_params=build_params or None,
+            search_params=search_params or None,
+        )
+    return {"retrieval": results}
+
+
+def load_command(args):
+    if args.url:
+        return {"load": {f"c{c}": _run_load(args, args.url, c) for c in args.concurrency}}
+
+    with tempfile.TemporaryDirectory(prefix="bench-load-", dir=args.workdir) as workdir:
+        index_dir = os.path.join(workdir, "index")
+        embedder, model_name = _embedder(args)
+        if args.embedding_provider != "fake":
+            os.environ["EMBEDDING_PROVIDER"] = "huggingface"
+        build_index_incrementally(
+            index_dir, _corpus(args, workdir), load_file_chunks, embedder, model_name,
+            batch_size=args.batch_size, workers=args.workers,
+        )
+        base_url, stop = start_local_app(
+            {domain: index_dir for domain in DOMAIN_INDEXES}, fake_llm_delay=args.fake_llm_delay
+        )
+        try:
+            return {"load": {f"c{c}": _run_load(args, base_url, c) for c in args.concurrency}}
+        finally:
+            stop()
+
+
+def _run_load(args, base_url, concurrency):
+    return run_load(
+        base_url,
+        concurrency=concurrency,
+        duration=args.duration,
+        max_requests=args.max_requests,
+        mix=args.mix,
+        domains=args.domains,
+        turns_per_session=args.turns_per_session,
+        seed=args.seed,
+    )
+
+
+def sessions_command(args):
+    from benchmarks.sessions import run_sessions
+
+    return {"sessions": run_sessions(
+        args.backends,
+        users=args.users,
+        requests_per_user=args.requests_per_user,
+        mongo_latency_ms=args.mongo_latency_ms,
+        cache_ttl=args.cache_ttl,
+    )}
+
+
+def startup_command(args):
+    from benchmarks.startup import run_startup
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-", dir=args.workdir) as workdir:
+        index_dir = os.path.join(workdir, "index")
+        embedder, model_name = _embedder(args)
+        build_index_incrementally(
+            index_dir, _corpus(args, workdir), load_file_chunks, embedder, model_name,
+            batch_size=args.batch_size, workers=args.workers,
+        )
+        os.environ["EMBEDDING_PROVIDER"] = args.embedding_provider
+        return {"startup": run_startup(
+            {domain: index_dir for domain in DOMAIN_INDEXES},
+            generate_queries(args.queries, seed=args.seed + 1),
+            workers=args.web_workers,
+            modes=args.modes,
+        )}
+
+
+def compare_command(args):
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, "r", encoding="utf-8") as f:
+        current = json.load(f)
+    regressions, rows = compare_results(baseline, current, args.threshold)
+    for row in rows:
+        marker = "❌" if row in regressions else "  "
+        print(f"{marker} {row['metric']}: {row['baseline']} -> {row['current']} ({row['change']:+.1%})")
+    if regressions:
+        print(f"❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print(f"✅ No metric regressed by more than {args.threshold:.0%}")
+    return 0
+
+
+def _add_corpus_arguments(parser):
+    parser.add_argument("--source-dir", help="benchmark a folder of PDFs/CSVs instead of a synthetic corpus")
+    parser.add_argument("--docs", type=int, default=5000, help="synthetic documents to generate")
+    parser.add_argument("--files", type=int, default=20, help="synthetic CSV files to spread them over")
+    parser.add_argument("--words-per-doc", type=int, default=80)
+    parser.add_argument("--embedding-provider", choices=("fake", "huggingface"), default="fake",
+                        help="fake = HashingEmbeddings (offline); huggingface needs the model locally")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL, help="model for --embedding-provider huggingface")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=1, help="ingestion parser processes")
+    parser.add_argument("--workdir", default=None, help="where temporary corpora and indexes are written")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results JSON here (default: print it)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Offline retrieval and load benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    retrieval = commands.add_parser("retrieval", help="index build/load time, search latency, recall and memory")
+    _add_corpus_arguments(retrieval)
+    retrieval.add_argument("--index-types", nargs="+", choices=INDEX_TYPES, default=["flat", "hnsw", "sq8", "ivfpq"])
+    retrieval.add_argument("--queries", type=int, default=200)
+    retrieval.add_argument("-k", type=int, default=10)
+    retrieval.add_argument("--nlist", type=int)
+    retrieval.add_argument("--hnsw-m", type=int)
+    retrieval.add_argument("--nprobe", type=int)
+    retrieval.add_argument("--ef-search", type=int)
+    retrieval.set_defaults(func=retrieval_command)
+
+    load = commands.add_parser("load", help="req/s and latency percentiles for /chat and the history endpoints")
+    _add_corpus_arguments(load)
+    load.add_argument("--url", help="load-test a running server instead of an in-process app with stubs")
+    load.add_argument("--concurrency", type=int, nargs="+", default=[8], help="one run per concurrency level")
+    load.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency level")
+    load.add_argument("--max-requests", type=int, default=0, help="stop each user after this many requests")
+    load.add_argument("--mix", default="chat=1,history=1,sessions=1", help="endpoint weights")
+    load.add_argument("--domains", nargs="+", default=["home"], choices=sorted(DOMAIN_INDEXES))
+    load.add_argument("--turns-per-session", type=int, default=20)
+    load.add_argument("--fake-llm-delay", type=float, default=0.05, help="seconds the stub model sleeps per answer")
+    load.set_defaults(func=load_command)
+
+    sessions = commands.add_parser("sessions", help="per-request session cost and MongoDB round trips per backend")
+    sessions.add_argument("--backends", nargs="+", choices=("mongo-uncached", "mongo", "cookie"),
+                          default=["mongo-uncached", "mongo", "cookie"])
+    sessions.add_argument("--users", type=int, default=50)
+    sessions.add_argument("--requests-per-user", type=int, default=40)
+    sessions.add_argument("--mongo-latency-ms", type=float, default=0.5, help="simulated round trip per MongoDB call")
+    sessions.add_argument("--cache-ttl", type=float, default=5.0)
+    sessions.add_argument("--seed", type=int, default=0)
+    sessions.add_argument("--out", help="write results JSON here (default: print it)")
+    sessions.set_defaults(func=sessions_command)
+
+    startup = commands.add_parser("startup", help="import/first-request time and memory per forked worker")
+    _add_corpus_arguments(startup)
+    startup.add_argument("--web-workers", type=int, default=4, help="worker processes to fork")
+    startup.add_argument("--modes", nargs="+", choices=("lazy", "preload"), default=["lazy", "preload"])
+    startup.add_argument("--queries", type=int, default=20, help="searches per domain in each worker")
+    startup.set_defaults(func=startup_command)
+
+    compare = commands.add_parser("compare", help="exit non-zero when a metric regressed past the threshold")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression (0.1 = 10%%)")
+    compare.set_defaults(func=compare_command)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "workdir", None):
+        os.makedirs(args.workdir, exist_ok=True)
+    if args.command == "compare":
+        return args.func(args)
+    results = {"meta": run_metadata(args), **args.func(args)}
+    save_results(results, args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import csv
+import os
+import random
+
+from index_builder import collect_source_files
+
+# Word pools for the synthetic topics; queries are drawn from the same pools
+TOPICS = {
+    "tax": "tax gst income return deduction filing slab refund audit invoice assessment rebate",
+    "contract": "contract clause breach party agreement liability indemnity termination notice arbitration",
+    "heart": "heart cardiac blood pressure artery cholesterol pulse stroke rhythm valve",
+    "diabetes": "diabetes insulin glucose sugar pancreas diet obesity metformin retinopathy",
+    "network": "network router packet latency bandwidth protocol tcp firewall switch dns",
+    "cloud": "cloud server container kubernetes deployment scaling storage cluster region",
+    "exam": "exam syllabus semester grade marks admission scholarship course university",
+    "research": "research paper citation journal hypothesis experiment dataset peer review",
+    "loan": "loan interest emi mortgage credit score repayment bank collateral tenure",
+    "invest": "investment mutual fund equity portfolio dividend stock bond risk return",
+}
+FILLER = "the a of and to in for with on is are was this that by from as at be which also".split()
+
+
+def generate_corpus(source_dir, n_docs=5000, n_files=20, words_per_doc=80, seed=0):
+    """Write ``n_docs`` synthetic rows spread over ``n_files`` CSVs; returns {relative path: path}"""
+    rng = random.Random(seed)
+    os.makedirs(source_dir, exist_ok=True)
+    topics = sorted(TOPICS)
+    per_file = max(1, -(-n_docs // n_files))
+    written = 0
+    for file_number in range(n_files):
+        rows = min(per_file, n_docs - written)
+        if rows <= 0:
+            break
+        path = os.path.join(source_dir, f"synthetic_{file_number:04d}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["topic", "title", "body"])
+            for _ in range(rows):
+                topic = rng.choice(topics)
+                pool = TOPICS[topic].split()
+                words = [rng.choice(pool) if rng.random() < 0.4 else rng.choice(FILLER) for _ in range(words_per_doc)]
+                writer.writerow([topic, f"{topic} note {written}", " ".join(words)])
+                written += 1
+    return collect_source_files(source_dir, (".csv",))
+
+
+def sample_corpus(source_dir):
+    """Use an existing folder of PDFs and CSVs as the corpus"""
+    from ingest import LOADERS
+    return collect_source_files(source_dir, tuple(LOADERS))
+
+
+def generate_queries(n_queries=200, words=4, seed=1):
+    rng = random.Random(seed)
+    topics = sorted(TOPICS)
+    queries = []
+    for _ in range(n_queries):
+        pool = TOPICS[rng.choice(topics)].split()
+        queries.append(" ".join(rng.sample(pool, min(words, len(pool)))))
+    return queries
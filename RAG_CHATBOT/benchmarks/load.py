@@ -0,0 +1,199 @@
+import json
+import os
+import random
+import threading
+import time
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from benchmarks.corpus import generate_queries
+from benchmarks.report import latency_summary
+
+ENDPOINTS = {
+    "chat": "/chat",
+    "history": "/get_session_history",
+    "sessions": "/get_all_sessions",
+}
+
+
+def start_local_app(index_dirs, fake_llm_delay=0.05, history_bucket_size=100):
+    """Serve flaskapp on a free local port with FakeLLM, HashingEmbeddings and mongomock; returns (url, stop)"""
+    import mongomock
+    import pymongo
+
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("EMBEDDING_PROVIDER", "fake")
+    os.environ.setdefault("FAKE_LLM_DELAY", str(fake_llm_delay))
+    os.environ.setdefault("HISTORY_BUCKET_SIZE", str(history_bucket_size))
+    os.environ.setdefault("MONGO_ENSURE_INDEXES", "false")
+    os.environ.setdefault("WARMUP_VECTORSTORES", "false")
+    # flaskapp creates its MongoClient on first use, so the stand-in must be in place before any request
+    pymongo.MongoClient = mongomock.MongoClient
+
+    from domains import DOMAIN_INDEXES
+    DOMAIN_INDEXES.update(index_dirs)
+
+    import flaskapp
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, flaskapp.create_app(), threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, name="benchmark-server", daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        thread.join()
+
+    return f"http://127.0.0.1:{server.server_port}", stop
+
+
+class Client:
+    """One simulated user with its own cookie jar (and so its own Flask session)"""
+
+    def __init__(self, base_url, timeout=120):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+
+    def post(self, path, payload):
+        """Return (status, body, milliseconds); network errors are reported as status 0"""
+        request = Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                status, body = response.status, response.read()
+        except HTTPError as e:
+            status, body = e.code, e.read()
+        except URLError as e:
+            status, body = 0, str(e).encode("utf-8")
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        try:
+            body = json.loads(body)
+        except ValueError:
+            pass
+        return status, body, elapsed_ms
+
+    def log_in(self, email, password="benchmark-password"):
+        self.post("/signup", {"firstname": "Bench", "email": email, "password": password})
+        status, body, _ = self.post("/login", {"email": email, "password": password})
+        if status != 200 or not body.get("success"):
+            raise RuntimeError(f"could not log in as {email}: {status} {body}")
+
+
+def _parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r} in mix; choose from {sorted(ENDPOINTS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _worker(number, client, domains, mix, deadline, max_requests, turns_per_session, queries, samples, seed):
+    rng = random.Random(seed + number)
+    names, weights = zip(*mix.items())
+    domain = domains[number % len(domains)]
+    session_id = None
+    turns = 0
+    sent = 0
+    while time.perf_counter() < deadline and (not max_requests or sent < max_requests):
+        if session_id is None or turns >= turns_per_session:
+            _, body, _ = client.post("/create_new_session", {"domain": domain})
+            session_id = body.get("session_id") if isinstance(body, dict) else None
+            turns = 0
+        name = rng.choices(names, weights)[0]
+        if name == "chat":
+            payload = {"domain": domain, "session_id": session_id, "query": rng.choice(queries)}
+            turns += 1
+        elif name == "history":
+            payload = {"domain": domain, "session_id": session_id, "limit": 50}
+        else:
+            payload = {"domain": domain, "limit": 50}
+        status, body, elapsed_ms = client.post(ENDPOINTS[name], payload)
+        ok = status == 200 and not (isinstance(body, dict) and body.get("error"))
+        samples.append((name, ok, elapsed_ms))
+        sent += 1
+
+
+def run_load(base_url, concurrency=8, duration=30.0, max_requests=0, mix="chat=1,history=1,sessions=1",
+             domains=("home",), turns_per_session=20, n_queries=200, seed=0):
+    """Drive the endpoints from ``concurrency`` users for ``duration`` seconds; returns req/s and latency per endpoint"""
+    weights = _parse_mix(mix)
+    queries = generate_queries(n_queries, seed=seed)
+    samples = []
+    errors = []
+    clock = {}
+
+    def start_clock():
+        clock["start"] = time.perf_counter()
+        clock["deadline"] = clock["start"] + duration
+
+    # Signup and login hash passwords on purpose slowly; every user logs in before the clock starts
+    ready = threading.Barrier(concurrency + 1, action=start_clock)
+
+    def run(number):
+        try:
+            client = Client(base_url)
+            client.log_in(f"bench-{seed}-{number}@example.com")
+        except Exception as e:
+            errors.append(f"worker {number}: {e}")
+            ready.abort()
+            return
+        try:
+            ready.wait()
+        except threading.BrokenBarrierError:
+            return
+        try:
+            _worker(number, client, list(domains), weights, clock["deadline"], max_requests,
+                    turns_per_session, queries, samples, seed)
+        except Exception as e:
+            errors.append(f"worker {number}: {e}")
+
+    threads = [threading.Thread(target=run, args=(number,), daemon=True) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    try:
+        ready.wait()
+    except threading.BrokenBarrierError:
+        for thread in threads:
+            thread.join()
+        raise RuntimeError(f"users could not log in: {errors}")
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - clock["start"]
+    for error in errors:
+        print(f"❌ {error}")
+
+    def summarize(selected):
+        ok = [ms for _, passed, ms in selected if passed]
+        return {
+            "requests": len(selected),
+            "errors": len(selected) - len(ok),
+            "ok_ratio": round(len(ok) / len(selected), 4) if selected else 0.0,
+            "requests_per_second": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+            "latency": latency_summary(ok),
+        }
+
+    result = {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "total": summarize(samples),
+        "endpoints": {name: summarize([s for s in samples if s[0] == name]) for name in weights},
+    }
+    print(
+        f"🚦 concurrency {concurrency}: {result['total']['requests_per_second']} req/s, "
+        f"p50 {result['total']['latency'].get('p50_ms')}ms, p99 {result['total']['latency'].get('p99_ms')}ms, "
+        f"{result['total']['errors']} errors"
+    )
+    return result
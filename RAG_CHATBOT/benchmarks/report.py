@@ -0,0 +1,90 @@
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+
+# Metric name suffixes where a bigger number is an improvement; everything else numeric is a cost
+HIGHER_IS_BETTER = ("recall_at_k", "requests_per_second", "chunks_per_second", "documents_per_second", "ok_ratio")
+# Bookkeeping fields that describe the run rather than measure it
+IGNORED = ("k", "seconds", "queries", "vectors", "dimension", "requests", "errors", "workers", "concurrency", "docs", "chunks", "documents")
+
+
+def latency_summary(samples_ms):
+    """p50/p90/p99/mean/max in milliseconds for a list of samples"""
+    if not samples_ms:
+        return {}
+    values = np.asarray(samples_ms, dtype="float64")
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "mean_ms": round(float(values.mean()), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def current_rss_bytes():
+    """Resident set size of this process, falling back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_metadata(args):
+    return {
+        "created_at": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "args": {key: value for key, value in vars(args).items() if key != "func"},
+    }
+
+
+def save_results(results, path):
+    if not path:
+        print(json.dumps(results, indent=2))
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"💾 Results written to {path}")
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, keeping only numeric measurements"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if key == "meta":
+            continue
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in IGNORED:
+            flat[name] = value
+    return flat
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """Return (regressions, rows) for every metric present in both runs; a regression is worse by > threshold"""
+    old, new = flatten(baseline), flatten(current)
+    regressions = []
+    rows = []
+    for name in sorted(set(old) & set(new)):
+        before, after = old[name], new[name]
+        if before == 0:
+            continue
+        change = (after - before) / abs(before)
+        higher_is_better = name.endswith(HIGHER_IS_BETTER)
+        worse = -change if higher_is_better else change
+        row = {"metric": name, "baseline": before, "current": after, "change": round(change, 4)}
+        rows.append(row)
+        if worse > threshold:
+            regressions.append(row)
+    return regressions, rows
@@ -0,0 +1,133 @@
+import os
+import time
+
+from langchain_community.vectorstores import FAISS
+
+from ann_index import apply_search_params, index_memory_bytes
+from answer_cache import document_ids
+from benchmarks.report import current_rss_bytes, latency_summary
+from index_builder import build_index_incrementally, load_manifest
+from ingest import load_file_chunks
+from mmap_docstore import convert_index, load_mmap_vectorstore
+
+
+def _timed_ms(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _load(index_dir, embedder, mmap):
+    if mmap:
+        vectorstore = load_mmap_vectorstore(index_dir, embedder)
+    else:
+        vectorstore = FAISS.load_local(index_dir, embedder, allow_dangerous_deserialization=True)
+    manifest = load_manifest(index_dir) or {}
+    apply_search_params(vectorstore.index, manifest.get("index", {}).get("search"))
+    return vectorstore
+
+
+def benchmark_index(index_dir, source_files, embedder, model_name, index_type, queries, k=10,
+                    batch_size=64, workers=1, build_params=None, search_params=None, truth=None):
+    """Build, load and query one index; ``truth`` maps query -> exact top-k chunk IDs for recall"""
+    rss_before = current_rss_bytes()
+    summary, build_ms = _timed_ms(
+        build_index_incrementally,
+        index_dir,
+        source_files,
+        load_file_chunks,
+        embedder,
+        model_name,
+        batch_size=batch_size,
+        workers=workers,
+        index_type=index_type,
+        build_params=build_params,
+        search_params=search_params,
+        report_k=k,
+    )
+    _, convert_ms = _timed_ms(convert_index, index_dir)
+
+    vectorstore, load_ms = _timed_ms(_load, index_dir, embedder, False)
+    mmap_vectorstore, mmap_load_ms = _timed_ms(_load, index_dir, embedder, True)
+
+    query_vectors = {}
+    embed_ms = []
+    for query in queries:
+        query_vectors[query], elapsed = _timed_ms(embedder.embed_query, query)
+        embed_ms.append(elapsed)
+
+    search_ms, mmap_search_ms, end_to_end_ms = [], [], []
+    found = {}
+    for query in queries:
+        docs, elapsed = _timed_ms(vectorstore.similarity_search_by_vector, query_vectors[query], k=k)
+        search_ms.append(elapsed)
+        found[query] = document_ids(docs)
+        _, elapsed = _timed_ms(mmap_vectorstore.similarity_search_by_vector, query_vectors[query], k=k)
+        mmap_search_ms.append(elapsed)
+        _, elapsed = _timed_ms(vectorstore.similarity_search, query, k=k)
+        end_to_end_ms.append(elapsed)
+
+    result = {
+        "index_type": index_type,
+        # Falls back to "flat" when the corpus is too small to train the requested index
+        "served_type": (load_manifest(index_dir) or {}).get("index", {}).get("type", "flat"),
+        "vectors": int(vectorstore.index.ntotal),
+        "dimension": int(vectorstore.index.d),
+        "build_seconds": round(build_ms / 1000, 3),
+        "chunks_per_second": summary.get("chunks_per_second", 0),
+        "mmap_convert_seconds": round(convert_ms / 1000, 3),
+        "load_seconds": round(load_ms / 1000, 3),
+        "mmap_load_seconds": round(mmap_load_ms / 1000, 3),
+        "query_embedding": latency_summary(embed_ms),
+        "similarity_search": latency_summary(search_ms),
+        "similarity_search_mmap": latency_summary(mmap_search_ms),
+        "similarity_search_with_embedding": latency_summary(end_to_end_ms),
+        "memory": {
+            "index_bytes": index_memory_bytes(vectorstore.index),
+            "disk_bytes": sum(
+                os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir)
+            ),
+            "rss_growth_bytes": max(0, current_rss_bytes() - rss_before),
+        },
+    }
+    if truth is not None:
+        hits = sum(len(set(truth[query]) & set(found[query])) for query in queries)
+        expected = sum(len(truth[query]) for query in queries)
+        result["recall_at_k"] = round(hits / expected, 4) if expected else 1.0
+    mmap_vectorstore.docstore.close()
+    return result, found
+
+
+def run_retrieval(workdir, source_files, embedder, model_name, index_types, queries, k=10,
+                  batch_size=64, workers=1, build_params=None, search_params=None):
+    """Benchmark every index type over the same corpus; recall is measured against the flat index"""
+    results = {}
+    truth = None
+    # The exact index always runs first so the others have ground truth
+    ordered = ["flat"] + [index_type for index_type in index_types if index_type != "flat"]
+    for index_type in ordered:
+        print(f"🏗️ Benchmarking {index_type} index")
+        result, found = benchmark_index(
+            os.path.join(workdir, index_type),
+            source_files,
+            embedder,
+            model_name,
+            index_type,
+            queries,
+            k=k,
+            batch_size=batch_size,
+            workers=workers,
+            build_params=build_params if index_type != "flat" else None,
+            search_params=search_params if index_type != "flat" else None,
+            truth=truth,
+        )
+        if truth is None:
+            truth = found
+            result["recall_at_k"] = 1.0
+        results[index_type] = result
+        print(
+            f"📊 {index_type}: build {result['build_seconds']}s, load {result['load_seconds']}s, "
+            f"search p50 {result['similarity_search'].get('p50_ms')}ms p99 {result['similarity_search'].get('p99_ms')}ms, "
+            f"recall@{k} {result['recall_at_k']}"
+        )
+    return results
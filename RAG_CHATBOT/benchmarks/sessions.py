@@ -0,0 +1,95 @@
+import time
+
+from flask import Flask, jsonify, session
+
+from benchmarks.report import latency_summary
+from session_store import init_sessions
+
+READ_OPS = ("find_one", "find")
+WRITE_OPS = ("replace_one", "update_one", "delete_one", "insert_one")
+
+
+class CountingCollection:
+    """Wraps a collection, counting reads and writes and sleeping ``latency`` seconds per call like a network hop"""
+
+    def __init__(self, collection, latency=0.0):
+        self.collection = collection
+        self.latency = latency
+        self.reads = 0
+        self.writes = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if name not in READ_OPS + WRITE_OPS:
+            return attr
+
+        def call(*args, **kwargs):
+            if name in READ_OPS:
+                self.reads += 1
+            else:
+                self.writes += 1
+            if self.latency:
+                time.sleep(self.latency)
+            return attr(*args, **kwargs)
+
+        return call
+
+
+def _session_app(backend, collection, cache_ttl):
+    app = Flask(__name__)
+    app.secret_key = "benchmark"
+    if backend == "mongo-uncached":
+        # Every request reads the session and writes its expiration back, as Flask-Session's mongodb backend did
+        init_sessions(app, "mongo", collection, cache_ttl=0, refresh_interval=0)
+    else:
+        init_sessions(app, backend, collection, cache_ttl=cache_ttl)
+
+    @app.route("/login", methods=["POST"])
+    def login():
+        session["user"] = "bench@example.com"
+        session.permanent = True
+        return jsonify({"success": True})
+
+    @app.route("/whoami")
+    def whoami():
+        return jsonify({"user": session.get("user")})
+
+    return app
+
+
+def run_sessions(backends, users=50, requests_per_user=40, mongo_latency_ms=0.5, cache_ttl=5.0):
+    """Per-request session overhead and MongoDB round trips for each backend on an authenticated endpoint"""
+    import mongomock
+
+    results = {}
+    for backend in backends:
+        collection = CountingCollection(
+            mongomock.MongoClient()["bench"]["sessions"], latency=mongo_latency_ms / 1000
+        )
+        app = _session_app(backend, collection, cache_ttl)
+        clients = [app.test_client() for _ in range(users)]
+        for client in clients:
+            client.post("/login")
+        collection.reads = collection.writes = 0
+
+        samples = []
+        start = time.perf_counter()
+        # Round-robin over users so the cache sees interleaved sessions, as a busy server would
+        for _ in range(requests_per_user):
+            for client in clients:
+                request_start = time.perf_counter()
+                response = client.get("/whoami")
+                samples.append((time.perf_counter() - request_start) * 1000)
+                assert response.get_json()["user"], f"{backend} lost the session"
+        elapsed = time.perf_counter() - start
+
+        requests = len(samples)
+        results[backend] = {
+            "requests": requests,
+            "requests_per_second": round(requests / elapsed, 1),
+            "mongo_reads_per_request": round(collection.reads / requests, 4),
+            "mongo_writes_per_request": round(collection.writes / requests, 4),
+            **latency_summary(samples),
+        }
+        print(f"🍪 {backend}: {results[backend]}")
+    return results
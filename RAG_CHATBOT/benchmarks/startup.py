@@ -0,0 +1,208 @@
+"""Cold-start time and per-worker memory of flaskapp.
+
+Each measurement runs in a fresh interpreter (``python -c`` calling _probe),
+so module import costs are real and nothing loaded by the benchmark driver
+leaks into the numbers. This module keeps its own imports light for the
+same reason.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Modules that should only be imported once an index or the model is needed
+HEAVY_MODULES = (
+    "numpy", "faiss", "langchain_community.vectorstores", "langchain_google_genai",
+    "sentence_transformers", "torch",
+)
+RESULT_PREFIX = "STARTUP_RESULT "
+
+
+def _mb(kilobytes):
+    return round(kilobytes / 1024, 1)
+
+
+def _memory_kb(pid="self"):
+    """Rss, Pss and USS (private clean + dirty) in kB from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _use_mongomock():
+    import mongomock
+    import pymongo
+
+    # flaskapp creates its MongoClient on first use, so patching after the import is early enough
+    pymongo.MongoClient = mongomock.MongoClient
+
+
+def _heavy_loaded():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def _probe_cold_start(queries):
+    start = time.perf_counter()
+    import flaskapp
+    imported = time.perf_counter()
+    _use_mongomock()
+
+    patched = time.perf_counter()
+    app = flaskapp.create_app()
+    created = time.perf_counter()
+    response = app.test_client().get("/login")
+    assert response.status_code == 200, response.status_code
+    logged_in = time.perf_counter()
+    after_login = {"memory": _memory_kb(), "heavy_modules": _heavy_loaded()}
+
+    retriever = flaskapp.get_retriever("home")
+    retriever.similarity_search(queries[0], k=4)
+    first_search = time.perf_counter()
+    for query in queries[1:]:
+        retriever.similarity_search(query, k=4)
+    warm_search = (time.perf_counter() - first_search) / max(len(queries) - 1, 1)
+
+    return {
+        "import_ms": round((imported - start) * 1000, 1),
+        "create_app_ms": round((created - patched) * 1000, 1),
+        "first_login_ms": round((logged_in - created) * 1000, 1),
+        "ready_to_serve_login_ms": round((logged_in - start - (patched - imported)) * 1000, 1),
+        "login_rss_mb": _mb(after_login["memory"]["rss"]),
+        "heavy_modules_at_login": after_login["heavy_modules"],
+        "first_retrieval_ms": round((first_search - logged_in) * 1000, 1),
+        "warm_retrieval_ms": round(warm_search * 1000, 3),
+        "rss_mb": _mb(_memory_kb()["rss"]),
+    }
+
+
+def _serve_as_worker(preloaded, queries, ready_w, go_r):
+    """Body of a forked worker: load (or reuse) every index, search each once, report ready and wait"""
+    import flaskapp
+
+    if not preloaded:
+        flaskapp.create_app()
+        flaskapp.warm_up_vectorstores()
+    for domain in flaskapp.DOMAIN_INDEXES:
+        vectorstore = flaskapp.load_vectorstore(domain)
+        for query in queries:
+            vectorstore.similarity_search(query, k=4)
+    os.write(ready_w, b"1")
+    os.read(go_r, 1)
+
+
+def _probe_workers(mode, workers, queries):
+    start = time.perf_counter()
+    if mode == "preload":
+        import flaskapp
+        _use_mongomock()
+        flaskapp.create_app()
+
+    ready_r, ready_w = os.pipe()
+    go_r, go_w = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            os.close(go_w)
+            status = 0
+            try:
+                _serve_as_worker(mode == "preload", queries, ready_w, go_r)
+            except BaseException as e:
+                print(f"❌ Worker {os.getpid()} failed: {e}", file=sys.stderr)
+                status = 1
+            finally:
+                os._exit(status)
+        pids.append(pid)
+    os.close(ready_w)
+    os.close(go_r)
+
+    ready = 0
+    while ready < workers:
+        chunk = os.read(ready_r, workers)
+        if not chunk:
+            raise RuntimeError(f"only {ready} of {workers} workers became ready")
+        ready += len(chunk)
+    ready_seconds = time.perf_counter() - start
+
+    master = _memory_kb()
+    children = [_memory_kb(pid) for pid in pids]
+    os.close(go_w)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    def mean(key):
+        return _mb(sum(child[key] for child in children) / workers)
+
+    return {
+        "workers": workers,
+        "ready_seconds": round(ready_seconds, 3),
+        "master_rss_mb": _mb(master["rss"]),
+        "worker_rss_mb": mean("rss"),
+        "worker_pss_mb": mean("pss"),
+        "worker_uss_mb": mean("uss"),
+        # PSS splits shared pages between the processes mapping them, so the sum is what the group really costs
+        "total_pss_mb": _mb(master["pss"] + sum(child["pss"] for child in children)),
+    }
+
+
+def _probe(argv):
+    """Entry point of the measuring interpreter: ``_probe([kind, config_json])``"""
+    kind, config = argv[0], json.loads(argv[1])
+    from domains import DOMAIN_INDEXES
+    DOMAIN_INDEXES.update(config["index_dirs"])
+    if kind == "cold-start":
+        result = _probe_cold_start(config["queries"])
+    else:
+        result = _probe_workers(config["mode"], config["workers"], config["queries"])
+    sys.stdout.flush()
+    print(RESULT_PREFIX + json.dumps(result), flush=True)
+
+
+def _run_probe(kind, config, env):
+    command = [sys.executable, "-c", "import sys; from benchmarks.startup import _probe; _probe(sys.argv[1:])"]
+    completed = subprocess.run(
+        command + [kind, json.dumps(config)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True, timeout=600,
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    raise RuntimeError(f"{kind} probe failed (exit {completed.returncode}):\n{completed.stderr[-2000:]}")
+
+
+def run_startup(index_dirs, queries, workers=4, modes=("lazy", "preload")):
+    """Cold start to the first login and retrieval, and memory of ``workers`` forked workers, per mode.
+
+    "lazy" imports the app without loading anything up front, as each worker
+    does without preload_app; "preload" sets PRELOAD_MODELS, so create_app()
+    loads the embedder and every index before the workers are forked.
+    """
+    base_env = {
+        **os.environ,
+        "LLM_PROVIDER": os.environ.get("LLM_PROVIDER", "fake"),
+        "EMBEDDING_PROVIDER": os.environ.get("EMBEDDING_PROVIDER", "fake"),
+        "MONGO_ENSURE_INDEXES": "false",
+        "WARMUP_VECTORSTORES": "false",
+        "TOKENIZERS_PARALLELISM": "false",
+    }
+    results = {}
+    for mode in modes:
+        env = {**base_env, "PRELOAD_MODELS": "true" if mode == "preload" else "false"}
+        config = {"index_dirs": index_dirs, "queries": queries, "mode": mode, "workers": workers}
+        cold_start = _run_probe("cold-start", config, env)
+        print(f"⏱️ {mode} cold start: {cold_start}")
+        forked = _run_probe("workers", config, env)
+        print(f"🧮 {mode} with {workers} workers: {forked}")
+        results[mode] = {"cold_start": cold_start, "forked_workers": forked}
+    return results
@@ -0,0 +1,526 @@
+import os
+import threading
+import time
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+
+class ChatHistoryStore:
+    """Append-only chat history with overflow buckets.
+
+    Each session keeps one head document in ``sessions`` holding at most
+    ``bucket_size`` of the newest turns. Turns are appended with ``$push``; when
+    the head is full its turns are moved into a document in ``buckets`` and the
+    head starts over, so no document grows without bound. Every turn has a
+    sequence number (its position in the whole conversation) which is used as
+    the pagination cursor.
+    """
+
+    def __init__(self, sessions, buckets, bucket_size=100):
+        self.sessions = sessions
+        self.buckets = buckets
+        self.bucket_size = bucket_size
+
+    @staticmethod
+    def session_key(user_email, domain, session_id):
+        return {"user_email": user_email, "domain": domain, "session_id": session_id}
+
+    def new_session_document(self, key, created_at=None):
+        return {
+            **key,
+            "messages": [],
+            "message_count": 0,
+            "head_start": 0,
+            "bucket_count": 0,
+            "created_at": int(time.time()) if created_at is None else created_at,
+        }
+
+    def create_session(self, key, created_at=None):
+        """Create the session head unless it already exists, so repeated or racing creates are harmless"""
+        try:
+            self.sessions.update_one(key, {"$setOnInsert": self.new_session_document(key, created_at)}, upsert=True)
+        except DuplicateKeyError:
+            # Two upserts raced on the unique index; the other one created it
+            pass
+
+    def recent_messages(self, key, n):
+        """Return (exists, last n turns) without reading the whole conversation"""
+        head = self.sessions.find_one(
+            key, {"messages": {"$slice": -n}, "head_start": 1, "_id": 0}
+        )
+        if head is None:
+            return False, []
+        messages = head.get("messages", [])
+        head_start = head.get("head_start", 0)
+        if len(messages) < n and head_start > 0:
+            # The head was just rolled over; top up from the newest bucket
+            bucket = self.buckets.find_one(
+                key, {"messages": {"$slice": -(n - len(messages))}, "_id": 0}, sort=[("first_seq", -1)]
+            )
+            if bucket:
+                messages = bucket.get("messages", []) + messages
+        return True, messages
+
+    def append_turn(self, key, message):
+        """Atomically append one turn, rolling the head into a bucket when it is full"""
+        now = int(time.time())
+        for _ in range(5):
+            result = self.sessions.update_one(
+                {**key, "message_count": {"$exists": True}, f"messages.{self.bucket_size - 1}": {"$exists": False}},
+                {"$push": {"messages": message}, "$inc": {"message_count": 1}, "$set": {"last_updated": now}},
+            )
+            if result.matched_count:
+                return
+            if self._roll_over(key, [message], now):
+                return
+            if self.sessions.update_one(
+                {**key, "message_count": {"$exists": False}},
+                [{"$set": {
+                    "message_count": {"$size": {"$ifNull": ["$messages", []]}},
+                    "head_start": 0,
+                    "bucket_count": 0,
+                }}],
+            ).matched_count:
+                # Session written before counters existed; it now has them, so retry the push
+                continue
+            if self.sessions.count_documents(key, limit=1) == 0:
+                self.create_session(key)
+        raise RuntimeError(f"Could not append turn to session {key.get('session_id')}")
+
+    def _roll_over(self, key, messages, now):
+        """Move a full head into a bucket and start the head over with ``messages``"""
+        previous = self.sessions.find_one_and_update(
+            {**key, "message_count": {"$exists": True}, f"messages.{self.bucket_size - 1}": {"$exists": True}},
+            [{"$set": {
+                "messages": {"$literal": messages},
+                "head_start": {"$add": [{"$ifNull": ["$head_start", 0]}, {"$size": "$messages"}]},
+                "message_count": {"$add": ["$message_count", len(messages)]},
+                "bucket_count": {"$add": [{"$ifNull": ["$bucket_count", 0]}, 1]},
+                "last_updated": now,
+            }}],
+            projection={"messages": 1, "head_start": 1, "bucket_count": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is None:
+            return False
+        self.buckets.insert_one({
+            **key,
+            "bucket": previous.get("bucket_count", 0),
+            "first_seq": previous.get("head_start", 0),
+            "messages": previous["messages"],
+        })
+        return True
+
+    def page(self, key, before=None, limit=None):
+        """Return (messages, next_cursor) with turns older than ``before``, oldest first.
+
+        Without ``limit`` the whole conversation is returned. ``next_cursor`` is
+        the sequence number to pass as ``before`` for the previous page, or None
+        once the start of the conversation has been reached.
+        """
+        head = self.sessions.find_one(key, {"messages": 1, "head_start": 1, "_id": 0})
+        if head is None:
+            return [], None
+
+        head_messages = head.get("messages", [])
+        head_start = head.get("head_start", 0)
+        end = head_start + len(head_messages)
+        before = end if before is None else max(0, min(int(before), end))
+        wanted = before if limit is None else min(int(limit), before)
+        start = before - wanted
+
+        segments = [(head_start, head_messages)]
+        if start < head_start:
+            older = self.buckets.find(
+                {**key, "first_seq": {"$lt": min(before, head_start)}},
+                {"first_seq": 1, "messages": 1, "_id": 0},
+            ).sort("first_seq", -1)
+            for bucket in older:
+                segments.append((bucket["first_seq"], bucket["messages"]))
+                if bucket["first_seq"] <= start:
+                    break
+
+        messages = []
+        for first_seq, segment in reversed(segments):
+            lo = max(start, first_seq) - first_seq
+            hi = min(before, first_seq + len(segment)) - first_seq
+            if hi > lo:
+                messages.extend(segment[lo:hi])
+        return messages, (start if start > 0 else None)
+
+    def delete(self, key):
+        result = self.sessions.delete_one(key)
+        self.buckets.delete_many(key)
+        return result.deleted_count
+
+    def delete_many(self, query):
+        result = self.sessions.delete_many(query)
+        self.buckets.delete_many(query)
+        return result.deleted_count
+
+
+class ChatStoreBusyError(Exception):
+    """Raised when the write-behind queue stays full for longer than the enqueue timeout"""
+
+
+class _Ack(threading.Event):
+    """Set once a queued write is in MongoDB, or with ``error`` when it was given up on"""
+
+    error = None
+
+
+def _key_tuple(key):
+    return key["user_email"], key["domain"], key["session_id"]
+
+
+class _PendingSession:
+    """Writes for one session waiting in the write-behind queue"""
+
+    def __init__(self, key):
+        self.key = dict(key)
+        self.create = None
+        self.messages = []
+        self.events = []
+        self.taken = False
+        self.attempts = 0
+
+
+class WriteBehindChatStore:
+    """Acknowledges new sessions and turns at once and writes them to MongoDB in batches.
+
+    A background thread flushes every ``flush_interval`` seconds, or as soon as
+    ``flush_size`` turns are waiting: new sessions go out in one ``bulk_write``
+    and all queued turns in another, one ``$push`` per session. Reads through
+    this store see the turns it has queued (read-your-writes within the
+    process), and ``close()`` flushes whatever is left.
+
+    With ``durability="async"`` a turn is lost if the process dies before its
+    flush; ``"group"`` makes ``append_turn`` wait until the batch holding it
+    has been written, so callers still share one round trip per batch. When
+    ``max_queue`` turns are waiting (e.g. MongoDB is down), appends wait up to
+    ``enqueue_timeout`` seconds for a flush to make room and then raise
+    ChatStoreBusyError. A batch that fails ``max_attempts`` times in a row is
+    dropped and logged rather than retried forever.
+    """
+
+    def __init__(self, store, flush_interval=0.05, flush_size=500, max_queue=10000, durability="async",
+                 on_flush=None, enqueue_timeout=5.0, max_attempts=10):
+        if durability not in ("async", "group"):
+            raise ValueError(f"Unknown durability {durability!r} (expected 'async' or 'group')")
+        self.store = store
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_queue = max_queue
+        self.durability = durability
+        self.on_flush = on_flush
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self._reset()
+        # The flusher thread belongs to one process; a forked worker starts its own on first write
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._flushing = {}
+        self._pending_turns = 0
+        self._flushing_turns = 0
+        self._closed = False
+        self._thread = None
+        self.flushes = 0
+        self.flushed_turns = 0
+        self.failures = 0
+        self.fallbacks = 0
+        self.rejected = 0
+        self.dropped_turns = 0
+        self.flush_seconds = 0.0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    # Writes
+
+    def _enqueue(self, key, create=None, message=None):
+        event = _Ack() if self.durability == "group" else None
+        deadline = time.monotonic() + self.enqueue_timeout
+        with self._cond:
+            while self._pending_turns + self._flushing_turns >= self.max_queue and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise ChatStoreBusyError("Chat history is not being saved right now, please try again in a moment.")
+                self._cond.wait(min(remaining, self.flush_interval))
+            if not self._closed:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+                    self._thread.start()
+                entry = self._pending.get(_key_tuple(key))
+                if entry is None:
+                    entry = self._pending[_key_tuple(key)] = _PendingSession(key)
+                if create is not None and entry.create is None:
+                    entry.create = create
+                if message is not None:
+                    entry.messages.append(message)
+                    self._pending_turns += 1
+                if event is not None:
+                    entry.events.append(event)
+                if len(self._pending) == 1 or self._pending_turns >= self.flush_size:
+                    # Wake the flusher to start a batch, or to write a full one now
+                    self._cond.notify_all()
+                closed = False
+            else:
+                closed = True
+        if closed:
+            # After close() there is no flusher left; write through
+            if create is not None:
+                self.store.create_session(key, create["created_at"])
+            if message is not None:
+                self.store.append_turn(key, message)
+            return
+        if event is not None:
+            if not event.wait(max(30.0, 20 * self.flush_interval)):
+                raise RuntimeError(f"Chat turn for session {key.get('session_id')} was not persisted in time")
+            if event.error is not None:
+                raise RuntimeError(f"Chat turn for session {key.get('session_id')} was not persisted: {event.error}")
+
+    def create_session(self, key, created_at=None):
+        self._enqueue(key, create=self.store.new_session_document(key, created_at))
+
+    def append_turn(self, key, message):
+        self._enqueue(key, message=message)
+
+    # Flushing
+
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                if not self._closed and self._pending_turns < self.flush_size:
+                    # Let the batch fill up for one interval
+                    self._cond.wait(self.flush_interval)
+                batch, self._pending = self._pending, {}
+                for entry in batch.values():
+                    entry.taken = True
+                self._flushing = batch
+                self._flushing_turns, self._pending_turns = self._pending_turns, 0
+                self._cond.notify_all()
+
+            start = time.perf_counter()
+            try:
+                self._write(list(batch.values()))
+            except Exception as e:
+                with self._cond:
+                    self.failures += 1
+                    dropped = self._requeue(batch)
+                    self._flushing = {}
+                    self._flushing_turns = 0
+                    self._cond.notify_all()
+                if dropped:
+                    turns = sum(len(entry.messages) for entry in dropped)
+                    sessions = ", ".join(entry.key.get("session_id") or "?" for entry in dropped)
+                    print(f"❌ Gave up writing {turns} chat turns after {self.max_attempts} attempts "
+                          f"(sessions {sessions}): {str(e)}")
+                    for entry in dropped:
+                        for event in entry.events:
+                            event.error = str(e)
+                            event.set()
+                if len(dropped) < len(batch):
+                    print(f"⚠️ Chat history flush failed, retrying in {backoff:.2f}s: {str(e)}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+                continue
+            backoff = self.flush_interval
+            elapsed = time.perf_counter() - start
+
+            with self._cond:
+                turns = self._flushing_turns
+                self._flushing = {}
+                self._flushing_turns = 0
+                self.flushes += 1
+                self.flushed_turns += turns
+                self.flush_seconds += elapsed
+                self.last_flush_seconds = elapsed
+                self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+                self._cond.notify_all()
+            for entry in batch.values():
+                for event in entry.events:
+                    event.set()
+            if self.on_flush is not None:
+                self.on_flush(elapsed, turns)
+
+    def _requeue(self, batch):
+        """Put a failed batch back in front of anything queued since; returns the entries given up on.
+
+        The caller holds the lock.
+        """
+        dropped = []
+        for key, entry in batch.items():
+            entry.attempts += 1
+            if entry.attempts >= self.max_attempts:
+                self.dropped_turns += len(entry.messages)
+                dropped.append(entry)
+                continue
+            entry.taken = False
+            newer = self._pending.get(key)
+            if newer is not None:
+                entry.create = entry.create or newer.create
+                entry.messages.extend(newer.messages)
+                entry.events.extend(newer.events)
+            self._pending[key] = entry
+            self._pending_turns += len(entry.messages) - (len(newer.messages) if newer is not None else 0)
+        return dropped
+
+    def _write(self, entries):
+        sessions = self.store.sessions
+        creates = [UpdateOne(entry.key, {"$setOnInsert": entry.create}, upsert=True) for entry in entries if entry.create]
+        if creates:
+            try:
+                sessions.bulk_write(creates, ordered=False)
+            except PyMongoError as e:
+                # A duplicate key means another process created the session first, which is fine
+                errors = (getattr(e, "details", None) or {}).get("writeErrors", [])
+                if not errors or any(error.get("code") != 11000 for error in errors):
+                    raise
+
+        pushes = [entry for entry in entries if entry.messages]
+        if not pushes:
+            return
+        now = int(time.time())
+        result = sessions.bulk_write([
+            UpdateOne(
+                {**entry.key, "message_count": {"$exists": True}},
+                {
+                    "$push": {"messages": {"$each": entry.messages}},
+                    "$inc": {"message_count": len(entry.messages)},
+                    "$set": {"last_updated": now},
+                },
+            )
+            for entry in pushes
+        ], ordered=False)
+
+        if result.matched_count < len(pushes):
+            # Sessions from before message counters existed (or deleted meanwhile) take the one-by-one path
+            found = {
+                _key_tuple(doc) for doc in sessions.find(
+                    {"$or": [entry.key for entry in pushes], "message_count": {"$exists": True}},
+                    {"user_email": 1, "domain": 1, "session_id": 1, "_id": 0},
+                )
+            }
+            for entry in pushes:
+                if _key_tuple(entry.key) not in found:
+                    for message in entry.messages:
+                        self.store.append_turn(entry.key, message)
+                    self.fallbacks += 1
+
+        # Batched pushes can fill a head past bucket_size; roll those over now
+        full = sessions.find(
+            {"$or": [entry.key for entry in pushes], f"messages.{self.store.bucket_size - 1}": {"$exists": True}},
+            {"user_email": 1, "domain": 1, "session_id": 1, "_id": 0},
+        )
+        for doc in full:
+            self.store._roll_over(ChatHistoryStore.session_key(*_key_tuple(doc)), [], now)
+
+    def flush(self, timeout=30.0):
+        """Wait until everything queued so far has been written; False if ``timeout`` seconds pass first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._flushing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._pending or self._flushing:
+            print(f"⚠️ {self._pending_turns + self._flushing_turns} chat turns were not written before shutdown")
+
+    # Reads see this process's queued writes
+
+    def _read_through(self, key, read):
+        """Run ``read()`` against MongoDB and return (result, queued entry or None) with no turn missed or doubled"""
+        key_tuple = _key_tuple(key)
+        while True:
+            with self._cond:
+                while key_tuple in self._flushing:
+                    self._cond.wait()
+                entry = self._pending.get(key_tuple)
+            result = read()
+            with self._cond:
+                if entry is not None and entry.taken:
+                    # Flushed while we were reading; the result may or may not include it, so read again
+                    continue
+                current = self._pending.get(key_tuple)
+                if current is None:
+                    return result, None
+                return result, (current.create is not None, list(current.messages))
+
+    def recent_messages(self, key, n):
+        (exists, messages), queued = self._read_through(key, lambda: self.store.recent_messages(key, n))
+        if queued is None:
+            return exists, messages
+        return True, (messages + queued[1])[-n:]
+
+    def page(self, key, before=None, limit=None):
+        if before is not None:
+            # Cursors point into what is already stored
+            return self.store.page(key, before=before, limit=limit)
+        with self._cond:
+            entry = self._pending.get(_key_tuple(key))
+            queued_count = len(entry.messages) if entry is not None else 0
+        stored_limit = None if limit is None else max(int(limit) - queued_count, 0)
+        (messages, cursor), queued = self._read_through(
+            key, lambda: self.store.page(key, before=None, limit=stored_limit)
+        )
+        if queued is None:
+            return messages, cursor
+        # The cursor must stay a stored position, so a page can run over ``limit`` by turns queued meanwhile
+        return messages + queued[1], cursor
+
+    def delete(self, key):
+        self._discard(lambda key_tuple: key_tuple == _key_tuple(key))
+        return self.store.delete(key)
+
+    def delete_many(self, query):
+        fields = ("user_email", "domain", "session_id")
+        wanted = tuple(query.get(field) for field in fields)
+        self._discard(lambda key_tuple: all(w is None or w == v for w, v in zip(wanted, key_tuple)))
+        return self.store.delete_many(query)
+
+    def _discard(self, matches):
+        """Drop queued writes for deleted sessions and wait out any flush still writing them"""
+        with self._cond:
+            for key_tuple in [k for k in self._pending if matches(k)]:
+                entry = self._pending.pop(key_tuple)
+                self._pending_turns -= len(entry.messages)
+                for event in entry.events:
+                    event.set()
+            while any(matches(k) for k in self._flushing):
+                self._cond.wait()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "durability": self.durability,
+                "queued_turns": self._pending_turns + self._flushing_turns,
+                "queued_sessions": len(self._pending) + len(self._flushing),
+                "flushes": self.flushes,
+                "flushed_turns": self.flushed_turns,
+                "failures": self.failures,
+                "fallbacks": self.fallbacks,
+                "rejected": self.rejected,
+                "dropped_turns": self.dropped_turns,
+                "last_flush_ms": round(self.last_flush_seconds * 1000, 3),
+                "mean_flush_ms": round(self.flush_seconds / self.flushes * 1000, 3) if self.flushes else 0.0,
+                "max_flush_ms": round(self.max_flush_seconds * 1000, 3),
+            }
@@ -0,0 +1,177 @@
+import re
+import time
+
+from langchain_core.documents import Document
+
+# Gemini has no local tokenizer; ~4 characters per token is close enough for budgeting English text
+CHARS_PER_TOKEN = 4
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def format_history(history, max_turns=2, max_answer_chars=200):
+    """The last ``max_turns`` turns as prompt lines, answers truncated"""
+    lines = []
+    for h in history[-max_turns:]:
+        lines.append(f"Previous User Question: {h['user']}")
+        lines.append(f"Previous Assistant Response: {h['bot'][:max_answer_chars]}...")
+    return lines
+
+
+def _source_key(doc):
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+
+def _suffix_prefix_overlap(left, right, min_overlap, max_overlap):
+    """Length of the longest end of ``left`` that ``right`` starts with, or 0"""
+    for size in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _shingles(text, size=3):
+    words = _WORD.findall(text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _containment(a, b):
+    """Share of ``a``'s shingles that also occur in ``b``"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a)
+
+
+class AssembledContext:
+    """The chunks and history lines that made it into the prompt, with their token estimate"""
+
+    def __init__(self, docs, history_lines, tokens, merged, duplicates, truncated, dropped, seconds):
+        self.docs = docs
+        self.history_lines = history_lines
+        self.tokens = tokens
+        self.merged = merged
+        self.duplicates = duplicates
+        self.truncated = truncated
+        self.dropped = dropped
+        self.seconds = seconds
+
+    @property
+    def text(self):
+        return "\n\n".join(doc.page_content for doc in self.docs)
+
+    def summary(self):
+        return (
+            f"{len(self.docs)} chunks, ~{self.tokens} context tokens, {self.merged} merged, "
+            f"{self.duplicates} near-duplicates, {self.dropped} over budget"
+            f"{', last one truncated' if self.truncated else ''}, {self.seconds * 1000:.2f}ms"
+        )
+
+
+class ContextAssembler:
+    """Turns the retrieved chunks and session history into prompt context within a token budget.
+
+    Chunks come in best-first. Chunks from the same source (and page) whose
+    text overlaps, as neighbouring splits of the 1000/200 splitter do, are
+    joined into one passage without repeating the shared text; a chunk whose
+    word shingles are nearly all present in a better chunk is dropped. History
+    lines are kept first, then passages are added in rank order until
+    ``token_budget`` is reached, cutting the last one at a word boundary if at
+    least ``min_chunk_tokens`` still fit.
+    """
+
+    def __init__(self, token_budget=1000, min_overlap=20, max_overlap=400, duplicate_threshold=0.9,
+                 min_chunk_tokens=50):
+        self.token_budget = token_budget
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.duplicate_threshold = duplicate_threshold
+        self.min_chunk_tokens = min_chunk_tokens
+
+    def _join(self, first, second):
+        """One passage for two chunks of the same source, or None if they neither overlap nor contain each other"""
+        a, b = first.page_content, second.page_content
+        if b in a:
+            return a
+        if a in b:
+            return b
+        overlap = _suffix_prefix_overlap(a, b, self.min_overlap, self.max_overlap)
+        if overlap:
+            return a + b[overlap:]
+        overlap = _suffix_prefix_overlap(b, a, self.min_overlap, self.max_overlap)
+        if overlap:
+            return b + a[overlap:]
+        return None
+
+    def merge_overlapping(self, docs):
+        """Collapse overlapping chunks of the same source; returns (passages best-first, merge count)"""
+        passages = list(docs)
+        merged = 0
+        changed = True
+        while changed:
+            changed = False
+            for i in range(len(passages)):
+                for j in range(i + 1, len(passages)):
+                    if _source_key(passages[i]) != _source_key(passages[j]):
+                        continue
+                    text = self._join(passages[i], passages[j])
+                    if text is None:
+                        continue
+                    # The passage keeps the rank of its best chunk
+                    ids = [getattr(doc, "id", None) for doc in (passages[i], passages[j])]
+                    passages[i] = Document(
+                        id="+".join(filter(None, ids)) or None,
+                        page_content=text,
+                        metadata=passages[i].metadata,
+                    )
+                    del passages[j]
+                    merged += 1
+                    changed = True
+                    break
+                if changed:
+                    break
+        return passages, merged
+
+    def drop_near_duplicates(self, docs):
+        kept, kept_shingles = [], []
+        for doc in docs:
+            shingles = _shingles(doc.page_content)
+            # Containment rather than Jaccard, so a short chunk quoted inside a longer, better one is dropped too
+            if any(_containment(shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                continue
+            kept.append(doc)
+            kept_shingles.append(shingles)
+        return kept, len(docs) - len(kept)
+
+    def assemble(self, docs, history=()):
+        start = time.perf_counter()
+        passages, merged = self.merge_overlapping(docs)
+        passages, duplicates = self.drop_near_duplicates(passages)
+
+        history_lines = format_history(list(history))
+        used = sum(estimate_tokens(line) for line in history_lines)
+        selected = []
+        truncated = False
+        for position, doc in enumerate(passages):
+            remaining = self.token_budget - used
+            tokens = estimate_tokens(doc.page_content)
+            if tokens <= remaining:
+                selected.append(doc)
+                used += tokens
+                continue
+            if remaining >= self.min_chunk_tokens:
+                cut = doc.page_content[:remaining * CHARS_PER_TOKEN - 2].rsplit(" ", 1)[0] + " …"
+                selected.append(Document(id=getattr(doc, "id", None), page_content=cut, metadata=doc.metadata))
+                used += estimate_tokens(cut)
+                truncated = True
+                position += 1
+            dropped = len(passages) - position
+            break
+        else:
+            dropped = 0
+
+        return AssembledContext(
+            selected, history_lines, used, merged, duplicates, truncated, dropped, time.perf_counter() - start
+        )
@@ -1,66 +1,274 @@
+"""Download the PDFs linked from a paginated listing, in parallel and resumably.
+
+    python data_download.py https://legalaffairs.gov.in/media/e-book --out downloaded_pdfs34 --workers 8
+    python data_download.py https://legalaffairs.gov.in/media/e-book --out data/Law --ingest law
+
+Listing pages are followed through their "Next »" links while the PDFs found
+so far download on a worker pool sharing one keep-alive session. Interrupted
+files are resumed with Range requests, failures are retried with exponential
+backoff, and download_manifest.json records URL, ETag, size and SHA-256 of
+every file so re-runs skip what is already there (by URL or by content).
+With --ingest the finished folder is handed to ingest.py for the domain.
+"""
+import argparse
+import hashlib
+import json
 import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urljoin, urlparse
+
 import requests
 from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+from requests.adapters import HTTPAdapter
 
-BASE_URL = "https://legalaffairs.gov.in/media/e-book"
+from checksums import file_sha256
 
+BASE_URL = "https://legalaffairs.gov.in/media/e-book"
 SAVE_FOLDER = "downloaded_pdfs34"
-os.makedirs(SAVE_FOLDER, exist_ok=True)
+MANIFEST_NAME = "download_manifest.json"
+CHUNK_SIZE = 1024 * 1024
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class RetryableError(Exception):
+    """A download attempt failed in a way that is worth retrying"""
+
+
+def filename_for(url):
+    """Stable local name for a URL: its basename, plus a short URL hash so different URLs never collide"""
+    name = unquote(os.path.basename(urlparse(url).path)) or "download.pdf"
+    stem, ext = os.path.splitext(re.sub(r"[^\w.\-]+", "_", name))
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:8]
+    return f"{stem[:80]}-{digest}{ext or '.pdf'}"
+
+
+class Downloader:
+    """Parallel, resumable downloads into ``save_folder`` with a URL/ETag/content-hash manifest"""
+
+    def __init__(self, save_folder, workers=8, retries=4, backoff=1.0, timeout=(10, 60), revalidate=False):
+        self.save_folder = save_folder
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.revalidate = revalidate
+        os.makedirs(save_folder, exist_ok=True)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "IntelliSphere-downloader/1.0"
 
-downloaded_pdfs = set(os.listdir(SAVE_FOLDER))
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+        self.summary = {"downloaded": 0, "resumed": 0, "skipped": 0, "duplicates": 0, "failed": 0, "bytes": 0}
 
-def download_pdfs(url):
-    pdf_count = len(downloaded_pdfs) + 1  #
+    @property
+    def manifest_path(self):
+        return os.path.join(self.save_folder, MANIFEST_NAME)
 
-    while url:
-        response = requests.get(url)
-        if response.status_code != 200:
-            print(f"Failed to access {url}")
-            break
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"files": {}}
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
 
-        soup = BeautifulSoup(response.text, "html.parser")
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
 
-        # Extract PDF links
-        pdf_links = [
-            urljoin(url, a["href"])
-            for a in soup.find_all("a", href=True)
-            if a["href"].endswith(".pdf")
-        ]
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.summary[key] += amount
 
-        if not pdf_links:
-            print("No PDFs found on this page.")
-        else:
-            print(f"Found {len(pdf_links)} PDFs. Downloading...")
+    def _is_current(self, url):
+        entry = self.manifest["files"].get(url)
+        if not entry or "sha256" not in entry:
+            return False
+        path = os.path.join(self.save_folder, entry["filename"])
+        if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+            return False
+        if self.revalidate and entry.get("etag"):
+            try:
+                response = self.session.head(
+                    url, headers={"If-None-Match": entry["etag"]}, timeout=self.timeout, allow_redirects=True
+                )
+            except requests.RequestException as e:
+                # Keep the copy we have; a server that cannot be reached now is not evidence it changed
+                print(f"⚠️ Could not revalidate {url}, keeping the downloaded copy: {e}")
+                return True
+            return response.status_code == 304 or response.headers.get("ETag") == entry["etag"]
+        return True
+
+    def _fetch(self, url, path):
+        """One attempt: stream into ``path``.part, resuming from its current size; returns the response headers"""
+        part_path = f"{path}.part"
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        previous = self.manifest["files"].get(url, {})
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            # Only resume if the server still has the same file; otherwise it sends it whole
+            if previous.get("partial_validator"):
+                headers["If-Range"] = previous["partial_validator"]
+
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if response.status_code in RETRYABLE_STATUS:
+                    raise RetryableError(f"HTTP {response.status_code}")
+                if response.status_code == 416:
+                    # Our partial file is already complete (or bogus); start over
+                    os.remove(part_path)
+                    raise RetryableError("HTTP 416, restarting from scratch")
+                response.raise_for_status()
+
+                resumed = response.status_code == 206
+                if offset and not resumed:
+                    offset = 0
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                if validator and not resumed:
+                    # Remember what the .part file belongs to, so a later run can resume it safely
+                    with self._lock:
+                        self.manifest["files"].setdefault(url, {})["partial_validator"] = validator
+                        self._save_manifest()
+                if resumed:
+                    self._count("resumed")
 
-        # Download PDFs with sequential naming, avoiding duplicates
-        for pdf_url in pdf_links:
-            pdf_filename = pdf_url.split("/")[-1]
-            if pdf_filename in downloaded_pdfs:
-                print(f"Skipping duplicate: {pdf_filename}")
-                continue
+                with open(part_path, "ab" if resumed else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+                        self._count("bytes", len(chunk))
+                return response.headers
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            raise RetryableError(str(e)) from e
 
-            pdf_name = os.path.join(SAVE_FOLDER, f"{pdf_count}.pdf")
+    def download(self, url):
+        """Fetch one URL unless the manifest already has it; returns its manifest entry or None on failure"""
+        if self._is_current(url):
+            self._count("skipped")
+            return self.manifest["files"][url]
 
+        filename = filename_for(url)
+        path = os.path.join(self.save_folder, filename)
+        for attempt in range(self.retries + 1):
             try:
-                pdf_data = requests.get(pdf_url, stream=True)
-                with open(pdf_name, "wb") as pdf_file:
-                    for chunk in pdf_data.iter_content(chunk_size=1024):
-                        pdf_file.write(chunk)
-                print(f"Downloaded: {pdf_name}")
-
-                # Add to the set to prevent duplicates
-                downloaded_pdfs.add(pdf_filename)
-                pdf_count += 1
-            except Exception as e:
-                print(f"Failed to download {pdf_url}: {e}")
-
-        next_page_tag = soup.find("a", string=lambda text: text and "Next »" in text)
-        if next_page_tag and "href" in next_page_tag.attrs:
-            url = urljoin(url, next_page_tag["href"])
-            print(f"Moving to next page: {url}")
-        else:
-            print("No more pages found.")
-            break  
-
-download_pdfs(BASE_URL)
+                headers = self._fetch(url, path)
+                break
+            except RetryableError as e:
+                if attempt == self.retries:
+                    print(f"❌ Failed to download {url} after {attempt + 1} attempts: {e}")
+                    self._count("failed")
+                    return None
+                delay = self.backoff * 2 ** attempt
+                print(f"🔁 Retrying {url} in {delay:.1f}s ({e})")
+                time.sleep(delay)
+            except requests.RequestException as e:
+                print(f"❌ Failed to download {url}: {e}")
+                self._count("failed")
+                return None
+
+        os.replace(f"{path}.part", path)
+        content_hash = file_sha256(path)
+        with self._lock:
+            duplicate = next(
+                (other for other_url, other in self.manifest["files"].items()
+                 if other_url != url and other.get("sha256") == content_hash),
+                None,
+            )
+            if duplicate is not None:
+                # Same bytes under another URL; keep one copy so ingestion does not index it twice
+                os.remove(path)
+                filename = duplicate["filename"]
+                self.summary["duplicates"] += 1
+            else:
+                self.summary["downloaded"] += 1
+            entry = {
+                "filename": filename,
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "size": os.path.getsize(os.path.join(self.save_folder, filename)),
+                "sha256": content_hash,
+                "downloaded_at": int(time.time()),
+            }
+            self.manifest["files"][url] = entry
+            self._save_manifest()
+        print(f"✅ Downloaded: {url} -> {filename}" + (" (duplicate content)" if duplicate else ""))
+        return entry
+
+    def pdf_links(self, start_url):
+        """Yield PDF links page by page, following "Next »" links"""
+        url = start_url
+        seen_pages = set()
+        while url and url not in seen_pages:
+            seen_pages.add(url)
+            response = self.session.get(url, timeout=self.timeout)
+            if response.status_code != 200:
+                print(f"Failed to access {url}")
+                return
+            soup = BeautifulSoup(response.content, "html.parser")
+            links = [
+                urljoin(url, a["href"])
+                for a in soup.find_all("a", href=True)
+                if urlparse(a["href"]).path.lower().endswith(".pdf")
+            ]
+            print(f"📄 Found {len(links)} PDFs on {url}")
+            yield from links
+
+            next_page_tag = soup.find("a", string=lambda text: text and "Next »" in text)
+            url = urljoin(url, next_page_tag["href"]) if next_page_tag and next_page_tag.get("href") else None
+
+    def run(self, start_url):
+        """Crawl ``start_url`` and download every PDF found; returns a summary dict"""
+        start = time.perf_counter()
+        queued = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="download") as executor:
+            futures = []
+            for link in self.pdf_links(start_url):
+                if link not in queued:
+                    queued.add(link)
+                    futures.append(executor.submit(self.download, link))
+            for future in futures:
+                future.result()
+        with self._lock:
+            self._save_manifest()
+        elapsed = time.perf_counter() - start
+        self.summary["seconds"] = round(elapsed, 2)
+        self.summary["megabytes_per_second"] = round(self.summary["bytes"] / 1e6 / max(elapsed, 1e-9), 2)
+        print(f"🎉 Downloads finished: {self.summary}")
+        return self.summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the PDFs linked from a paginated listing")
+    parser.add_argument("url", nargs="?", default=BASE_URL, help="first listing page")
+    parser.add_argument("--out", default=SAVE_FOLDER, help="folder to save PDFs and the download manifest in")
+    parser.add_argument("--workers", type=int, default=8, help="parallel downloads (and pooled connections)")
+    parser.add_argument("--retries", type=int, default=4, help="retries per file, with exponential backoff")
+    parser.add_argument("--backoff", type=float, default=1.0, help="seconds before the first retry")
+    parser.add_argument("--timeout", type=float, default=60.0, help="read timeout in seconds")
+    parser.add_argument("--revalidate", action="store_true", help="re-check ETags of files already downloaded")
+    parser.add_argument("--ingest", metavar="DOMAIN", help="update this domain's index from --out when done")
+    args = parser.parse_args(argv)
+
+    downloader = Downloader(
+        args.out,
+        workers=args.workers,
+        retries=args.retries,
+        backoff=args.backoff,
+        timeout=(10, args.timeout),
+        revalidate=args.revalidate,
+    )
+    downloader.run(args.url)
+    if args.ingest:
+        from ingest import ingest
+        ingest(args.ingest, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+# Index directory for each chat domain, relative to the RAG_CHATBOT folder.
+# Shared by the Flask app and the ingestion CLI so both agree on where indexes live.
+DOMAIN_INDEXES = {
+    "health": "faiss_indexes/health",
+    "law": "faiss_indexes/law",
+    "finance": "faiss_indexes/finance",
+    "technology": "faiss_indexes/technology",
+    "education": "faiss_indexes/education",
+    "research": "faiss_indexes/research",
+    "home": "faiss_indexes/general" 
+}
@@ -0,0 +1,138 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+FAKE_EMBEDDING_MODEL = "fake-hashing-384"
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(text):
+    """Collapse case, whitespace and trailing punctuation so "What is GST?" and "what is gst" share a key"""
+    text = _WHITESPACE.sub(" ", text.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words vectors for offline runs and benchmarks; needs no model download.
+
+    Each token is hashed to a signed bucket, so texts that share words land
+    near each other and similarity search still behaves sensibly.
+    """
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype="float32")
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+
+def create_embedder(provider="huggingface", model="all-MiniLM-L6-v2"):
+    """Build the document/query embedder; "fake" gives HashingEmbeddings for offline runs"""
+    if provider == "fake":
+        return HashingEmbeddings()
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with a bounded LRU cache in front of embed_query.
+
+    Document embedding is passed straight through; only query vectors are cached,
+    keyed by the normalized query text.
+    """
+
+    def __init__(self, embedder, max_size=2048):
+        self.embedder = embedder
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def embed_query(self, text):
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+
+        vector = self.embedder.embed_query(key)
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return vector
+
+    def embed_queries(self, texts):
+        """Embed many queries, serving repeats from the cache and the rest in one batched forward pass.
+
+        Misses go through embed_documents, which uses the same encoder as
+        embed_query for the symmetric sentence-transformers models served here.
+        """
+        keys = [normalize_query(text) for text in texts]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                vector = self._cache.get(key)
+                if vector is not None:
+                    self._cache.move_to_end(key)
+                    vectors[key] = vector
+            self.hits += sum(1 for key in keys if key in vectors)
+            self.misses += sum(1 for key in keys if key not in vectors)
+
+        missing = list(dict.fromkeys(key for key in keys if key not in vectors))
+        if missing:
+            vectors.update(zip(missing, self.embedder.embed_documents(missing)))
+            with self._lock:
+                for key in missing:
+                    self._cache[key] = vectors[key]
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+        return [vectors[key] for key in keys]
+
+    def embed_documents(self, texts):
+        return self.embedder.embed_documents(texts)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
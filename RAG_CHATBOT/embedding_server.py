@@ -0,0 +1,333 @@
+"""Shared embedding model server for multi-worker deployments.
+
+    python embedding_server.py --socket /tmp/intellisphere-embed.sock --window-ms 5
+
+One process loads the sentence-transformers model and serves every gunicorn
+worker over a Unix socket; workers set EMBEDDING_SERVICE_SOCKET and use
+ServiceEmbeddings, which falls back to an in-process model when the server is
+not running. Requests that arrive within ``window_ms`` of each other are
+embedded together in one forward pass.
+
+Wire format (little-endian), one request and one response per frame:
+
+    request   op:u8  count:u32  then count x (length:u32, utf-8 bytes)
+    response  status:u8  count:u32  dim:u32  count*dim float32    (status 0)
+              status:u8  length:u32  utf-8 message                 (status 1, error)
+
+``op`` is 1 for texts to embed and 2 for server info (count 0), which is
+answered as status:u8 length:u32 and a JSON document.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+OP_EMBED = 1
+OP_INFO = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+DEFAULT_SOCKET = "/tmp/intellisphere-embed.sock"
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("embedding service closed the connection")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def encode_request(op, texts=()):
+    parts = [struct.pack("<BI", op, len(texts))]
+    for text in texts:
+        encoded = text.encode("utf-8")
+        parts.append(struct.pack("<I", len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def read_request(sock):
+    op, count = struct.unpack("<BI", _recv_exact(sock, 5))
+    texts = []
+    for _ in range(count):
+        (length,) = struct.unpack("<I", _recv_exact(sock, 4))
+        texts.append(_recv_exact(sock, length).decode("utf-8"))
+    return op, texts
+
+
+def encode_vectors(vectors):
+    array = np.ascontiguousarray(vectors, dtype="<f4")
+    count, dim = array.shape if array.size else (0, 0)
+    return struct.pack("<BII", STATUS_OK, count, dim) + array.tobytes()
+
+
+def encode_error(message):
+    encoded = message.encode("utf-8")
+    return struct.pack("<BI", STATUS_ERROR, len(encoded)) + encoded
+
+
+def encode_info(info):
+    encoded = json.dumps(info).encode("utf-8")
+    return struct.pack("<BI", STATUS_OK, len(encoded)) + encoded
+
+
+def _read_status(sock):
+    (status,) = struct.unpack("<B", _recv_exact(sock, 1))
+    if status == STATUS_ERROR:
+        (length,) = struct.unpack("<I", _recv_exact(sock, 4))
+        raise RuntimeError(f"embedding service error: {_recv_exact(sock, length).decode('utf-8')}")
+
+
+def read_info(sock):
+    _read_status(sock)
+    (length,) = struct.unpack("<I", _recv_exact(sock, 4))
+    return json.loads(_recv_exact(sock, length).decode("utf-8"))
+
+
+def read_vectors(sock):
+    _read_status(sock)
+    count, dim = struct.unpack("<II", _recv_exact(sock, 8))
+    return np.frombuffer(_recv_exact(sock, count * dim * 4), dtype="<f4").reshape(count, dim)
+
+
+class MicroBatcher:
+    """Collects concurrent embed requests for up to ``window`` seconds and runs them as one batch"""
+
+    def __init__(self, embedder, window=0.005, max_batch=64):
+        self.embedder = embedder
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        threading.Thread(target=self._run, name="embed-batcher", daemon=True).start()
+
+    def embed(self, texts):
+        item = {"texts": texts, "done": threading.Event(), "vectors": None, "error": None}
+        self._queue.put(item)
+        item["done"].wait()
+        if item["error"] is not None:
+            raise item["error"]
+        return item["vectors"]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0]["texts"])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item["texts"])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for item in batch for text in item["texts"]]
+            try:
+                vectors = np.asarray(self.embedder.embed_documents(texts), dtype="float32") if texts else None
+                error = None
+            except Exception as e:
+                vectors, error = None, e
+            start = 0
+            for item in batch:
+                count = len(item["texts"])
+                if error is not None:
+                    item["error"] = error
+                else:
+                    item["vectors"] = vectors[start:start + count] if count else np.zeros((0, 0), "float32")
+                start += count
+                item["done"].set()
+            with self._lock:
+                self.requests += len(batch)
+                self.batches += 1
+                self.texts += len(texts)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "texts": self.texts,
+                "mean_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            }
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                op, texts = read_request(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                if op == OP_EMBED:
+                    response = encode_vectors(self.server.batcher.embed(texts))
+                elif op == OP_INFO:
+                    response = encode_info({**self.server.info, **self.server.batcher.stats()})
+                else:
+                    response = encode_error(f"unknown op {op}")
+            except Exception as e:
+                response = encode_error(str(e))
+            self.request.sendall(response)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # Every worker thread holds its own connection; the default backlog of 5 refuses bursts
+    request_queue_size = 256
+
+    def __init__(self, socket_path, embedder, model_name, window=0.005, max_batch=64):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+        self.batcher = MicroBatcher(embedder, window=window, max_batch=max_batch)
+        dimension = len(embedder.embed_query("dimension probe"))
+        self.info = {"model": model_name, "dimension": dimension, "pid": os.getpid()}
+
+
+class ServiceEmbeddings(Embeddings):
+    """Embeddings served by embedding_server.py, with an in-process fallback.
+
+    ``fallback`` builds a local embedder and is only called if the service is
+    unreachable or serves a different model than ``model_name``; the service
+    is tried again every ``retry_interval`` seconds after a failure.
+    """
+
+    def __init__(self, socket_path, model_name, fallback, timeout=30.0, retry_interval=30.0):
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.fallback = fallback
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fallback_embedder = None
+        self._retry_at = 0.0
+        self._checked = False
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _drop_connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _call(self, op, texts, reader):
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(encode_request(op, texts))
+                return reader(sock)
+            except (OSError, ConnectionError):
+                # A stale connection (e.g. the server restarted) gets one reconnect
+                self._drop_connection()
+                if attempt:
+                    raise
+
+    def server_info(self):
+        return self._call(OP_INFO, [], read_info)
+
+    def _service_available(self):
+        if time.monotonic() < self._retry_at:
+            return False
+        if self._checked:
+            return True
+        with self._lock:
+            if self._checked:
+                return True
+            try:
+                info = self.server_info()
+            except (OSError, ConnectionError, RuntimeError) as e:
+                self._retry_at = time.monotonic() + self.retry_interval
+                print(f"⚠️ Embedding service at {self.socket_path} unavailable ({e}); embedding in-process")
+                return False
+            served = info.get("model", "").lower().removeprefix("sentence-transformers/")
+            if served != self.model_name.lower().removeprefix("sentence-transformers/"):
+                self._retry_at = time.monotonic() + self.retry_interval
+                print(f"⚠️ Embedding service serves {info.get('model')}, expected {self.model_name}; embedding in-process")
+                return False
+            self._checked = True
+            print(f"🔌 Using embedding service at {self.socket_path} ({info.get('model')}, pid {info.get('pid')})")
+            return True
+
+    def _local_embedder(self):
+        with self._lock:
+            if self._fallback_embedder is None:
+                self._fallback_embedder = self.fallback()
+            return self._fallback_embedder
+
+    def _embed(self, texts):
+        if self._service_available():
+            try:
+                return self._call(OP_EMBED, texts, read_vectors).tolist()
+            except (OSError, ConnectionError, RuntimeError) as e:
+                with self._lock:
+                    self._checked = False
+                    self._retry_at = time.monotonic() + self.retry_interval
+                print(f"⚠️ Embedding service call failed ({e}); embedding in-process")
+        return self._local_embedder().embed_documents(texts)
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts)) if texts else []
+
+
+def main(argv=None):
+    from embedding_cache import create_embedder
+
+    parser = argparse.ArgumentParser(description="Serve one embedding model to every worker over a Unix socket")
+    parser.add_argument("--socket", default=os.getenv("EMBEDDING_SERVICE_SOCKET") or DEFAULT_SOCKET)
+    parser.add_argument("--provider", default=os.getenv("EMBEDDING_PROVIDER", "huggingface"), choices=("huggingface", "fake"))
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="how long to gather requests into one batch")
+    parser.add_argument("--max-batch", type=int, default=64, help="texts per forward pass")
+    args = parser.parse_args(argv)
+
+    embedder = create_embedder(args.provider, args.model)
+    if args.provider == "fake":
+        from embedding_cache import FAKE_EMBEDDING_MODEL
+        args.model = FAKE_EMBEDDING_MODEL
+    server = EmbeddingServer(args.socket, embedder, args.model, window=args.window_ms / 1000, max_batch=args.max_batch)
+    print(f"🧠 Serving {args.model} ({server.info['dimension']} dims) on {args.socket}")
+    try:
+        server.serve_forever()
+    finally:
+        os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+def distance_to_relevance(distance):
+    """Map a squared L2 distance between unit vectors to cosine similarity, so scores from different indexes compare"""
+    return 1.0 - float(distance) / 2.0
+
+
+class FederatedSearchError(Exception):
+    """No domain index could be searched, so there is no context to answer from"""
+
+
+class FederatedTimeoutError(FederatedSearchError, TimeoutError):
+    """Every domain that could be searched missed the search deadline"""
+
+
+class FederatedRetriever:
+    """Searches several domain indexes in parallel with one query vector and merges the hits.
+
+    ``load_vectorstore(domain)`` returns the (cached) vectorstore for a domain or
+    None. Indexes are loaded first, waiting up to ``load_timeout`` seconds on a
+    cold start, so loading never eats into the search deadline. Each domain is
+    then searched on a shared thread pool (FAISS releases the GIL while it
+    searches); domains that have not answered within ``timeout`` seconds are
+    left out of this result rather than stalling the response. If no domain
+    answers at all, FederatedSearchError (FederatedTimeoutError when they timed
+    out) is raised instead of returning an empty context.
+    Distances are converted to cosine similarity, duplicates across domains are
+    dropped and the best ``k`` chunks overall are returned, each tagged with
+    the domain it came from.
+    """
+
+    def __init__(self, load_vectorstore, domains, timeout=0.5, max_workers=None, load_timeout=120.0):
+        self.load_vectorstore = load_vectorstore
+        self.domains = list(domains)
+        self.timeout = timeout
+        self.load_timeout = load_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or 2 * len(self.domains), thread_name_prefix="federated"
+        )
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.timeouts = {domain: 0 for domain in self.domains}
+        self.errors = {domain: 0 for domain in self.domains}
+
+    def _load_all(self):
+        """{domain: vectorstore} for every domain whose index is available, loading cold ones in parallel"""
+        futures = {self._executor.submit(self.load_vectorstore, domain): domain for domain in self.domains}
+        done, not_done = wait(futures, timeout=self.load_timeout)
+        for future in not_done:
+            print(f"⏳ Federated search skipped domain {futures[future]}: index still loading after {self.load_timeout}s")
+        loaded = {}
+        for future in done:
+            domain = futures[future]
+            try:
+                vectorstore = future.result()
+            except Exception as e:
+                with self._lock:
+                    self.errors[domain] += 1
+                print(f"❌ Federated search could not load domain {domain}: {str(e)}")
+                continue
+            if vectorstore is not None:
+                loaded[domain] = vectorstore
+        return loaded
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        """Return up to ``k`` (Document, relevance) pairs across all domains, best first"""
+        from langchain_core.documents import Document
+
+        vectorstores = self._load_all()
+        if not vectorstores:
+            raise FederatedSearchError("No domain index is available to search")
+        # The deadline starts now, with every index loaded
+        futures = {
+            self._executor.submit(vectorstore.similarity_search_with_score_by_vector, embedding, k=k): domain
+            for domain, vectorstore in vectorstores.items()
+        }
+        done, not_done = wait(futures, timeout=self.timeout)
+
+        merged = {}
+        with self._lock:
+            self.searches += 1
+            for future in not_done:
+                self.timeouts[futures[future]] += 1
+        for future in not_done:
+            print(f"⏳ Federated search skipped domain {futures[future]} after {self.timeout}s")
+
+        answered = 0
+        for future in done:
+            domain = futures[future]
+            try:
+                hits = future.result()
+            except Exception as e:
+                with self._lock:
+                    self.errors[domain] += 1
+                print(f"❌ Federated search failed for domain {domain}: {str(e)}")
+                continue
+            answered += 1
+            for doc, distance in hits:
+                relevance = distance_to_relevance(distance)
+                key = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+                if key in merged and merged[key][1] >= relevance:
+                    continue
+                # Copy so tagging the domain never touches the shared docstore entry
+                tagged = Document(
+                    id=getattr(doc, "id", None),
+                    page_content=doc.page_content,
+                    metadata={**doc.metadata, "domain": domain},
+                )
+                merged[key] = (tagged, relevance)
+
+        if not answered:
+            if not_done:
+                raise FederatedTimeoutError(f"No domain index answered within {self.timeout}s")
+            raise FederatedSearchError("Every domain index failed to search")
+        return sorted(merged.values(), key=lambda hit: hit[1], reverse=True)[:k]
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "domains": list(self.domains),
+                "searches": self.searches,
+                "timeouts": sum(self.timeouts.values()),
+                "errors": sum(self.errors.values()),
+                "timeouts_by_domain": dict(self.timeouts),
+            }
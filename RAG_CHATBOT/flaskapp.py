@@ -1,37 +1,62 @@
 import os
+import atexit
 import json
 import secrets
 from datetime import timedelta
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, render_template, session, stream_with_context
 from flask_cors import CORS
-from pymongo import MongoClient
-from flask_session import Session
-from langchain_community.vectorstores import FAISS
 from werkzeug.security import check_password_hash, generate_password_hash
 from bson.binary import Binary
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, GoogleGenerativeAI
+from domains import DOMAIN_INDEXES
+from vectorstore_cache import VectorStoreCache
+from llm import LazyLLM, LLMGateway, LLMBusyError, LLMTimeoutError, create_llm
+from chat_store import ChatHistoryStore, ChatStoreBusyError, WriteBehindChatStore
+from federated import FederatedRetriever, FederatedSearchError, FederatedTimeoutError
+from mongo_client import ProcessLocalClient
+from mongo_indexes import prepare_database
+from session_store import init_sessions
+from singleflight import SingleFlight
+from metrics import STAGE_SECONDS, init_metrics, record_prompt_tokens, stats_collector, timed
+import gc
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# LangChain, FAISS, numpy and the model SDKs are imported where they are first needed, so importing
+# this module (and serving login and static pages) stays fast and a pre-fork master stays small
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URI)
+# Connects on first use in each process, so workers forked from a preloaded master never share sockets
+client = ProcessLocalClient(MONGO_URI)
 db = client["intellisphere6"]
 users_collection = db["users"]
 chat_history_collection = db["chat_histories"]
+chat_history_buckets_collection = db["chat_history_buckets"]
 
 app = Flask(__name__, static_folder="static")
 CORS(app)
-app.secret_key = secrets.token_hex(32)
-
-app.config["SESSION_TYPE"] = "mongodb"
-app.config["SESSION_MONGODB"] = client
-app.config["SESSION_MONGODB_DB"] = "intellisphere6"
-app.config["SESSION_MONGODB_COLLECTION"] = "sessions"
-app.config["SESSION_PERMANENT"] = True
+# Set SECRET_KEY when running several workers with cookie sessions, so they all accept each other's cookies
+app.secret_key = os.getenv("SECRET_KEY") or secrets.token_hex(32)
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(days=31)
-Session(app)
+
+# "mongo": server-side sessions with an in-process cache; "cookie": signed cookie holding only the login
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "mongo")
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "5"))
+SESSION_REFRESH_INTERVAL = float(os.getenv("SESSION_REFRESH_INTERVAL", "86400"))
+if SESSION_BACKEND == "cookie" and not os.getenv("SECRET_KEY"):
+    print("⚠️ SESSION_BACKEND=cookie without SECRET_KEY: sessions end on restart and are not shared between workers")
+session_store = init_sessions(
+    app, SESSION_BACKEND, db["sessions"], cache_ttl=SESSION_CACHE_TTL, refresh_interval=SESSION_REFRESH_INTERVAL
+)
+
+REQUEST_TIMING_LOG = os.getenv("REQUEST_TIMING_LOG", "false").lower() in ("1", "true", "yes")
+init_metrics(app, timing_log=REQUEST_TIMING_LOG)
+
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes")
+MONGO_CHECK_QUERY_PLANS = os.getenv("MONGO_CHECK_QUERY_PLANS", "true").lower() in ("1", "true", "yes")
 
 @app.route("/signup", methods=["POST"])
 def signup():
@@ -43,16 +68,20 @@ def signup():
     if not firstname or not email or not password:
         return jsonify({"success": False, "message": "All fields are required."})
 
-    if users_collection.find_one({"email": email}):
+    with timed("mongo_find_user"):
+        existing_user = users_collection.find_one({"email": email})
+    if existing_user:
         return jsonify({"success": False, "message": "Email already exists!"})
 
-    hashed_password = generate_password_hash(password)
+    with timed("password_hash"):
+        hashed_password = generate_password_hash(password)
 
-    users_collection.insert_one({
-        "firstname": firstname,
-        "email": email,
-        "password": hashed_password
-    })
+    with timed("mongo_insert_user"):
+        users_collection.insert_one({
+            "firstname": firstname,
+            "email": email,
+            "password": hashed_password
+        })
 
     return jsonify({"success": True, "message": "Signup successful!"})
 
@@ -67,10 +96,14 @@ def login():
         if not email or not password:
             return jsonify({"success": False, "message": "Both email and password are required."})
 
-        user = users_collection.find_one({"email": email})
+        with timed("mongo_find_user"):
+            user = users_collection.find_one({"email": email})
 
-        if user and check_password_hash(user["password"], password):
+        with timed("password_check"):
+            password_ok = bool(user) and check_password_hash(user["password"], password)
+        if password_ok:
             session["user"] = email
+            session.permanent = True
             return jsonify({"success": True, "message": "Login successful!"})
 
         return jsonify({"success": False, "message": "Invalid email or password."})
@@ -79,28 +112,126 @@ def login():
 
 @app.route("/logout", methods=["POST"])
 def logout():
-    session.pop("user", None)
+    session.clear()
     return jsonify({"message": "Logged out successfully!"})
 
-DOMAIN_INDEXES = {
-    "health": "faiss_indexes/health",
-    "law": "faiss_indexes/law",
-    "finance": "faiss_indexes/finance",
-    "technology": "faiss_indexes/technology",
-    "education": "faiss_indexes/education",
-    "research": "faiss_indexes/research",
-    "home": "faiss_indexes/general" 
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "huggingface")
+# Unix socket of embedding_server.py; when set, workers share its model instead of loading their own
+EMBEDDING_SERVICE_SOCKET = os.getenv("EMBEDDING_SERVICE_SOCKET", "")
+WARMUP_VECTORSTORES = os.getenv("WARMUP_VECTORSTORES", "false").lower() in ("1", "true", "yes")
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", "4"))
+# Load the embedder and every index in create_app(); under gunicorn --preload that happens once in the master
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() in ("1", "true", "yes")
+MMAP_DOCSTORE = os.getenv("MMAP_DOCSTORE", "true").lower() in ("1", "true", "yes")
+FEDERATED_HOME = os.getenv("FEDERATED_HOME", "false").lower() in ("1", "true", "yes")
+FEDERATED_DOMAINS = [
+    domain.strip() for domain in os.getenv("FEDERATED_DOMAINS", ",".join(DOMAIN_INDEXES)).split(",")
+    if domain.strip() in DOMAIN_INDEXES
+]
+FEDERATED_TIMEOUT = float(os.getenv("FEDERATED_TIMEOUT", "1.0"))
+# Loading a cold index is not counted against FEDERATED_TIMEOUT; this bounds the wait for it instead
+FEDERATED_LOAD_TIMEOUT = float(os.getenv("FEDERATED_LOAD_TIMEOUT", "120"))
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+ANSWER_CACHE_BACKEND = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", "0.05"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+FAKE_LLM_DELAY = float(os.getenv("FAKE_LLM_DELAY", "0.5"))
+HISTORY_CONTEXT_TURNS = 2
+RETRIEVAL_FETCH_K = int(os.getenv("RETRIEVAL_FETCH_K", "6"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1000"))
+HISTORY_BUCKET_SIZE = int(os.getenv("HISTORY_BUCKET_SIZE", "100"))
+# Acknowledge chat turns before they reach MongoDB and write them in batches
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+CHAT_WRITE_DURABILITY = os.getenv("CHAT_WRITE_DURABILITY", "async")
+CHAT_FLUSH_INTERVAL = float(os.getenv("CHAT_FLUSH_INTERVAL", "0.05"))
+CHAT_FLUSH_SIZE = int(os.getenv("CHAT_FLUSH_SIZE", "500"))
+MAX_HISTORY_PAGE_SIZE = 200
+SESSION_PAGE_SIZE = 50
+MAX_SESSION_PAGE_SIZE = 200
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+# Identical first questions in a domain that arrive together share one retrieval and one model call
+CHAT_COALESCING = os.getenv("CHAT_COALESCING", "true").lower() in ("1", "true", "yes")
+# Followers outlast the leader's own LLM_TIMEOUT so they receive its answer or its error
+COALESCE_WAIT_TIMEOUT = LLM_TIMEOUT + 5
+
+chat_store = ChatHistoryStore(chat_history_collection, chat_history_buckets_collection, HISTORY_BUCKET_SIZE)
+if CHAT_WRITE_BEHIND:
+    chat_store = WriteBehindChatStore(
+        chat_store,
+        flush_interval=CHAT_FLUSH_INTERVAL,
+        flush_size=CHAT_FLUSH_SIZE,
+        durability=CHAT_WRITE_DURABILITY,
+        on_flush=lambda seconds, turns: STAGE_SECONDS.labels("background", "", "chat_history_flush").observe(seconds),
+    )
+    atexit.register(chat_store.close)
+_context_assembler = None
+
+def get_context_assembler():
+    global _context_assembler
+    if _context_assembler is None:
+        from context_assembler import ContextAssembler
+        _context_assembler = ContextAssembler(token_budget=CONTEXT_TOKEN_BUDGET)
+    return _context_assembler
+
+VECTORSTORE_CACHE_MB = int(os.getenv("VECTORSTORE_CACHE_MB", "0"))
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "30"))
+
+vectorstore_status = {
+    domain: {"state": "pending" if WARMUP_VECTORSTORES or PRELOAD_MODELS else "lazy", "load_seconds": None}
+    for domain in DOMAIN_INDEXES
 }
 
-vectorstore_cache = {}
+_embedder = None
+_embedder_lock = threading.Lock()
+
+def embedding_model_name():
+    from embedding_cache import FAKE_EMBEDDING_MODEL
+    return FAKE_EMBEDDING_MODEL if EMBEDDING_PROVIDER == "fake" else "all-MiniLM-L6-v2"
+
+def get_embedder():
+    """Return the process-wide sentence transformers embedder, creating it on first use"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from embedding_cache import CachedEmbeddings, create_embedder
+                model_name = embedding_model_name()
+                if EMBEDDING_SERVICE_SOCKET:
+                    from embedding_server import ServiceEmbeddings
+                    embedder = ServiceEmbeddings(
+                        EMBEDDING_SERVICE_SOCKET,
+                        model_name,
+                        lambda: create_embedder(EMBEDDING_PROVIDER, model_name),
+                    )
+                else:
+                    embedder = create_embedder(EMBEDDING_PROVIDER, model_name)
+                _embedder = CachedEmbeddings(embedder, max_size=QUERY_EMBEDDING_CACHE_SIZE)
+    return _embedder
+
+_embedding_dimension = None
+
+def embedding_dimension():
+    """Vector size produced by the shared embedder, measured once"""
+    global _embedding_dimension
+    if _embedding_dimension is None:
+        _embedding_dimension = len(get_embedder().embedder.embed_query("dimension probe"))
+    return _embedding_dimension
+
+def _load_index_from_disk(domain, index_path):
+    """Load a FAISS index from disk with the shared embedder; the cache calls this on a miss or reload"""
+    from langchain_community.vectorstores import FAISS
+    from ann_index import apply_search_params
+    from index_builder import check_index_compatibility, load_manifest
+    from mmap_docstore import has_current_docstore, load_mmap_vectorstore
 
-def load_vectorstore(domain):
-    """Load the FAISS index for the specified domain using sentence transformers embedding model"""
-   
-    if domain in vectorstore_cache:
-        return vectorstore_cache[domain]
-    
-    index_path = DOMAIN_INDEXES.get(domain, DOMAIN_INDEXES["home"])
     abs_path = os.path.abspath(index_path)
     faiss_file = f"{index_path}/index.faiss"
     pkl_file = f"{index_path}/index.pkl"
@@ -110,21 +241,212 @@ def load_vectorstore(domain):
     print(f"PKL file exists: {os.path.exists(pkl_file)}")
     
     try:
-        from langchain_community.embeddings import HuggingFaceEmbeddings
-        embedder = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        start = time.perf_counter()
+        with timed("embedder_init"):
+            embedder = get_embedder()
         
-        if os.path.exists(f"{index_path}/index.faiss") and os.path.exists(f"{index_path}/index.pkl"):
-            vectorstore = FAISS.load_local(index_path, embedder, allow_dangerous_deserialization=True)
-            vectorstore_cache[domain] = vectorstore
+        with timed("index_load", domain):
+            if MMAP_DOCSTORE and os.path.exists(faiss_file) and has_current_docstore(index_path):
+                vectorstore = load_mmap_vectorstore(index_path, embedder)
+                print(f"🗺️ Using memory-mapped docstore for domain: {domain}")
+            elif os.path.exists(faiss_file) and os.path.exists(pkl_file):
+                vectorstore = FAISS.load_local(index_path, embedder, allow_dangerous_deserialization=True)
+            else:
+                vectorstore = None
+        
+        if vectorstore is not None:
+            mismatch = check_index_compatibility(
+                index_path, embedding_model_name(), embedding_dimension(), index_dimension=vectorstore.index.d
+            )
+            if mismatch:
+                vectorstore_status[domain] = {"state": "mismatch", "load_seconds": None, "reason": mismatch}
+                print(f"❌ Refusing FAISS index for domain {domain}: {mismatch}")
+                return None
+            manifest = load_manifest(index_path) or {}
+            apply_search_params(vectorstore.index, manifest.get("index", {}).get("search"))
+            vectorstore_status[domain] = {"state": "ready", "load_seconds": round(time.perf_counter() - start, 3)}
             print(f"✅ Loaded FAISS index for domain: {domain} using sentence_transformers embeddings")
             return vectorstore
         else:
+            vectorstore_status[domain] = {"state": "missing", "load_seconds": None}
             print(f"❌ No FAISS index found for domain: {domain} at path: {index_path}")
             return None
     except Exception as e:
+        vectorstore_status[domain] = {"state": "error", "load_seconds": None}
         print(f"❌ Error loading vectorstore for domain {domain}: {str(e)}")
         return None
 
+def _mark_evicted(domain):
+    vectorstore_status[domain] = {"state": "evicted", "load_seconds": None}
+
+vectorstore_cache = VectorStoreCache(
+    _load_index_from_disk,
+    max_bytes=VECTORSTORE_CACHE_MB * 1024 * 1024,
+    check_interval=INDEX_RELOAD_INTERVAL,
+    on_evict=_mark_evicted,
+)
+
+def load_vectorstore(domain):
+    """Load the FAISS index for the specified domain using sentence transformers embedding model"""
+    if domain not in DOMAIN_INDEXES:
+        domain = "home"
+    with timed("load_vectorstore", domain):
+        return vectorstore_cache.get(domain, DOMAIN_INDEXES[domain])
+
+def create_federated_retriever():
+    if not FEDERATED_HOME:
+        return None
+    return FederatedRetriever(load_vectorstore, FEDERATED_DOMAINS, timeout=FEDERATED_TIMEOUT,
+                              load_timeout=FEDERATED_LOAD_TIMEOUT)
+
+federated_retriever = create_federated_retriever()
+
+def get_retriever(domain):
+    """The home assistant searches every domain index when federation is on; other domains use their own index"""
+    if federated_retriever is not None and (domain == "home" or domain not in DOMAIN_INDEXES):
+        return federated_retriever
+    return load_vectorstore(domain)
+
+def warm_up_domain(domain):
+    """Load one domain index and run a dummy query so the first real request is fast"""
+    if domain not in vectorstore_cache:
+        vectorstore_status[domain] = {"state": "loading", "load_seconds": None}
+    vectorstore = load_vectorstore(domain)
+    if vectorstore is not None:
+        try:
+            vectorstore.similarity_search("warm up", k=1)
+        except Exception as e:
+            # The index is loaded and keeps serving; record the failure without marking the domain down
+            vectorstore_status[domain]["warmup_error"] = str(e)
+            print(f"❌ Warm-up query failed for domain {domain}: {str(e)}")
+    return vectorstore_status[domain]["state"]
+
+def warm_up_vectorstores():
+    """Load every domain index in parallel behind the shared embedder"""
+    start = time.perf_counter()
+    get_embedder()
+    with ThreadPoolExecutor(max_workers=WARMUP_WORKERS) as executor:
+        states = dict(zip(DOMAIN_INDEXES, executor.map(warm_up_domain, DOMAIN_INDEXES)))
+    print(f"🔥 Warm-up finished in {time.perf_counter() - start:.2f}s: {states}")
+    return states
+
+_preloaded = False
+_background_pid = None
+_background_lock = threading.Lock()
+
+def preload_models():
+    """Load the embedder and every domain index in the foreground.
+
+    Called from create_app(), so under ``preload_app`` it runs once in the
+    gunicorn master and the forked workers share the model weights and the
+    index pages copy-on-write instead of each loading their own.
+    """
+    global _preloaded
+    if _preloaded:
+        return
+    warm_up_vectorstores()
+    embedding_dimension()
+    # Keep the preloaded objects out of later collections, so the GC does not touch (and copy) their pages in workers
+    gc.freeze()
+    _preloaded = True
+
+def start_background_work():
+    """Start this process's index preparation and warm-up threads, once per process.
+
+    Threads do not survive a fork, so this runs in each worker (gunicorn's
+    post_worker_init hook, or the first request) rather than at import.
+    """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    with _background_lock:
+        if _background_pid == os.getpid():
+            return
+        _background_pid = os.getpid()
+        if MONGO_ENSURE_INDEXES:
+            # In the background so an unreachable MongoDB does not block startup
+            threading.Thread(
+                target=prepare_database, args=(db, MONGO_CHECK_QUERY_PLANS), name="mongo-indexes", daemon=True
+            ).start()
+        if WARMUP_VECTORSTORES and not _preloaded:
+            threading.Thread(target=warm_up_vectorstores, name="vectorstore-warmup", daemon=True).start()
+
+app.before_request(start_background_work)
+
+def create_app():
+    """WSGI entry point (``flaskapp:create_app()``); preloads models first when PRELOAD_MODELS is set"""
+    if PRELOAD_MODELS:
+        preload_models()
+    return app
+
+def is_ready():
+    """A worker is ready once no domain is still waiting for or in its first load.
+
+    A domain whose index is missing, mismatched or failed to load is reported
+    under "degraded" instead: the other domains still serve, so one bad index
+    must not take the whole worker out of the load balancer.
+    """
+    return not any(status["state"] in ("pending", "loading") for status in vectorstore_status.values())
+
+def degraded_domains():
+    return sorted(
+        domain for domain, status in vectorstore_status.items()
+        if status["state"] in ("mismatch", "error") or status.get("warmup_error")
+    )
+
+@app.route("/ready")
+def ready():
+    body = {
+        "ready": is_ready(),
+        "degraded": degraded_domains(),
+        "warmup": WARMUP_VECTORSTORES,
+        "domains": vectorstore_status,
+        "cache": vectorstore_cache.stats(),
+        "embedding_cache": _embedder.stats() if _embedder is not None else None,
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "llm": llm_gateway.stats(),
+        "chat_write_behind": chat_store.stats() if CHAT_WRITE_BEHIND else None,
+        "coalescing": {"retrieval": retrieval_flight.stats(), "generation": generation_flight.stats()},
+        "federated": federated_retriever.stats() if federated_retriever is not None else None,
+        "sessions": session_store.stats() if session_store is not None else None,
+    }
+    return jsonify(body), 200 if body["ready"] else 503
+
+def create_answer_cache():
+    """Build the optional semantic answer cache from the ANSWER_CACHE_* settings"""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    from answer_cache import InMemoryAnswerStore, MongoAnswerStore, SemanticAnswerCache
+    store = MongoAnswerStore(db["answer_cache"]) if ANSWER_CACHE_BACKEND == "mongo" else InMemoryAnswerStore()
+    return SemanticAnswerCache(
+        store,
+        max_distance=ANSWER_CACHE_MAX_DISTANCE,
+        ttl_seconds=ANSWER_CACHE_TTL,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    )
+
+answer_cache = create_answer_cache()
+
+llm_gateway = LLMGateway(
+    LazyLLM(lambda: create_llm(LLM_PROVIDER, model=LLM_MODEL, timeout=LLM_TIMEOUT, fake_delay=FAKE_LLM_DELAY)),
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_queue=LLM_MAX_QUEUE,
+    timeout=LLM_TIMEOUT,
+)
+
+stats_collector.add("vectorstore_cache", vectorstore_cache.stats)
+stats_collector.add("session_cache", lambda: session_store.stats() if session_store is not None else None)
+stats_collector.add("embedding_cache", lambda: _embedder.stats() if _embedder is not None else None)
+stats_collector.add("answer_cache", lambda: answer_cache.stats() if answer_cache is not None else None)
+stats_collector.add("llm", llm_gateway.stats)
+stats_collector.add("chat_write_behind", lambda: chat_store.stats() if CHAT_WRITE_BEHIND else None)
+
+retrieval_flight = SingleFlight()
+generation_flight = SingleFlight()
+stats_collector.add("coalesced_retrieval", retrieval_flight.stats)
+stats_collector.add("coalesced_generation", generation_flight.stats)
+stats_collector.add("federated", lambda: federated_retriever.stats() if federated_retriever is not None else None)
+
 def get_domain_from_request():
     """Extract the domain from the request"""
     if request.is_json:
@@ -141,19 +463,20 @@ def get_domain_from_request():
     
     return "home"
 
-@app.route("/chat", methods=["POST"])
-def chat():
-    if "user" not in session:
-        return jsonify({"error": "Please log in to continue"}), 401
-        
-    user_email = session["user"]
-    data = request.json
-    query = data.get("query", "")
-    session_id = data.get("session_id")
-    
-    if not session_id:
-        return jsonify({"error": "Session ID is required"}), 400
-    
+def int_field(data, name, default=None):
+    """An integer from the JSON body, ``default`` if missing or null; raises ValueError naming the field if it is not a whole number"""
+    value = data.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(f"{name} must be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+def resolve_chat_domain(data):
+    """Pick the chat domain from the request body, falling back to the referring page"""
     raw_referrer = request.headers.get('Referer', '')
     domain = "home"
     
@@ -164,61 +487,43 @@ def chat():
     
     if data.get("domain"):
         domain = data.get("domain")
+    return domain
+
+def load_recent_history(history_filter):
+    """Return the last turns needed for prompt context, creating an empty session record if needed"""
+    exists, history = chat_store.recent_messages(history_filter, HISTORY_CONTEXT_TURNS)
     
-    print(f"Processing chat for user: {user_email}, domain: {domain}, session: {session_id}, query: {query}")
-    
-    retriever = load_vectorstore(domain)
-    if not retriever:
-        return jsonify({"error": f"FAISS index not loaded for domain: {domain}!"})
+    if not exists:
+        chat_store.create_session(history_filter)
+        print(f"Created new session record for {history_filter['session_id']}")
+    else:
+        print(f"Found existing session {history_filter['session_id']} ({len(history)} recent messages loaded)")
+    return history
 
-    try:
-        history_filter = {
-            "user_email": user_email,
-            "domain": domain,
-            "session_id": session_id
-        }
-        
-        user_history = chat_history_collection.find_one(history_filter)
-        
-        if not user_history:
-            chat_history_collection.insert_one({
-                "user_email": user_email,
-                "domain": domain,
-                "session_id": session_id,
-                "messages": [],
-                "created_at": int(time.time())  
-            })
-            history = []
-            print(f"Created new session record for {session_id}")
-        else:
-            history = user_history.get("messages", [])
-            print(f"Found existing session {session_id} with {len(history)} messages")
-        
-        relevant_docs = retriever.similarity_search(query, k=3)  
-        context = "\n\n".join([doc.page_content for doc in relevant_docs])
-        
-        conversation_context = ""
-        if len(history) > 0:
-            recent_history = history[-2:] if len(history) > 2 else history
-            conversation_parts = []
-            for h in recent_history:
-                conversation_parts.append(f"Previous User Question: {h['user']}")
-                conversation_parts.append(f"Previous Assistant Response: {h['bot'][:200]}...")  # Truncate long responses
-            conversation_context = "\n".join(conversation_parts)
-        
-        if conversation_context:
-            context_section = f"""
+def assemble_context(domain, retrieved_docs, history):
+    """Merge, dedupe and trim the retrieved chunks and history to CONTEXT_TOKEN_BUDGET"""
+    assembly = get_context_assembler().assemble(retrieved_docs, history)
+    print(f"🧮 Context for {domain}: {assembly.summary()}")
+    return assembly
+
+def build_prompt(domain, query, assembly):
+    """Assemble the grounded prompt from the assembled chunks and recent session turns"""
+    context = assembly.text
+    conversation_context = "\n".join(assembly.history_lines)
+    
+    if conversation_context:
+        context_section = f"""
 🧠 SESSION CONTEXT (for continuity only):
 {conversation_context}
 
 ⚠️ IMPORTANT: This is a NEW question. Provide a fresh, complete answer. Do not assume the user is continuing the exact same topic unless explicitly stated.
 """
-        else:
-            context_section = """
+    else:
+        context_section = """
 🧠 SESSION STATUS: This is the beginning of a new conversation session.
 """
-        
-        strict_prompt = f"""
+    
+    return f"""
 You are IntelliSphere, an expert AI assistant specializing in {domain.capitalize()} knowledge.
 
 ---
@@ -253,30 +558,356 @@ You are IntelliSphere, an expert AI assistant specializing in {domain.capitalize
 
 Please provide a helpful, accurate response to the user's question:
 """
+
+def log_prompt_size(domain, prompt):
+    from context_assembler import estimate_tokens
+    tokens = estimate_tokens(prompt)
+    record_prompt_tokens(domain, tokens)
+    print(f"📏 Prompt for {domain}: ~{tokens} tokens")
+
+def lookup_cached_answer(domain, query_vector, chunk_ids, bypass_cache):
+    """Return a cached answer for this query and context, or None"""
+    if answer_cache is None:
+        return None
+    if bypass_cache:
+        answer_cache.note_bypass()
+        return None
+    cached_answer = answer_cache.lookup(domain, query_vector, chunk_ids)
+    if cached_answer:
+        print(f"Answer cache hit for domain {domain}: {cached_answer['query']}")
+        return cached_answer["answer"]
+    return None
+
+def save_turn(history_filter, new_message):
+    """Append a completed turn to the session with a single atomic push"""
+    chat_store.append_turn(history_filter, new_message)
+    print(f"Appended turn to session {history_filter['session_id']}")
+
+class ChatTurn:
+    """Everything gathered for one chat turn before the model is called"""
+
+    def __init__(self, user_email, data):
+        self.query = data.get("query", "")
+        self.session_id = data.get("session_id")
+        self.bypass_cache = bool(data.get("bypass_cache", False))
+        self.domain = resolve_chat_domain(data)
+        # Unknown domains are served from the home index; caches key on the index actually searched
+        self.index_domain = self.domain if self.domain in DOMAIN_INDEXES else "home"
+        self.history_filter = {
+            "user_email": user_email,
+            "domain": self.domain,
+            "session_id": self.session_id
+        }
+        self.history = []
+        self.query_vector = None
+        self.relevant_docs = []
+        self.chunk_ids = []
+        self.prompt = None
+        self.coalesced = False
+
+    @property
+    def coalescable(self):
+        # With history the prompt is specific to this session, so there is nothing to share
+        return CHAT_COALESCING and not self.history
+
+    def _retrieve(self, retriever):
+        with timed("query_embedding", self.index_domain):
+            query_vector = get_embedder().embed_query(self.query)
+        with timed("faiss_search", self.index_domain):
+            retrieved = retriever.similarity_search_by_vector(query_vector, k=RETRIEVAL_FETCH_K)
+        return query_vector, retrieved
+
+    def prepare(self, retriever):
+        """Load the session, retrieve context and build the prompt"""
+        with timed("mongo_history_read", self.index_domain):
+            self.history = load_recent_history(self.history_filter)
+        if self.coalescable:
+            # Same normalization as the query embedding cache, so "What is GST?" and "what is gst" share a flight
+            from embedding_cache import normalize_query
+            key = (self.domain, normalize_query(self.query))
+            (self.query_vector, retrieved), self.coalesced = retrieval_flight.do(
+                key, lambda: self._retrieve(retriever), timeout=COALESCE_WAIT_TIMEOUT
+            )
+        else:
+            self.query_vector, retrieved = self._retrieve(retriever)
+        with timed("prompt_assembly", self.index_domain):
+            assembly = assemble_context(self.index_domain, retrieved, self.history)
+            self.relevant_docs = assembly.docs
+            self.prompt = build_prompt(self.domain, self.query, assembly)
+        from answer_cache import document_ids
+        self.chunk_ids = document_ids(self.relevant_docs)
+        log_prompt_size(self.index_domain, self.prompt)
+
+    def cached_answer(self):
+        # Cached answers were generated without history, so they cannot answer a follow-up
+        if self.history:
+            return None
+        with timed("answer_cache_lookup", self.index_domain):
+            return lookup_cached_answer(self.index_domain, self.query_vector, self.chunk_ids, self.bypass_cache)
+
+    def remember_answer(self, response, generation_seconds):
+        # Only context-free answers are reusable across sessions
+        if answer_cache is not None and not self.history:
+            answer_cache.add(self.index_domain, self.query, self.query_vector, self.chunk_ids, response, generation_seconds)
+
+    def _generate(self):
+        response = self.cached_answer()
+        if response is None:
+            llm_start = time.perf_counter()
+            with timed("llm_generate", self.index_domain):
+                response = llm_gateway.invoke(self.prompt)
+            self.remember_answer(response, time.perf_counter() - llm_start)
+        return response
+
+    def answer(self):
+        """The model's answer, shared with identical in-flight turns; each caller still saves its own turn"""
+        if not self.coalescable:
+            return self._generate()
+        from embedding_cache import normalize_query
+        # Chunk IDs are part of the key so a turn retrieved from a reloaded index never gets an old answer
+        key = (self.domain, normalize_query(self.query), tuple(self.chunk_ids), self.bypass_cache)
+        response, shared = generation_flight.do(key, self._generate, timeout=COALESCE_WAIT_TIMEOUT)
+        if shared:
+            self.coalesced = True
+            print(f"🔗 Shared an in-flight answer for domain {self.domain}: {self.query}")
+        return response
+
+    def save(self, response):
+        new_message = {"user": self.query, "bot": response}
+        with timed("mongo_history_write", self.index_domain):
+            save_turn(self.history_filter, new_message)
+        return new_message
+
+@app.route("/chat", methods=["POST"])
+def chat():
+    if "user" not in session:
+        return jsonify({"error": "Please log in to continue"}), 401
         
-        llm = GoogleGenerativeAI(model="gemini-2.0-flash")
-        response = llm.invoke(strict_prompt)
-        
-        new_message = {"user": query, "bot": response}
-        history.append(new_message)
-        
-        # Update the chat history in the database
-        update_result = chat_history_collection.update_one(
-            history_filter,
-            {"$set": {"messages": history, "last_updated": int(time.time())}},
-            upsert=True
-        )
-        
-        print(f"Updated session {session_id}: matched={update_result.matched_count}, modified={update_result.modified_count}")
+    user_email = session["user"]
+    data = request.json
+    turn = ChatTurn(user_email, data)
+    
+    if not turn.session_id:
+        return jsonify({"error": "Session ID is required"}), 400
+    
+    print(f"Processing chat for user: {user_email}, domain: {turn.domain}, session: {turn.session_id}, query: {turn.query}")
+    
+    retriever = get_retriever(turn.domain)
+    if not retriever:
+        return jsonify({"error": f"FAISS index not loaded for domain: {turn.domain}!"})
+
+    try:
+        turn.prepare(retriever)
+        response = turn.answer()
+        new_message = turn.save(response)
         
-        return jsonify({"history": history})
+        # Only the new turn is returned; "history" keeps its old shape for existing clients
+        return jsonify({"message": new_message, "history": [new_message]})
         
+    except FederatedTimeoutError as e:
+        print(f"Federated search timed out for session {turn.session_id}: {str(e)}")
+        return jsonify({"error": "Search took too long, please try again."}), 504
+    except (LLMBusyError, ChatStoreBusyError, FederatedSearchError) as e:
+        return jsonify({"error": str(e)}), 503
+    except (LLMTimeoutError, TimeoutError) as e:
+        print(f"Model call timed out for session {turn.session_id}: {str(e)}")
+        return jsonify({"error": "The assistant took too long to respond, please try again."}), 504
     except Exception as e:
         print(f"Error processing query: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({"error": f"Error processing query: {str(e)}"}), 500
 
+def sse_event(event, payload):
+    """Format one Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """Streaming variant of /chat: retrieval and token events over SSE, persisted once the stream ends"""
+    if "user" not in session:
+        return jsonify({"error": "Please log in to continue"}), 401
+        
+    user_email = session["user"]
+    data = request.json
+    turn = ChatTurn(user_email, data)
+    
+    if not turn.session_id:
+        return jsonify({"error": "Session ID is required"}), 400
+    
+    print(f"Streaming chat for user: {user_email}, domain: {turn.domain}, session: {turn.session_id}, query: {turn.query}")
+    
+    retriever = get_retriever(turn.domain)
+    if not retriever:
+        return jsonify({"error": f"FAISS index not loaded for domain: {turn.domain}!"})
+
+    def generate():
+        try:
+            turn.prepare(retriever)
+            yield sse_event("retrieval", {"domain": turn.domain, "chunks": len(turn.relevant_docs)})
+            
+            response = turn.cached_answer()
+            if response is not None:
+                yield sse_event("token", {"text": response, "cached": True})
+            else:
+                llm_start = time.perf_counter()
+                parts = []
+                for chunk in llm_gateway.stream(turn.prompt):
+                    if not parts:
+                        STAGE_SECONDS.labels("chat_stream", turn.index_domain, "llm_first_token").observe(
+                            time.perf_counter() - llm_start
+                        )
+                    parts.append(chunk)
+                    yield sse_event("token", {"text": chunk})
+                STAGE_SECONDS.labels("chat_stream", turn.index_domain, "llm_generate").observe(
+                    time.perf_counter() - llm_start
+                )
+                response = "".join(parts)
+                turn.remember_answer(response, time.perf_counter() - llm_start)
+            
+            new_message = turn.save(response)
+            yield sse_event("done", {"message": new_message})
+        except GeneratorExit:
+            print(f"Client disconnected from stream for session {turn.session_id}; turn not saved")
+            raise
+        except (LLMBusyError, LLMTimeoutError, ChatStoreBusyError, FederatedSearchError) as e:
+            yield sse_event("error", {"error": str(e)})
+        except Exception as e:
+            print(f"Error streaming query: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            yield sse_event("error", {"error": f"Error processing query: {str(e)}"})
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers=headers)
+
+def serialize_chunk(doc):
+    from answer_cache import document_ids
+    return {"id": document_ids([doc])[0], "content": doc.page_content, "metadata": doc.metadata}
+
+def answer_queries(domain, queries, k=None, history_filter=None, bypass_cache=False):
+    """Answer many standalone questions for one domain in a single pass.
+
+    All queries are embedded in one batched call and searched with one
+    multi-vector FAISS search for ``k`` (default RETRIEVAL_FETCH_K) chunks each,
+    trimmed to the context budget; the model is then called once per distinct
+    prompt among the cache misses, at most BATCH_LLM_CONCURRENCY at a time. Each turn is appended to the
+    session in ``history_filter`` when one is given. Returns one dict per query
+    with the answer (or an error) and the retrieved chunks, or None when the
+    domain has no index loaded.
+    """
+    from answer_cache import document_ids
+    from batch_search import search_many
+
+    index_domain = domain if domain in DOMAIN_INDEXES else "home"
+    retriever = get_retriever(domain)
+    if not retriever:
+        return None
+
+    with timed("query_embedding", index_domain):
+        vectors = get_embedder().embed_queries(queries)
+    with timed("faiss_search", index_domain):
+        docs_per_query = search_many(retriever, vectors, k=k or RETRIEVAL_FETCH_K)
+
+    results = []
+    # prompt -> [(result, vector, chunk_ids)]; repeated questions in one batch share a model call
+    pending = {}
+    for query, vector, retrieved in zip(queries, vectors, docs_per_query):
+        with timed("prompt_assembly", index_domain):
+            assembly = assemble_context(index_domain, retrieved, [])
+            docs = assembly.docs
+            prompt = build_prompt(domain, query, assembly)
+        chunk_ids = document_ids(docs)
+        answer = lookup_cached_answer(index_domain, vector, chunk_ids, bypass_cache)
+        result = {
+            "query": query,
+            "answer": answer,
+            "cached": answer is not None,
+            "chunks": [serialize_chunk(doc) for doc in docs],
+        }
+        results.append(result)
+        if answer is None:
+            log_prompt_size(index_domain, prompt)
+            pending.setdefault(prompt, []).append((result, vector, chunk_ids))
+
+    def generate(prompt, items):
+        llm_start = time.perf_counter()
+        try:
+            answer = llm_gateway.invoke(prompt)
+        except (LLMBusyError, LLMTimeoutError) as e:
+            error = str(e)
+        except Exception as e:
+            print(f"Error answering batched query: {str(e)}")
+            error = f"Error processing query: {str(e)}"
+        else:
+            for result, _, _ in items:
+                result["answer"] = answer
+            if answer_cache is not None:
+                result, vector, chunk_ids = items[0]
+                answer_cache.add(index_domain, result["query"], vector, chunk_ids, answer,
+                                 time.perf_counter() - llm_start)
+            return
+        for result, _, _ in items:
+            result["error"] = error
+
+    if pending:
+        with timed("llm_generate", index_domain):
+            with ThreadPoolExecutor(max_workers=min(BATCH_LLM_CONCURRENCY, len(pending))) as executor:
+                list(executor.map(generate, pending.keys(), pending.values()))
+
+    if history_filter is not None:
+        with timed("mongo_history_write", index_domain):
+            load_recent_history(history_filter)
+            for result in results:
+                if result["answer"] is not None:
+                    save_turn(history_filter, {"user": result["query"], "bot": result["answer"]})
+    return results
+
+@app.route("/chat/batch", methods=["POST"])
+def chat_batch():
+    """Answer a list of questions for one domain; turns are saved only when a session_id is given"""
+    if "user" not in session:
+        return jsonify({"error": "Please log in to continue"}), 401
+
+    user_email = session["user"]
+    data = request.json
+    queries = data.get("queries")
+    if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q.strip() for q in queries):
+        return jsonify({"error": "queries must be a non-empty list of questions"}), 400
+    if len(queries) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} queries per batch"}), 400
+
+    domain = resolve_chat_domain(data)
+    try:
+        k = max(1, min(int_field(data, "k", RETRIEVAL_FETCH_K), 20))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    session_id = data.get("session_id")
+    history_filter = None
+    if session_id and data.get("save_history", True):
+        history_filter = ChatHistoryStore.session_key(user_email, domain, session_id)
+
+    print(f"Processing batch of {len(queries)} queries for user: {user_email}, domain: {domain}")
+    try:
+        results = answer_queries(domain, queries, k=k, history_filter=history_filter,
+                                 bypass_cache=bool(data.get("bypass_cache", False)))
+    except FederatedTimeoutError as e:
+        print(f"Federated search timed out for batch from user {user_email}: {str(e)}")
+        return jsonify({"error": "Search took too long, please try again."}), 504
+    except (ChatStoreBusyError, FederatedSearchError) as e:
+        return jsonify({"error": str(e)}), 503
+    except TimeoutError as e:
+        print(f"Batch timed out for user {user_email}: {str(e)}")
+        return jsonify({"error": "The assistant took too long to respond, please try again."}), 504
+    except Exception as e:
+        print(f"Error processing batch: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Error processing batch: {str(e)}"}), 500
+    if results is None:
+        return jsonify({"error": f"FAISS index not loaded for domain: {domain}!"})
+    return jsonify({"domain": domain, "results": results})
+
 @app.route("/create_new_session", methods=["POST"])
 def create_new_session():
     if "user" not in session:
@@ -292,13 +923,11 @@ def create_new_session():
         session_id = secrets.token_hex(8)
     
     # Create a new session in the database
-    chat_history_collection.insert_one({
-        "user_email": user_email,
-        "domain": domain,
-        "session_id": session_id,
-        "messages": [],
-        "created_at": secrets.token_hex(8)  
-    })
+    try:
+        with timed("mongo_session_create"):
+            chat_store.create_session(ChatHistoryStore.session_key(user_email, domain, session_id))
+    except ChatStoreBusyError as e:
+        return jsonify({"error": str(e)}), 503
     
     return jsonify({"success": True, "session_id": session_id})
 
@@ -311,19 +940,20 @@ def get_session_history():
     data = request.json
     domain = data.get("domain", "home")
     session_id = data.get("session_id")
+    try:
+        before = int_field(data, "before")
+        limit = int_field(data, "limit")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if limit is not None:
+        limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
     
-    user_history = chat_history_collection.find_one({
-        "user_email": user_email,
-        "domain": domain,
-        "session_id": session_id 
-    })
-    
-    if not user_history:
-        history = []
-    else:
-        history = user_history.get("messages", [])
+    with timed("mongo_history_read"):
+        history, next_cursor = chat_store.page(
+            ChatHistoryStore.session_key(user_email, domain, session_id), before=before, limit=limit
+        )
     
-    return jsonify({"history": history})
+    return jsonify({"history": history, "next_cursor": next_cursor})
 
 @app.route("/delete_session", methods=["POST"])
 def delete_session():
@@ -337,19 +967,17 @@ def delete_session():
     
     # Delete the specific session from the database
     if session_id:
-        result = chat_history_collection.delete_one({
-            "user_email": user_email,
-            "domain": domain,
-            "session_id": session_id
-        })
-        print(f"Deleted {result.deleted_count} session(s) for user {user_email}, domain {domain}, session {session_id}")
+        with timed("mongo_history_delete"):
+            deleted_count = chat_store.delete(ChatHistoryStore.session_key(user_email, domain, session_id))
+        print(f"Deleted {deleted_count} session(s) for user {user_email}, domain {domain}, session {session_id}")
     else:
         # If no session ID provided, clear all sessions for this user in this domain
-        result = chat_history_collection.delete_many({
-            "user_email": user_email,
-            "domain": domain
-        })
-        print(f"Deleted {result.deleted_count} session(s) for user {user_email}, domain {domain}")
+        with timed("mongo_history_delete"):
+            deleted_count = chat_store.delete_many({
+                "user_email": user_email,
+                "domain": domain
+            })
+        print(f"Deleted {deleted_count} session(s) for user {user_email}, domain {domain}")
     
     return jsonify({"success": True})
 
@@ -363,14 +991,22 @@ def get_all_sessions():
     data = request.json
     domain = data.get("domain", "home")
     
-    # Get all sessions for this user and domain
+    try:
+        offset = max(0, int_field(data, "offset", 0))
+        limit = max(1, min(int_field(data, "limit", SESSION_PAGE_SIZE), MAX_SESSION_PAGE_SIZE))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Newest sessions first, served from the (user_email, domain, created_at) index
     sessions = chat_history_collection.find({
         "user_email": user_email,
         "domain": domain
-    }, {"session_id": 1, "created_at": 1, "_id": 0})
+    }, {"session_id": 1, "created_at": 1, "_id": 0}).sort("created_at", -1).skip(offset).limit(limit + 1)
     
-    session_list = list(sessions)
-    return jsonify({"sessions": session_list})
+    with timed("mongo_sessions_read"):
+        session_list = list(sessions)
+    next_offset = offset + limit if len(session_list) > limit else None
+    return jsonify({"sessions": session_list[:limit], "next_offset": next_offset})
 
 @app.route("/")
 def login_page():
@@ -409,4 +1045,6 @@ def education():
     return render_template("education.html", domain = "education")
 
 if __name__ == "__main__":
+    create_app()
+    start_background_work()
     app.run(debug=True, use_reloader=False)
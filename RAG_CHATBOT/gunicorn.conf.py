@@ -0,0 +1,43 @@
+"""Gunicorn settings for IntelliSphere.
+
+    gunicorn -c gunicorn.conf.py
+    PRELOAD_MODELS=true WEB_CONCURRENCY=4 gunicorn -c gunicorn.conf.py
+
+With PRELOAD_MODELS the master imports the app and loads the embedder and
+every domain index once (see flaskapp.preload_models); workers are forked from
+it and share those pages copy-on-write. MongoDB clients, background threads and
+thread pools are created in each worker after the fork.
+"""
+import gc
+import os
+
+wsgi_app = "flaskapp:create_app()"
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+# A chat turn waits on the model for up to LLM_TIMEOUT seconds
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("PRELOAD_MODELS", "false").lower() in ("1", "true", "yes")
+
+if preload_app:
+    # Hugging Face tokenizers deadlock if their thread pool was started before the fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def pre_fork(server, worker):
+    # Everything the master allocated is left out of collections, so the workers' GC never writes to those shared pages
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import flaskapp
+
+    flaskapp.start_background_work()
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
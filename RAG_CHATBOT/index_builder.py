@@ -0,0 +1,440 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import faiss
+
+from ann_index import (
+    EXACT_INDEX_NAME,
+    REPORT_NAME,
+    apply_search_params,
+    build_ann_index,
+    compare_with_exact,
+    default_build_params,
+    default_search_params,
+    index_vectors,
+)
+from checksums import file_sha256
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def normalize_model_name(model_name):
+    """Treat "all-MiniLM-L6-v2" and "sentence-transformers/all-MiniLM-L6-v2" as the same model"""
+    return model_name.strip().lower().removeprefix("sentence-transformers/")
+
+
+def load_manifest(index_dir):
+    path = os.path.join(index_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(index_dir, manifest):
+    """Write the manifest atomically so a reader never sees a partial file"""
+    path = os.path.join(index_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def write_index_atomic(index, path):
+    """Write a FAISS index next to ``path`` and rename it into place.
+
+    Servers memory-map index.faiss, so rewriting it in place would pull pages
+    out from under a running search (SIGBUS); a rename leaves their mapping
+    on the old inode.
+    """
+    tmp_path = f"{path}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_vectorstore_atomic(vectorstore, index_dir):
+    """vectorstore.save_local(index_dir), with index.faiss and index.pkl each swapped in by rename"""
+    vectorstore.save_local(index_dir, index_name="index.tmp")
+    for ext in ("faiss", "pkl"):
+        os.replace(os.path.join(index_dir, f"index.tmp.{ext}"), os.path.join(index_dir, f"index.{ext}"))
+
+
+def check_index_compatibility(index_dir, model_name, dimension, index_dimension=None):
+    """Return a description of why an index cannot be queried with this embedder, or None if it can"""
+    manifest = load_manifest(index_dir)
+    if manifest is not None:
+        built_with = manifest.get("embedding_model", "")
+        if normalize_model_name(built_with) != normalize_model_name(model_name):
+            return f"index was built with {built_with} but queries use {model_name}"
+        if manifest.get("dimension") != dimension:
+            return f"index dimension {manifest.get('dimension')} does not match embedder dimension {dimension}"
+    if index_dimension is not None and index_dimension != dimension:
+        return f"index vectors have {index_dimension} dimensions but the embedder produces {dimension}"
+    return None
+
+
+def chunk_ids_for(rel_path, content_hash, count, start=0):
+    prefix = hashlib.sha1(rel_path.encode("utf-8")).hexdigest()[:12]
+    return [f"{prefix}-{content_hash[:12]}-{i}" for i in range(start, start + count)]
+
+
+def entry_chunk_ids(rel_path, entry):
+    """Chunk IDs of a manifest entry; newer entries store only the count since IDs are derived from the hash"""
+    if "chunk_ids" in entry:
+        return entry["chunk_ids"]
+    return chunk_ids_for(rel_path, entry["sha256"], entry["chunk_count"])
+
+
+def collect_source_files(source_dir, extensions):
+    """Map path relative to ``source_dir`` -> absolute path for every matching file"""
+    files = {}
+    for root, _, names in os.walk(source_dir):
+        for name in names:
+            if name.lower().endswith(extensions):
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, source_dir).replace(os.sep, "/")] = path
+    return files
+
+
+class ThroughputReporter:
+    """Prints documents/sec and chunks/sec while an ingestion run progresses"""
+
+    def __init__(self, every_seconds=10.0):
+        self.every_seconds = every_seconds
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.documents = 0
+        self.chunks = 0
+        self.rows = 0
+
+    def update(self, documents=0, chunks=0, rows=0):
+        self.documents += documents
+        self.chunks += chunks
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self.last_report >= self.every_seconds:
+            self.last_report = now
+            print(f"⏱️ {self.format()}")
+
+    def rates(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "documents": self.documents,
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 2),
+            "documents_per_second": round(self.documents / elapsed, 2),
+            "rows": self.rows,
+            "rows_per_second": round(self.rows / elapsed, 2),
+            "chunks_per_second": round(self.chunks / elapsed, 2),
+        }
+
+    def format(self):
+        rates = self.rates()
+        line = (
+            f"{rates['documents']} documents, {rates['chunks']} chunks in {rates['seconds']}s "
+            f"({rates['documents_per_second']} docs/s, {rates['chunks_per_second']} chunks/s"
+        )
+        if self.rows:
+            line += f", {rates['rows']} CSV rows at {rates['rows_per_second']} rows/s"
+        return line + ")"
+
+
+class BatchedIndexWriter:
+    """Buffers chunks and embeds them ``batch_size`` at a time straight into the FAISS index"""
+
+    def __init__(self, embedder, batch_size=64, vectorstore=None, reporter=None):
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.vectorstore = vectorstore
+        self.reporter = reporter
+        self._texts = []
+        self._metadatas = []
+        self._ids = []
+
+    def add(self, texts, metadatas, ids):
+        for text, metadata, chunk_id in zip(texts, metadatas, ids):
+            self._texts.append(text)
+            self._metadatas.append(metadata)
+            self._ids.append(chunk_id)
+            if len(self._texts) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if not self._texts:
+            return
+        from langchain_community.vectorstores import FAISS
+
+        vectors = self.embedder.embed_documents(self._texts)
+        pairs = list(zip(self._texts, vectors))
+        if self.vectorstore is None:
+            self.vectorstore = FAISS.from_embeddings(pairs, self.embedder, metadatas=self._metadatas, ids=self._ids)
+        else:
+            self.vectorstore.add_embeddings(pairs, metadatas=self._metadatas, ids=self._ids)
+        if self.reporter:
+            self.reporter.update(chunks=len(pairs))
+        self._texts, self._metadatas, self._ids = [], [], []
+
+
+def _parse_source(load_chunks, rel_path, path):
+    """Worker-side: hash and parse one source file"""
+    content_hash = file_sha256(path)
+    texts, metadatas = load_chunks(path)
+    return rel_path, content_hash, texts, metadatas
+
+
+def _parse_in_pool(load_chunks, pending, workers):
+    """Yield parse results as files finish, keeping at most ``2 * workers`` files in flight"""
+    if workers <= 1:
+        for rel_path, path in pending:
+            try:
+                yield _parse_source(load_chunks, rel_path, path), None
+            except Exception as e:
+                yield (rel_path, None, None, None), e
+        return
+
+    pending = iter(pending)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        while True:
+            while len(in_flight) < workers * 2:
+                item = next(pending, None)
+                if item is None:
+                    break
+                in_flight[executor.submit(_parse_source, load_chunks, *item)] = item[0]
+            if not in_flight:
+                return
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel_path = in_flight.pop(future)
+                try:
+                    yield future.result(), None
+                except Exception as e:
+                    yield (rel_path, None, None, None), e
+
+
+def build_index_incrementally(
+    index_dir,
+    source_files,
+    load_chunks,
+    embedder,
+    model_name=DEFAULT_EMBEDDING_MODEL,
+    batch_size=64,
+    workers=1,
+    index_type="flat",
+    build_params=None,
+    search_params=None,
+    report_k=10,
+    stream_chunks=None,
+):
+    """Bring the FAISS index in ``index_dir`` up to date with ``source_files``.
+
+    ``load_chunks(path)`` returns ``(texts, metadatas)`` for one source file; with
+    ``workers > 1`` it runs in a process pool and must be a module-level function.
+    For files too large to parse in one piece, ``stream_chunks(path)`` may return
+    an iterator of ``(texts, metadatas, rows)`` batches instead (or None to use
+    ``load_chunks``); those files are read in this process and their batches
+    go straight to the embedder, so only one batch is held at a time.
+    Only new or changed files are parsed and embedded, ``batch_size`` chunks at a
+    time; vectors of changed and removed files are deleted. A change of embedding
+    model forces a full rebuild. Returns a summary dict including throughput.
+
+    With an ``index_type`` other than "flat" the exact index is kept on disk as
+    exact.faiss (the source of truth for later incremental runs) and the served
+    index.faiss is rebuilt from it as IVF-PQ, HNSW or 8-bit scalar-quantized,
+    with a recall/latency/memory comparison written to build_report.json.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    dimension = len(embedder.embed_query("dimension probe"))
+    manifest = load_manifest(index_dir)
+    index_exists = os.path.exists(os.path.join(index_dir, "index.faiss"))
+
+    vectorstore = None
+    if manifest and index_exists:
+        exact_path = os.path.join(index_dir, EXACT_INDEX_NAME)
+        built_type = manifest.get("index", {}).get("type", "flat")
+        if check_index_compatibility(index_dir, model_name, dimension) is not None:
+            print(f"⚠️ Embedding model changed ({manifest.get('embedding_model')} -> {model_name}); rebuilding from scratch")
+            manifest = None
+        elif built_type != "flat" and not os.path.exists(exact_path):
+            print(f"⚠️ {built_type} index has no {EXACT_INDEX_NAME} to update from; rebuilding from scratch")
+            manifest = None
+        else:
+            vectorstore = FAISS.load_local(index_dir, embedder, allow_dangerous_deserialization=True)
+            if built_type != "flat":
+                # Incremental updates are applied to the exact vectors, then the ANN index is rebuilt
+                vectorstore.index = faiss.read_index(exact_path)
+    elif index_exists:
+        print("⚠️ Existing index has no manifest; rebuilding from scratch")
+
+    known_files = dict(manifest["files"]) if manifest else {}
+    summary = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0, "chunks_added": 0}
+
+    stale_ids = []
+    for rel_path in sorted(set(known_files) - set(source_files)):
+        stale_ids.extend(entry_chunk_ids(rel_path, known_files.pop(rel_path)))
+        summary["removed"] += 1
+        print(f"🗑️ Removed: {rel_path}")
+
+    # Cheap size/mtime check first; anything that moved is hashed and parsed by the workers
+    pending = []
+    streamed = []
+    for rel_path, path in sorted(source_files.items()):
+        stat = os.stat(path)
+        entry = known_files.get(rel_path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            summary["unchanged"] += 1
+            continue
+        batches = stream_chunks(path) if stream_chunks else None
+        if batches is None:
+            pending.append((rel_path, path))
+        else:
+            streamed.append((rel_path, path, batches))
+
+    reporter = ThroughputReporter()
+    writer = BatchedIndexWriter(embedder, batch_size=batch_size, vectorstore=vectorstore, reporter=reporter)
+    touched = False
+
+    def record(rel_path, content_hash, batches):
+        """Add one parsed file's chunks to the writer and the manifest (unless its content is unchanged)"""
+        nonlocal touched
+        path = source_files[rel_path]
+        stat = os.stat(path)
+        entry = known_files.get(rel_path)
+        if entry and entry["sha256"] == content_hash:
+            entry.update(size=stat.st_size, mtime=stat.st_mtime)
+            summary["unchanged"] += 1
+            touched = True
+            return
+
+        if entry:
+            stale_ids.extend(entry_chunk_ids(rel_path, entry))
+        count = 0
+        try:
+            for texts, metadatas, rows in batches:
+                writer.add(texts, metadatas, chunk_ids_for(rel_path, content_hash, len(texts), start=count))
+                count += len(texts)
+                reporter.update(rows=rows)
+        except Exception as e:
+            # Drop what was already queued; the file is retried on the next run
+            stale_ids.extend(chunk_ids_for(rel_path, content_hash, count))
+            known_files.pop(rel_path, None)
+            print(f"❌ Error reading {path}: {e}")
+            summary["failed"] += 1
+            return
+
+        summary["updated" if entry else "added"] += 1
+        print(f"📄 Processed: {path} ({count} chunks)")
+        known_files[rel_path] = {
+            "sha256": content_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "chunk_count": count,
+        }
+        summary["chunks_added"] += count
+        reporter.update(documents=1)
+
+    for rel_path, path, batches in streamed:
+        record(rel_path, file_sha256(path), batches)
+
+    for (rel_path, content_hash, texts, metadatas), error in _parse_in_pool(load_chunks, pending, workers):
+        if error is not None:
+            print(f"❌ Error reading {source_files[rel_path]}: {error}")
+            summary["failed"] += 1
+            continue
+        record(rel_path, content_hash, [(texts, metadatas, 0)])
+
+    writer.flush()
+    vectorstore = writer.vectorstore
+    summary.update(reporter.rates())
+
+    if stale_ids and vectorstore is not None:
+        present = set(vectorstore.index_to_docstore_id.values())
+        stale_ids = [chunk_id for chunk_id in stale_ids if chunk_id in present]
+        if stale_ids:
+            vectorstore.delete(stale_ids)
+
+    if vectorstore is None:
+        print("⚠️ No valid source files found!")
+        return summary
+
+    requested = {"type": index_type, "build": build_params or {}, "search": search_params or {}}
+    index_config = {"type": "flat", "build": {}, "search": {}, "requested": requested}
+    previous = (manifest or {}).get("index", {}).get("requested", {"type": "flat", "build": {}, "search": {}})
+    vectors_changed = summary["added"] or summary["updated"] or summary["removed"]
+    config_changed = manifest is None or previous != requested
+    if not vectors_changed and not config_changed and not touched:
+        print(f"✅ FAISS index at {index_dir} is already up to date")
+        return summary
+
+    os.makedirs(index_dir, exist_ok=True)
+    if vectors_changed or config_changed:
+        exact_index = vectorstore.index
+        exact_path = os.path.join(index_dir, EXACT_INDEX_NAME)
+        if index_type != "flat":
+            try:
+                index_config, report = _save_ann_index(
+                    vectorstore, index_dir, index_type, build_params, search_params, report_k
+                )
+                index_config["requested"] = requested
+                summary["report"] = report
+            except ValueError as e:
+                print(f"⚠️ Could not build {index_type} index ({e}); keeping the exact flat index")
+            vectorstore.index = exact_index
+        if index_config["type"] == "flat":
+            save_vectorstore_atomic(vectorstore, index_dir)
+            if os.path.exists(exact_path):
+                os.remove(exact_path)
+    else:
+        # Only file timestamps moved; the index on disk is unchanged
+        index_config = manifest.get("index", index_config)
+    save_manifest(index_dir, {
+        "embedding_model": model_name,
+        "dimension": dimension,
+        "updated_at": int(time.time()),
+        "index": index_config,
+        "files": known_files,
+    })
+    print(f"✅ FAISS index saved at {index_dir}: {summary}")
+    return summary
+
+
+def _save_ann_index(vectorstore, index_dir, index_type, build_params, search_params, report_k):
+    """Write exact.faiss, then serve an ANN index built from it; returns (index config, report)"""
+    exact_index = vectorstore.index
+    write_index_atomic(exact_index, os.path.join(index_dir, EXACT_INDEX_NAME))
+
+    vectors = index_vectors(exact_index)
+    params = {**default_build_params(index_type, *vectors.shape), **(build_params or {})}
+    search = {**default_search_params(index_type, params), **(search_params or {})}
+
+    start = time.perf_counter()
+    ann_index = build_ann_index(vectors, index_type, params)
+    build_seconds = time.perf_counter() - start
+    apply_search_params(ann_index, search)
+
+    report = {
+        "index_type": index_type,
+        "build_params": params,
+        "search_params": search,
+        "vectors": int(exact_index.ntotal),
+        "dimension": int(exact_index.d),
+        "build_seconds": round(build_seconds, 3),
+        **compare_with_exact(exact_index, ann_index, k=report_k),
+    }
+    with open(os.path.join(index_dir, REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(
+        f"📈 {index_type}: recall@{report['k']}={report['recall_at_k']}, "
+        f"p50 {report['latency_ms']['ann']['p50']}ms vs {report['latency_ms']['exact']['p50']}ms exact, "
+        f"p99 {report['latency_ms']['ann']['p99']}ms vs {report['latency_ms']['exact']['p99']}ms exact, "
+        f"{report['memory_bytes']['ann']} bytes vs {report['memory_bytes']['exact']} bytes exact"
+    )
+
+    vectorstore.index = ann_index
+    save_vectorstore_atomic(vectorstore, index_dir)
+    return {"type": index_type, "build": params, "search": search}, report
@@ -0,0 +1,256 @@
+"""Build or update the FAISS index for one domain from a directory of PDFs and CSVs.
+
+    python ingest.py law ./data/Law --workers 4 --batch-size 128
+
+Files are parsed in a process pool and chunks are embedded in batches as they
+arrive, so no step holds the whole corpus. Re-runs only process new or changed
+files (see index_builder.py). The index is written where the server looks for it.
+CSVs are read in pieces in the main process and packed into header-labelled
+chunks of consecutive rows, so multi-GB market data never sits in memory whole.
+
+    python ingest.py law ./data/Law --index-type hnsw --hnsw-m 32 --ef-search 64
+
+builds an approximate index instead and writes build_report.json with recall@k
+against the exact index, p50/p99 search latency and memory for both.
+"""
+import argparse
+import bisect
+import os
+
+from dotenv import load_dotenv
+
+from ann_index import INDEX_TYPES
+from domains import DOMAIN_INDEXES
+from index_builder import DEFAULT_EMBEDDING_MODEL, build_index_incrementally, collect_source_files
+from mmap_docstore import convert_index
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CSV_ROWS_PER_READ = 50_000
+# Wide CSVs (hundreds of columns) would otherwise repeat a header that leaves no room for rows
+MAX_CHUNK_HEADER = CHUNK_SIZE // 4
+MIN_CHUNK_BODY = CHUNK_SIZE // 2
+
+_text_splitter = None
+
+
+def get_text_splitter():
+    global _text_splitter
+    if _text_splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        _text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return _text_splitter
+
+
+def load_pdf_chunks(pdf_path):
+    """Split one PDF into chunks, keeping the source path and page number"""
+    from langchain_community.document_loaders import PyMuPDFLoader
+
+    chunk_docs = get_text_splitter().split_documents(PyMuPDFLoader(pdf_path).load())
+    texts = [doc.page_content for doc in chunk_docs]
+    metadatas = [{"source": pdf_path, "page": doc.metadata.get("page")} for doc in chunk_docs]
+    return texts, metadatas
+
+
+def _pack_rows(lengths, budget):
+    """Group consecutive rows greedily so each group's text fits in ``budget`` characters.
+
+    Works on the running total of row lengths: each group ends at the last row
+    whose total is within ``budget`` of the group's start, found with a binary
+    search, so the Python loop runs once per group rather than once per row.
+    A row longer than the budget gets a group of its own.
+    """
+    import numpy as np
+
+    ends = np.cumsum(np.asarray(lengths, dtype=np.int64)).tolist()
+    starts = []
+    start = 0
+    while start < len(ends):
+        starts.append(start)
+        base = ends[start - 1] if start else 0
+        start = max(bisect.bisect_right(ends, base + budget, start), start + 1)
+    # Mark where each group starts; the running count of marks is the group number
+    groups = np.zeros(len(ends), dtype=np.int64)
+    groups[starts[1:]] = 1
+    return np.cumsum(groups)
+
+
+def chunk_header(columns):
+    """(header line repeated in every chunk, full header or None when that line had to be shortened)"""
+    header = " | ".join(str(column) for column in columns)
+    if len(header) <= MAX_CHUNK_HEADER:
+        return header, None
+    # Cut at a column boundary; the full header goes into each chunk's metadata instead
+    shown = header[:MAX_CHUNK_HEADER - 4].rsplit(" | ", 1)[0]
+    return f"{shown} | …", header
+
+
+def stream_csv_chunks(csv_path, rows_per_read=CSV_ROWS_PER_READ):
+    """Yield ``(texts, metadatas, rows)`` for a CSV read ``rows_per_read`` rows at a time.
+
+    Row text is built column-wise (cells joined with " | ") and consecutive rows
+    are packed into chunks of up to CHUNK_SIZE characters, each starting with
+    the header line so the columns stay labelled. A header longer than
+    MAX_CHUNK_HEADER is shortened in the text and kept whole in the metadata.
+    Only a row longer than a whole chunk goes through the text splitter.
+    """
+    import pandas as pd
+
+    reader = pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=rows_per_read)
+    for frame in reader:
+        if frame.empty:
+            continue
+        header, full_header = chunk_header(frame.columns)
+        cells = frame.fillna("")
+        row_text = cells.iloc[:, 0].str.cat([cells.iloc[:, i] for i in range(1, cells.shape[1])], sep=" | ")
+        budget = max(MIN_CHUNK_BODY, CHUNK_SIZE - len(header) - 1)
+        groups = _pack_rows((row_text.str.len() + 1).tolist(), budget)
+
+        # Data rows are numbered from 1, matching a spreadsheet view without the header
+        row_numbers = pd.Series(frame.index + 1, index=frame.index)
+        bodies = row_text.groupby(groups).agg("\n".join)
+        first_rows = row_numbers.groupby(groups).min()
+        last_rows = row_numbers.groupby(groups).max()
+
+        texts, metadatas = [], []
+        for body, first, last in zip(bodies, first_rows, last_rows):
+            metadata = {"source": csv_path, "rows": f"{first}-{last}"}
+            if full_header is not None:
+                metadata["columns"] = full_header
+            if len(body) <= budget:
+                pieces = [body]
+            else:
+                from langchain_text_splitters import RecursiveCharacterTextSplitter
+                pieces = RecursiveCharacterTextSplitter(chunk_size=budget, chunk_overlap=0).split_text(body)
+            for piece in pieces:
+                texts.append(f"{header}\n{piece}")
+                metadatas.append(dict(metadata))
+        yield texts, metadatas, len(frame)
+
+
+def load_csv_chunks(csv_path):
+    """Whole-file variant of stream_csv_chunks for callers that want plain lists"""
+    texts, metadatas = [], []
+    for batch_texts, batch_metadatas, _ in stream_csv_chunks(csv_path):
+        texts.extend(batch_texts)
+        metadatas.extend(batch_metadatas)
+    return texts, metadatas
+
+
+LOADERS = {
+    ".pdf": load_pdf_chunks,
+    ".csv": load_csv_chunks,
+}
+
+# Large formats are read in this process in pieces and streamed to the embedder
+STREAMED_LOADERS = {
+    ".csv": stream_csv_chunks,
+}
+
+
+def load_file_chunks(path):
+    return LOADERS[os.path.splitext(path)[1].lower()](path)
+
+
+def stream_file_chunks(path):
+    loader = STREAMED_LOADERS.get(os.path.splitext(path)[1].lower())
+    return loader(path) if loader else None
+
+
+def ingest(
+    domain,
+    source_dir,
+    batch_size=64,
+    workers=None,
+    model_name=DEFAULT_EMBEDDING_MODEL,
+    index_dir=None,
+    index_type="flat",
+    build_params=None,
+    search_params=None,
+    mmap_docstore=False,
+):
+    """Update the index for ``domain`` from every supported file under ``source_dir``"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    index_dir = index_dir or DOMAIN_INDEXES[domain]
+    workers = workers or os.cpu_count() or 1
+    source_files = collect_source_files(source_dir, tuple(LOADERS))
+    print(f"📚 {len(source_files)} source files for domain {domain} -> {index_dir}")
+
+    embedder = HuggingFaceEmbeddings(model_name=model_name)
+    summary = build_index_incrementally(
+        index_dir,
+        source_files,
+        load_file_chunks,
+        embedder,
+        model_name,
+        batch_size=batch_size,
+        workers=workers,
+        index_type=index_type,
+        build_params=build_params,
+        search_params=search_params,
+        stream_chunks=stream_file_chunks,
+    )
+    if mmap_docstore and os.path.exists(os.path.join(index_dir, "index.pkl")):
+        convert_index(index_dir)
+    print(
+        f"🎉 {domain} index updated: {summary.get('documents', 0)} documents, {summary.get('chunks', 0)} chunks "
+        f"({summary.get('documents_per_second', 0)} docs/s, {summary.get('chunks_per_second', 0)} chunks/s, "
+        f"{summary.get('rows', 0)} CSV rows at {summary.get('rows_per_second', 0)} rows/s)"
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update a domain FAISS index")
+    parser.add_argument("domain", choices=sorted(DOMAIN_INDEXES), help="domain whose index to build")
+    parser.add_argument("source_dir", help="directory searched recursively for PDF and CSV files")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks embedded per forward pass")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL, help="embedding model; must match the server")
+    parser.add_argument("--index-dir", default=None, help="override the index directory from DOMAIN_INDEXES")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="exact flat index or an ANN/quantized type")
+    parser.add_argument("--nlist", type=int, help="ivfpq: number of inverted lists")
+    parser.add_argument("--pq-m", type=int, help="ivfpq: sub-quantizers (must divide the vector dimension)")
+    parser.add_argument("--pq-bits", type=int, help="ivfpq: bits per sub-quantizer code")
+    parser.add_argument("--hnsw-m", type=int, help="hnsw: neighbours per node")
+    parser.add_argument("--ef-construction", type=int, help="hnsw: build-time search depth")
+    parser.add_argument("--nprobe", type=int, help="ivfpq: lists scanned per query (applied by the server)")
+    parser.add_argument("--ef-search", type=int, help="hnsw: query-time search depth (applied by the server)")
+    parser.add_argument("--mmap-docstore", action="store_true", help="also write the memory-mapped docstore the server prefers")
+    args = parser.parse_args(argv)
+
+    build_params = {
+        key: value
+        for key, value in {
+            "nlist": args.nlist,
+            "m": args.pq_m,
+            "nbits": args.pq_bits,
+            "M": args.hnsw_m,
+            "efConstruction": args.ef_construction,
+        }.items()
+        if value is not None
+    }
+    search_params = {
+        key: value
+        for key, value in {"nprobe": args.nprobe, "efSearch": args.ef_search}.items()
+        if value is not None
+    }
+
+    load_dotenv()
+    ingest(
+        args.domain,
+        args.source_dir,
+        args.batch_size,
+        args.workers,
+        args.model,
+        args.index_dir,
+        args.index_type,
+        build_params,
+        search_params,
+        args.mmap_docstore,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+
+class LLMBusyError(Exception):
+    """Raised when too many model calls are already waiting for a slot"""
+
+
+class LLMTimeoutError(Exception):
+    """Raised when a model call does not finish within the gateway timeout"""
+
+
+class FakeLLM:
+    """Stand-in for GoogleGenerativeAI that sleeps instead of calling the API; used for local runs and benchmarks"""
+
+    def __init__(self, delay=0.5, chunks=8):
+        self.delay = delay
+        self.chunks = chunks
+
+    def _answer(self, prompt):
+        return f"Fake answer for a {len(prompt)}-character prompt."
+
+    def invoke(self, prompt):
+        time.sleep(self.delay)
+        return self._answer(prompt)
+
+    def stream(self, prompt):
+        words = self._answer(prompt).split(" ")
+        step = max(1, len(words) // self.chunks)
+        for i in range(0, len(words), step):
+            time.sleep(self.delay / self.chunks)
+            yield " ".join(words[i:i + step]) + " "
+
+
+def create_llm(provider="google", model="gemini-2.0-flash", timeout=60.0, fake_delay=0.5):
+    """Build the process-wide model client once; it is reused by every request"""
+    if provider == "fake":
+        return FakeLLM(delay=fake_delay)
+    from langchain_google_genai import GoogleGenerativeAI
+    return GoogleGenerativeAI(model=model, timeout=timeout, max_retries=2)
+
+
+class LazyLLM:
+    """Builds the model client on first use, so importing the app does not import the provider SDK"""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._llm = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = self.factory()
+        return self._llm
+
+    def invoke(self, prompt):
+        return self.get().invoke(prompt)
+
+    def stream(self, prompt):
+        return self.get().stream(prompt)
+
+
+class LLMGateway:
+    """Runs model calls on a bounded worker pool, off the request thread.
+
+    At most ``max_concurrency`` calls talk to the model at once; up to
+    ``max_queue`` more may wait for a slot before new calls are rejected with
+    LLMBusyError. Callers wait at most ``timeout`` seconds for an answer.
+    """
+
+    def __init__(self, llm, max_concurrency=8, max_queue=32, timeout=60.0):
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _admit(self):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise LLMBusyError("The assistant is busy right now, please try again in a moment.")
+            self.queued += 1
+
+    def _dequeue(self):
+        with self._lock:
+            self.queued -= 1
+
+    def _start(self):
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+    def _finish(self, ok):
+        with self._lock:
+            self.in_flight -= 1
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def _run(self, prompt):
+        with self._slots:
+            self._start()
+            ok = False
+            try:
+                result = self.llm.invoke(prompt)
+                ok = True
+                return result
+            finally:
+                self._finish(ok)
+
+    def invoke(self, prompt):
+        """Generate a full answer, blocking the caller for at most ``timeout`` seconds"""
+        self._admit()
+        future = self._executor.submit(self._run, prompt)
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            if future.cancel():
+                # Never started, so it still counts as queued
+                self._dequeue()
+            with self._lock:
+                self.timeouts += 1
+            raise LLMTimeoutError(f"Model call timed out after {self.timeout}s")
+
+    def stream(self, prompt):
+        """Yield answer chunks while holding one concurrency slot"""
+        self._admit()
+        if not self._slots.acquire(timeout=self.timeout):
+            self._dequeue()
+            with self._lock:
+                self.timeouts += 1
+            raise LLMTimeoutError(f"No model slot became free within {self.timeout}s")
+        self._start()
+        ok = False
+        try:
+            for chunk in self.llm.stream(prompt):
+                yield chunk
+            ok = True
+        finally:
+            self._slots.release()
+            self._finish(ok)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
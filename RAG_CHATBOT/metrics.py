@@ -0,0 +1,139 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+# Stages are mostly Mongo, embedding and FAISS calls (milliseconds) plus the model call (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "intellisphere_stage_seconds",
+    "Time spent in one stage of a request",
+    ["endpoint", "domain", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_SECONDS = Histogram(
+    "intellisphere_request_seconds",
+    "End-to-end request latency",
+    ["endpoint", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    "intellisphere_prompt_tokens",
+    "Estimated input tokens sent to the model per prompt",
+    ["endpoint", "domain"],
+    buckets=(250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "background"
+
+
+@contextmanager
+def timed(stage, domain=""):
+    """Time a block into the stage histogram and the per-request timing log"""
+    endpoint = _current_endpoint()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(endpoint, domain or "", stage).observe(elapsed)
+        if has_request_context():
+            timings = g.setdefault("stage_timings", {})
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 3)
+
+
+def record_prompt_tokens(domain, tokens):
+    PROMPT_TOKENS.labels(_current_endpoint(), domain or "").observe(tokens)
+    if has_request_context():
+        g.prompt_tokens = g.get("prompt_tokens", 0) + tokens
+
+
+class StatsCollector:
+    """Exposes the numeric fields of ``stats()`` dicts (cache hits, queue depth, ...) as gauges"""
+
+    def __init__(self):
+        self.sources = {}
+
+    def add(self, name, stats_fn):
+        self.sources[name] = stats_fn
+
+    def collect(self, worker=None):
+        """One gauge per numeric stat; with ``worker`` set, each is labelled ``pid=<worker>``"""
+        for name, stats_fn in self.sources.items():
+            stats = stats_fn()
+            if not stats:
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                metric, documentation = f"intellisphere_{name}_{key}", f"{name} {key.replace('_', ' ')}"
+                if worker is None:
+                    yield GaugeMetricFamily(metric, documentation, value=value)
+                else:
+                    family = GaugeMetricFamily(metric, documentation, labels=["pid"])
+                    family.add_metric([worker], value)
+                    yield family
+
+
+class WorkerStatsCollector:
+    """stats_collector's gauges for the multiprocess registry: values of the worker serving the scrape"""
+
+    def collect(self):
+        return stats_collector.collect(worker=str(os.getpid()))
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def init_metrics(app, timing_log=False):
+    """Attach request IDs, request latency, optional JSON timing logs and the /metrics endpoint"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("request_start")
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or "unknown"
+        REQUEST_SECONDS.labels(endpoint, request.method, str(response.status_code)).observe(elapsed)
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+        if timing_log and endpoint != "static":
+            print(json.dumps({
+                "request_id": g.request_id,
+                "endpoint": endpoint,
+                "status": response.status_code,
+                "total_ms": round(elapsed * 1000, 3),
+                "stages_ms": g.get("stage_timings", {}),
+                "prompt_tokens": g.get("prompt_tokens"),
+            }))
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        registry = REGISTRY
+        if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+            # Aggregate histograms across gunicorn workers
+            from prometheus_client import multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            # Caches and queues live in each worker, so these are not aggregated
+            registry.register(WorkerStatsCollector())
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
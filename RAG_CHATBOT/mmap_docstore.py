@@ -0,0 +1,176 @@
+"""Compact, memory-mapped replacement for the pickled LangChain docstore (index.pkl).
+
+Chunk records are stored in FAISS position order as UTF-8 JSON in one blob
+file, with a second file holding n + 1 byte offsets:
+
+    docstore.blob     record 0 | record 1 | ... | record n-1
+    docstore.offsets  uint64[n + 1] (.npy) where record i is blob[offsets[i]:offsets[i + 1]]
+    docstore.json     record count and the index.pkl it was converted from
+
+Both files are memory-mapped, so gunicorn workers share the pages through the
+OS page cache and a chunk is only decoded when a search returns it. The FAISS
+index itself is also opened with mmap where the index type supports it.
+
+Convert an existing index directory with:
+
+    python mmap_docstore.py faiss_indexes/law
+"""
+import argparse
+import json
+import mmap
+import os
+import pickle
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+BLOB_NAME = "docstore.blob"
+OFFSETS_NAME = "docstore.offsets"
+META_NAME = "docstore.json"
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class PositionMap:
+    """Stands in for FAISS.index_to_docstore_id: FAISS position i is docstore key i"""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise KeyError(position)
+        return int(position)
+
+    def get(self, position, default=None):
+        return int(position) if 0 <= position < self.size else default
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(range(self.size))
+
+    def keys(self):
+        return range(self.size)
+
+    def values(self):
+        return range(self.size)
+
+    def items(self):
+        return ((i, i) for i in range(self.size))
+
+
+class MmapDocstore:
+    """Read-only docstore that decodes chunks lazily from the memory-mapped blob"""
+
+    def __init__(self, index_dir):
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_NAME), mmap_mode="r")
+        self._file = open(os.path.join(index_dir, BLOB_NAME), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def search(self, search):
+        position = int(search)
+        if not 0 <= position < len(self):
+            return f"ID {search} not found."
+        record = json.loads(self._blob[int(self.offsets[position]):int(self.offsets[position + 1])])
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+    def add(self, texts):
+        raise NotImplementedError("MmapDocstore is read-only; rebuild the index and convert it again")
+
+    def delete(self, ids):
+        raise NotImplementedError("MmapDocstore is read-only; rebuild the index and convert it again")
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+
+
+def convert_index(index_dir):
+    """Write docstore.blob/offsets/json for an existing index.faiss + index.pkl pair"""
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    count = faiss.read_index(os.path.join(index_dir, "index.faiss")).ntotal
+
+    blob_tmp = os.path.join(index_dir, f"{BLOB_NAME}.tmp")
+    offsets = np.zeros(count + 1, dtype=np.uint64)
+    with open(blob_tmp, "wb") as blob:
+        for position in range(count):
+            docstore_id = index_to_docstore_id[position]
+            doc = docstore.search(docstore_id)
+            record = json.dumps(
+                {"id": str(docstore_id), "text": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False,
+                default=str,
+            ).encode("utf-8")
+            blob.write(record)
+            offsets[position + 1] = offsets[position] + len(record)
+
+    offsets_tmp = os.path.join(index_dir, f"{OFFSETS_NAME}.tmp")
+    with open(offsets_tmp, "wb") as f:
+        np.save(f, offsets)
+    os.replace(blob_tmp, os.path.join(index_dir, BLOB_NAME))
+    os.replace(offsets_tmp, os.path.join(index_dir, OFFSETS_NAME))
+
+    meta_tmp = os.path.join(index_dir, f"{META_NAME}.tmp")
+    with open(meta_tmp, "w", encoding="utf-8") as f:
+        json.dump({"count": count, "source": _file_signature(os.path.join(index_dir, "index.pkl"))}, f)
+    os.replace(meta_tmp, os.path.join(index_dir, META_NAME))
+    print(f"✅ Wrote memory-mapped docstore for {count} chunks in {index_dir}")
+    return count
+
+
+def has_current_docstore(index_dir):
+    """True when a converted docstore exists and still matches index.pkl (if index.pkl is present)"""
+    meta_path = os.path.join(index_dir, META_NAME)
+    if not all(os.path.exists(os.path.join(index_dir, name)) for name in (META_NAME, BLOB_NAME, OFFSETS_NAME)):
+        return False
+    pkl_path = os.path.join(index_dir, "index.pkl")
+    if not os.path.exists(pkl_path):
+        return True
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return meta.get("source") == _file_signature(pkl_path)
+
+
+def read_index_mmap(path):
+    """Open a FAISS index with its codes memory-mapped, falling back to a normal read for unsupported types"""
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    try:
+        return faiss.read_index(path, flags)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+def load_mmap_vectorstore(index_dir, embedder):
+    """Build a LangChain FAISS vectorstore over the mmap'd index and docstore, without unpickling"""
+    from langchain_community.vectorstores import FAISS
+
+    index = read_index_mmap(os.path.join(index_dir, "index.faiss"))
+    docstore = MmapDocstore(index_dir)
+    if len(docstore) != index.ntotal:
+        docstore.close()
+        raise ValueError(f"docstore has {len(docstore)} chunks but the index has {index.ntotal} vectors")
+    return FAISS(embedder, index, docstore, PositionMap(index.ntotal))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert index.pkl docstores to the memory-mapped format")
+    parser.add_argument("index_dirs", nargs="+", help="index directories containing index.faiss and index.pkl")
+    args = parser.parse_args(argv)
+    for index_dir in args.index_dirs:
+        convert_index(index_dir)
+
+
+if __name__ == "__main__":
+    main()
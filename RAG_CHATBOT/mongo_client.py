@@ -0,0 +1,66 @@
+import os
+import threading
+
+import pymongo
+
+
+class ProcessLocalClient:
+    """A MongoClient per process, created on first use.
+
+    MongoClient is not fork-safe, so a client made while importing the app in a
+    pre-forking server would be shared by every worker. Databases and
+    collections taken from this object are lightweight handles that resolve to
+    the current process's client whenever they are used.
+    """
+
+    def __init__(self, uri, **kwargs):
+        self.uri = uri
+        self.kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    # Looked up at call time so benchmarks can swap in mongomock before the first request
+                    self._client = pymongo.MongoClient(self.uri, **self.kwargs)
+        return self._client
+
+    def __getitem__(self, name):
+        return LazyDatabase(self, name)
+
+
+class LazyDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getitem__(self, name):
+        return LazyCollection(self, name)
+
+    def __getattr__(self, attr):
+        return getattr(self.client.get()[self.name], attr)
+
+
+class LazyCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._resolved = (None, None)
+
+    def _collection(self):
+        client = self.database.client.get()
+        resolved_for, collection = self._resolved
+        if resolved_for is not client:
+            collection = client[self.database.name][self.name]
+            self._resolved = (client, collection)
+        return collection
+
+    def __getattr__(self, attr):
+        return getattr(self._collection(), attr)
@@ -0,0 +1,101 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+# Every hot query in flaskapp.py is served by one of these indexes
+INDEX_SPECS = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "chat_histories": [
+        IndexModel(
+            [("user_email", ASCENDING), ("domain", ASCENDING), ("session_id", ASCENDING)],
+            name="session_key_unique",
+            unique=True,
+        ),
+        IndexModel(
+            [("user_email", ASCENDING), ("domain", ASCENDING), ("created_at", DESCENDING)],
+            name="user_domain_created_at",
+        ),
+    ],
+    "chat_history_buckets": [
+        IndexModel(
+            [("user_email", ASCENDING), ("domain", ASCENDING), ("session_id", ASCENDING), ("first_seq", DESCENDING)],
+            name="session_key_first_seq",
+        ),
+    ],
+    # session_store.CachedMongoSessionInterface looks sessions up by "id"; MongoDB drops them at "expiration"
+    "sessions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("expiration", ASCENDING)], name="expiration_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# (collection, filter, sort) samples of the queries the app runs on every request
+HOT_QUERIES = [
+    ("users", {"email": "probe@example.com"}, None),
+    ("chat_histories", {"user_email": "probe@example.com", "domain": "home", "session_id": "probe"}, None),
+    ("chat_histories", {"user_email": "probe@example.com", "domain": "home"}, [("created_at", DESCENDING)]),
+    (
+        "chat_history_buckets",
+        {"user_email": "probe@example.com", "domain": "home", "session_id": "probe", "first_seq": {"$lt": 100}},
+        [("first_seq", DESCENDING)],
+    ),
+    ("sessions", {"id": "probe"}, None),
+]
+
+
+def ensure_indexes(db):
+    """Create the declared indexes; existing ones are left alone, failures are reported and skipped"""
+    created = {}
+    for collection_name, models in INDEX_SPECS.items():
+        for model in models:
+            try:
+                db[collection_name].create_indexes([model])
+                created.setdefault(collection_name, []).append(model.document["name"])
+            except PyMongoError as e:
+                # Typically duplicate keys left by older races, or an index that exists with other options
+                print(f"⚠️ Could not create index {model.document['name']} on {collection_name}: {str(e)}")
+    return created
+
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan", "thenStage", "elseStage"):
+        yield from _plan_stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def find_collection_scans(db, queries=HOT_QUERIES):
+    """Explain each hot query and return the ones whose winning plan is a COLLSCAN"""
+    flagged = []
+    for collection_name, query, sort in queries:
+        try:
+            cursor = db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            winning_plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        except PyMongoError as e:
+            print(f"⚠️ Could not explain query on {collection_name}: {str(e)}")
+            continue
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            flagged.append((collection_name, query))
+            print(f"🐢 COLLSCAN for hot query on {collection_name}: {query}")
+    return flagged
+
+
+def prepare_database(db, check_plans=True):
+    """Startup hook: declare indexes, then confirm the hot queries use them"""
+    try:
+        ensure_indexes(db)
+        flagged = find_collection_scans(db) if check_plans else []
+        if check_plans and not flagged:
+            print("✅ All hot MongoDB queries are index-backed")
+        return flagged
+    except PyMongoError as e:
+        print(f"❌ MongoDB index setup failed: {str(e)}")
+        return None
@@ -0,0 +1,180 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SecureCookieSessionInterface, SessionInterface
+
+_serializer = TaggedJSONSerializer()
+
+
+def _utcnow():
+    # pymongo hands back naive UTC datetimes unless the client is tz_aware
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ServerSideSession(SecureCookieSession):
+    def __init__(self, initial=None, sid=None, new=False, payload=None, expiration=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        self.payload = payload
+        self.expiration = expiration
+
+
+class CachedMongoSessionInterface(SessionInterface):
+    """Server-side sessions in MongoDB with a short-lived in-process cache in front.
+
+    The cookie only carries a random session id. A lookup is served from the
+    cache for ``cache_ttl`` seconds before MongoDB is asked again, so a logout
+    handled by another worker takes at most that long to be seen here. A
+    session is written back only when its contents changed; otherwise its
+    expiration (and the cookie) is pushed forward at most once per
+    ``refresh_interval`` seconds instead of on every request.
+    """
+
+    def __init__(self, collection, cache_ttl=5.0, cache_size=10000, refresh_interval=86400.0):
+        self.collection = collection
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.refresh_interval = refresh_interval
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.refreshes = 0
+        self.deletes = 0
+
+    def _cached(self, sid):
+        with self._lock:
+            entry = self._cache.get(sid)
+            if entry is None or time.monotonic() - entry[2] > self.cache_ttl:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(sid)
+            self.hits += 1
+            return entry
+
+    def _remember(self, sid, payload, expiration):
+        if self.cache_ttl <= 0:
+            return
+        with self._lock:
+            self._cache[sid] = (payload, expiration, time.monotonic())
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sid):
+        with self._lock:
+            self._cache.pop(sid, None)
+
+    def _load(self, sid):
+        """(payload, expiration) for a live session id, or None"""
+        entry = self._cached(sid)
+        if entry is not None:
+            payload, expiration, _ = entry
+        else:
+            doc = self.collection.find_one({"id": sid}, {"_id": 0, "data": 1, "expiration": 1})
+            if doc is None:
+                return None
+            payload, expiration = doc["data"], doc["expiration"]
+            self._remember(sid, payload, expiration)
+        if expiration <= _utcnow():
+            self._forget(sid)
+            return None
+        return payload, expiration
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and len(sid) <= 64:
+            loaded = self._load(sid)
+            if loaded is not None:
+                payload, expiration = loaded
+                return ServerSideSession(_serializer.loads(payload), sid=sid, payload=payload, expiration=expiration)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def _set_cookie(self, app, session, response, expiration):
+        # The server-side expiration is authoritative, so the cookie always lives as long as the session
+        response.set_cookie(
+            self.get_cookie_name(app),
+            session.sid,
+            expires=expiration.replace(tzinfo=timezone.utc),
+            httponly=self.get_cookie_httponly(app),
+            domain=self.get_cookie_domain(app),
+            path=self.get_cookie_path(app),
+            secure=self.get_cookie_secure(app),
+            partitioned=self.get_cookie_partitioned(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+    def save_session(self, app, session, response):
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if not session.new:
+                self.collection.delete_one({"id": session.sid})
+                self._forget(session.sid)
+                with self._lock:
+                    self.deletes += 1
+                response.delete_cookie(
+                    self.get_cookie_name(app),
+                    domain=self.get_cookie_domain(app),
+                    path=self.get_cookie_path(app),
+                )
+            return
+
+        lifetime = app.permanent_session_lifetime
+        now = _utcnow()
+        payload = _serializer.dumps(dict(session))
+        if payload != session.payload:
+            expiration = now + lifetime
+            self.collection.replace_one(
+                {"id": session.sid},
+                {"id": session.sid, "data": payload, "expiration": expiration},
+                upsert=True,
+            )
+            with self._lock:
+                self.writes += 1
+        elif session.expiration - now < lifetime - timedelta(seconds=self.refresh_interval):
+            expiration = now + lifetime
+            self.collection.update_one({"id": session.sid}, {"$set": {"expiration": expiration}})
+            with self._lock:
+                self.refreshes += 1
+        else:
+            return
+
+        self._remember(session.sid, payload, expiration)
+        self._set_cookie(app, session, response, expiration)
+        response.vary.add("Cookie")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "writes": self.writes,
+                "refreshes": self.refreshes,
+                "deletes": self.deletes,
+            }
+
+
+def init_sessions(app, backend, collection=None, cache_ttl=5.0, refresh_interval=86400.0):
+    """Install the session backend: "mongo" (cached server-side sessions) or "cookie" (signed cookies)"""
+    if backend == "cookie":
+        # Flask's own signed cookie: HMAC-verified with the secret key and rejected after PERMANENT_SESSION_LIFETIME.
+        # Nothing is stored server-side, so logout cannot revoke a copied cookie; fine when it only holds the login.
+        app.session_interface = SecureCookieSessionInterface()
+        return None
+    if backend != "mongo":
+        raise ValueError(f"Unknown session backend {backend!r} (expected 'mongo' or 'cookie')")
+    app.session_interface = CachedMongoSessionInterface(
+        collection, cache_ttl=cache_ttl, refresh_interval=refresh_interval
+    )
+    return app.session_interface
@@ -312,7 +312,7 @@ document.addEventListener("DOMContentLoaded", function () {
         loadingIndicator.style.display = "block";
 
         try {
-            const response = await fetch("/chat", {
+            const response = await fetch("/chat/stream", {
                 method: "POST",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify({ 
@@ -322,28 +322,16 @@ document.addEventListener("DOMContentLoaded", function () {
                 }),
             });
 
-            const data = await response.json();
-            loadingIndicator.style.display = "none";
-
-            if (data.error) {
-                chatContainer.innerHTML += `<div class="message ai-message error">❌ ${data.error}</div>`;
-            } else {
-                const botResponse = data.history[data.history.length - 1].bot;
-                
-                // Ensure marked library is loaded before parsing
-                if (typeof marked === 'undefined') {
-                    // If marked isn't loaded yet, add a small delay and try again
-                    setTimeout(() => {
-                        let formattedResponse = formatText(botResponse);
-                        chatContainer.innerHTML += `<div class="message ai-message"><p>${formattedResponse}</p></div>`;
-                        chatContainer.scrollTop = chatContainer.scrollHeight;
-                    }, 100);
-                } else {
-                    let formattedResponse = formatText(botResponse);
-                    chatContainer.innerHTML += `<div class="message ai-message"><p>${formattedResponse}</p></div>`;
-                }
+            const contentType = response.headers.get("Content-Type") || "";
+            if (!contentType.includes("text/event-stream")) {
+                // Errors before the stream starts come back as plain JSON
+                const data = await response.json();
+                loadingIndicator.style.display = "none";
+                appendError(data.error);
+                return;
             }
-            chatContainer.scrollTop = chatContainer.scrollHeight;
+
+            await renderStreamedResponse(response);
             saveSession();
         } catch (error) {
             loadingIndicator.style.display = "none";
@@ -351,6 +339,74 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     });
 
+    function renderPartial(element, text) {
+        // marked may still be loading for the first tokens; show plain text until it is ready
+        if (typeof marked === "undefined") {
+            element.textContent = text;
+        } else {
+            element.innerHTML = formatText(text);
+        }
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+    }
+
+    function appendError(text) {
+        // Appended as a node so a message still being streamed into the container stays attached
+        const message = document.createElement("div");
+        message.className = "message ai-message error";
+        message.textContent = `❌ ${text}`;
+        chatContainer.appendChild(message);
+        chatContainer.scrollTop = chatContainer.scrollHeight;
+    }
+
+    async function renderStreamedResponse(response) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let botResponse = "";
+        let messageBody = null;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            // SSE frames are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let eventName = "message";
+                let payload = "";
+                frame.split("\n").forEach((line) => {
+                    if (line.startsWith("event: ")) eventName = line.slice(7);
+                    else if (line.startsWith("data: ")) payload += line.slice(6);
+                });
+                const data = payload ? JSON.parse(payload) : {};
+
+                if (eventName === "token") {
+                    if (!messageBody) {
+                        loadingIndicator.style.display = "none";
+                        const message = document.createElement("div");
+                        message.className = "message ai-message";
+                        messageBody = document.createElement("p");
+                        message.appendChild(messageBody);
+                        chatContainer.appendChild(message);
+                    }
+                    botResponse += data.text;
+                    renderPartial(messageBody, botResponse);
+                } else if (eventName === "done") {
+                    loadingIndicator.style.display = "none";
+                    if (messageBody) renderPartial(messageBody, data.message.bot);
+                } else if (eventName === "error") {
+                    loadingIndicator.style.display = "none";
+                    appendError(data.error);
+                }
+            }
+        }
+        loadingIndicator.style.display = "none";
+    }
+
     userInput.addEventListener("keypress", function (event) {
         if (event.key === "Enter") submitBtn.click();
     });
@@ -0,0 +1,82 @@
+"""Shared fixtures. Run from the RAG_CHATBOT folder: ``python -m pytest tests``.
+
+The ``chat_app`` fixture imports flaskapp offline: HashingEmbeddings, the
+FakeLLM and mongomock stand in for the model, the LLM API and MongoDB.
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def chat_app(tmp_path_factory):
+    """The flaskapp module serving a small synthetic index for every domain"""
+    mongomock = pytest.importorskip("mongomock")
+    import pymongo
+
+    from benchmarks.corpus import generate_corpus
+    from domains import DOMAIN_INDEXES
+    from embedding_cache import FAKE_EMBEDDING_MODEL, HashingEmbeddings
+    from index_builder import build_index_incrementally
+    from ingest import load_file_chunks
+
+    workdir = tmp_path_factory.mktemp("chat-app")
+    index_dir = str(workdir / "index")
+    files = generate_corpus(str(workdir / "corpus"), n_docs=200, n_files=1)
+    build_index_incrementally(index_dir, files, load_file_chunks, HashingEmbeddings(), FAKE_EMBEDDING_MODEL)
+
+    for name, value in {
+        "LLM_PROVIDER": "fake",
+        "EMBEDDING_PROVIDER": "fake",
+        "FAKE_LLM_DELAY": "0",
+        "MONGO_ENSURE_INDEXES": "false",
+        "WARMUP_VECTORSTORES": "false",
+        "PRELOAD_MODELS": "false",
+        "CHAT_WRITE_BEHIND": "false",
+        "ANSWER_CACHE_ENABLED": "false",
+    }.items():
+        os.environ[name] = value
+    pymongo.MongoClient = mongomock.MongoClient
+    DOMAIN_INDEXES.update({domain: index_dir for domain in DOMAIN_INDEXES})
+
+    import flaskapp
+    return flaskapp
+
+
+@pytest.fixture
+def logged_in_client(chat_app):
+    client = chat_app.create_app().test_client()
+    with client.session_transaction() as session:
+        session["user"] = "tester@example.com"
+    return client
+
+
+@pytest.fixture
+def counting_llm():
+    """Factory for a FakeLLM that counts its calls and how many overlap"""
+    from llm import FakeLLM
+
+    class CountingLLM(FakeLLM):
+        def __init__(self, delay):
+            super().__init__(delay=delay)
+            self._lock = threading.Lock()
+            self.calls = 0
+            self.running = 0
+            self.peak = 0
+
+        def invoke(self, prompt):
+            with self._lock:
+                self.calls += 1
+                self.running += 1
+                self.peak = max(self.peak, self.running)
+            try:
+                return super().invoke(prompt)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    return CountingLLM
@@ -0,0 +1,19 @@
+from answer_cache import InMemoryAnswerStore, SemanticAnswerCache
+
+
+def test_follow_up_turns_skip_the_answer_cache(chat_app, logged_in_client, monkeypatch):
+    cache = SemanticAnswerCache(InMemoryAnswerStore())
+    monkeypatch.setattr(chat_app, "answer_cache", cache)
+    lookups = []
+    original = cache.lookup
+    monkeypatch.setattr(cache, "lookup", lambda *args, **kwargs: lookups.append(args) or original(*args, **kwargs))
+
+    body = {"domain": "law", "session_id": "follow-up", "query": "what is a tax audit"}
+    first = logged_in_client.post("/chat", json=body)
+    assert first.status_code == 200
+    assert len(lookups) == 1
+
+    # Same question again, now with the first turn as history: generated fresh, cache not consulted
+    second = logged_in_client.post("/chat", json=body)
+    assert second.status_code == 200
+    assert len(lookups) == 1
@@ -0,0 +1,37 @@
+from llm import LLMGateway
+
+
+def test_repeated_questions_in_a_batch_share_one_model_call(chat_app, logged_in_client, counting_llm, monkeypatch):
+    llm = counting_llm(delay=0.05)
+    gateway = LLMGateway(llm, max_concurrency=4, timeout=10)
+    monkeypatch.setattr(chat_app, "llm_gateway", gateway)
+    queries = ["loan interest rate", "exam grading", "loan interest rate", "loan interest rate"]
+
+    response = logged_in_client.post("/chat/batch", json={"domain": "finance", "queries": queries})
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result["query"] for result in results] == queries
+    assert all(result["answer"] for result in results)
+    assert results[0]["answer"] == results[2]["answer"] == results[3]["answer"]
+    assert llm.calls == 2
+    gateway.shutdown()
+
+
+def test_null_k_uses_the_default(logged_in_client):
+    response = logged_in_client.post("/chat/batch", json={"domain": "law", "queries": ["tax audit"], "k": None})
+    assert response.status_code == 200
+    assert response.get_json()["results"][0]["answer"]
+
+
+def test_embedding_errors_are_json(chat_app, logged_in_client, monkeypatch):
+    class BrokenEmbedder:
+        def embed_queries(self, queries):
+            raise RuntimeError("embedding service unavailable")
+
+    monkeypatch.setattr(chat_app, "get_embedder", lambda: BrokenEmbedder())
+
+    response = logged_in_client.post("/chat/batch", json={"domain": "law", "queries": ["tax audit"]})
+
+    assert response.status_code == 500
+    assert "embedding service unavailable" in response.get_json()["error"]
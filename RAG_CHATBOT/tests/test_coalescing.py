@@ -0,0 +1,40 @@
+import threading
+
+from llm import LLMGateway
+
+
+def test_identical_chats_share_one_model_call(chat_app, counting_llm, monkeypatch):
+    llm = counting_llm(delay=0.5)
+    gateway = LLMGateway(llm, max_concurrency=8, max_queue=32, timeout=10)
+    monkeypatch.setattr(chat_app, "llm_gateway", gateway)
+    app = chat_app.create_app()
+    # Same question up to case and trailing punctuation, from users in their own new sessions
+    queries = ["What is GST?", "what is gst", "WHAT IS GST ?", "what is  GST"] * 2
+    barrier = threading.Barrier(len(queries))
+    responses = [None] * len(queries)
+
+    def ask(i):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user"] = f"user{i}@example.com"
+        barrier.wait()
+        responses[i] = client.post("/chat", json={"domain": "law", "session_id": f"coalesce-{i}", "query": queries[i]})
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(len(queries))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * len(queries)
+    assert llm.calls == 1
+    answers = {response.get_json()["message"]["bot"] for response in responses}
+    assert len(answers) == 1
+    answer = answers.pop()
+    # Every user still gets the turn saved in their own session
+    for i, query in enumerate(queries):
+        exists, history = chat_app.chat_store.recent_messages(
+            {"user_email": f"user{i}@example.com", "domain": "law", "session_id": f"coalesce-{i}"}, 5
+        )
+        assert exists and history == [{"user": query, "bot": answer}]
+    gateway.shutdown()
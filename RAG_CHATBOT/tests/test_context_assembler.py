@@ -0,0 +1,30 @@
+from langchain_core.documents import Document
+
+from context_assembler import ContextAssembler
+
+QUOTED = "the goods and services tax is levied on every supply of goods and services within the country"
+LONG = ("Chapter two explains indirect taxation in detail. " + QUOTED
+        + ". Registration is required above the turnover threshold and returns are filed monthly.")
+
+
+def doc(text, source):
+    return Document(page_content=text, metadata={"source": source, "page": 1})
+
+
+def test_chunk_contained_in_a_better_chunk_is_dropped():
+    kept, duplicates = ContextAssembler().drop_near_duplicates([doc(LONG, "a.pdf"), doc(QUOTED, "b.pdf")])
+    assert [d.metadata["source"] for d in kept] == ["a.pdf"]
+    assert duplicates == 1
+
+
+def test_longer_chunk_after_a_contained_one_is_kept():
+    # It adds text the better chunk does not have
+    kept, duplicates = ContextAssembler().drop_near_duplicates([doc(QUOTED, "b.pdf"), doc(LONG, "a.pdf")])
+    assert len(kept) == 2
+    assert duplicates == 0
+
+
+def test_unrelated_chunks_are_kept():
+    other = "interest on a home loan is computed on the outstanding principal every month"
+    kept, _ = ContextAssembler().drop_near_duplicates([doc(LONG, "a.pdf"), doc(other, "c.pdf")])
+    assert len(kept) == 2
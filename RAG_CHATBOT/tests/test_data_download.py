@@ -0,0 +1,116 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from data_download import Downloader, filename_for
+
+FILES = {
+    "/a.pdf": b"%PDF-a " + bytes(range(256)) * 40,
+    "/copy-of-a.pdf": b"%PDF-a " + bytes(range(256)) * 40,
+    "/b.pdf": b"%PDF-b " + bytes(range(256)) * 30,
+}
+
+
+class PdfHandler(BaseHTTPRequestHandler):
+    """Serves FILES with ETags and single-range requests, recording the Range header of each GET"""
+
+    def _send(self, body_wanted):
+        body = FILES.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = f'"{self.path}"'
+        start = 0
+        requested = self.headers.get("Range")
+        self.server.ranges.append(requested)
+        if requested and self.headers.get("If-Range", etag) == etag:
+            start = int(requested.removeprefix("bytes=").split("-")[0])
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        if body_wanted:
+            self.wfile.write(body[start:])
+
+    def do_GET(self):
+        self._send(True)
+
+    def do_HEAD(self):
+        self._send(False)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), PdfHandler)
+    httpd.ranges = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def read(folder, entry):
+    with open(os.path.join(folder, entry["filename"]), "rb") as f:
+        return f.read()
+
+
+def test_interrupted_download_resumes_with_a_range_request(server, tmp_path):
+    httpd, base = server
+    url = f"{base}/a.pdf"
+    half = len(FILES["/a.pdf"]) // 2
+    with open(tmp_path / f"{filename_for(url)}.part", "wb") as f:
+        f.write(FILES["/a.pdf"][:half])
+    downloader = Downloader(str(tmp_path), workers=1, retries=0)
+    downloader.manifest["files"][url] = {"partial_validator": '"/a.pdf"'}
+
+    entry = downloader.download(url)
+
+    assert httpd.ranges == [f"bytes={half}-"]
+    assert downloader.summary["resumed"] == 1
+    assert read(str(tmp_path), entry) == FILES["/a.pdf"]
+
+
+def test_rerun_skips_files_in_the_manifest(server, tmp_path):
+    httpd, base = server
+    Downloader(str(tmp_path), workers=1).download(f"{base}/b.pdf")
+
+    again = Downloader(str(tmp_path), workers=1)
+    again.download(f"{base}/b.pdf")
+
+    assert again.summary["skipped"] == 1
+    assert len(httpd.ranges) == 1
+
+
+def test_same_content_under_two_urls_is_kept_once(server, tmp_path):
+    _, base = server
+    downloader = Downloader(str(tmp_path), workers=1)
+
+    first = downloader.download(f"{base}/a.pdf")
+    second = downloader.download(f"{base}/copy-of-a.pdf")
+
+    assert second["filename"] == first["filename"]
+    assert downloader.summary["duplicates"] == 1
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".pdf")) == [first["filename"]]
+
+
+def test_revalidation_keeps_the_copy_when_the_server_is_unreachable(server, tmp_path):
+    httpd, base = server
+    url = f"{base}/b.pdf"
+    Downloader(str(tmp_path), workers=1).download(url)
+    httpd.shutdown()
+    httpd.server_close()
+
+    offline = Downloader(str(tmp_path), workers=1, retries=0, timeout=(1, 1), revalidate=True)
+    entry = offline.download(url)
+
+    assert offline.summary["skipped"] == 1
+    assert read(str(tmp_path), entry) == FILES["/b.pdf"]
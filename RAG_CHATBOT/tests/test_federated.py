@@ -0,0 +1,62 @@
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+from federated import FederatedRetriever, FederatedSearchError, FederatedTimeoutError
+
+
+class FakeStore:
+    def __init__(self, name, search_delay=0.0, fail=False):
+        self.name = name
+        self.search_delay = search_delay
+        self.fail = fail
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4):
+        time.sleep(self.search_delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is broken")
+        return [(Document(page_content=f"{self.name} chunk"), 0.5)]
+
+
+def slow_loader(stores, load_delay):
+    def load(domain):
+        time.sleep(load_delay)
+        return stores[domain]
+    return load
+
+
+def test_cold_index_loads_do_not_count_against_the_search_deadline():
+    stores = {"health": FakeStore("health"), "law": FakeStore("law")}
+    retriever = FederatedRetriever(slow_loader(stores, 0.3), list(stores), timeout=0.1)
+
+    docs = retriever.similarity_search_by_vector([0.0], k=4)
+
+    assert sorted(doc.metadata["domain"] for doc in docs) == ["health", "law"]
+    assert retriever.stats()["timeouts"] == 0
+
+
+def test_no_domain_answering_raises_instead_of_returning_empty_context():
+    slow = {"health": FakeStore("health", search_delay=0.5)}
+    with pytest.raises(FederatedTimeoutError):
+        FederatedRetriever(slow.get, list(slow), timeout=0.05).similarity_search_by_vector([0.0])
+
+    broken = {"health": FakeStore("health", fail=True)}
+    with pytest.raises(FederatedSearchError):
+        FederatedRetriever(broken.get, list(broken), timeout=1.0).similarity_search_by_vector([0.0])
+
+    with pytest.raises(FederatedSearchError):
+        FederatedRetriever(lambda domain: None, ["health"]).similarity_search_by_vector([0.0])
+
+
+def test_chat_returns_504_when_no_domain_answers(chat_app, logged_in_client, monkeypatch):
+    slow = {"health": FakeStore("health", search_delay=0.5)}
+    monkeypatch.setattr(chat_app, "federated_retriever", FederatedRetriever(slow.get, list(slow), timeout=0.05))
+    invocations = []
+    monkeypatch.setattr(chat_app.llm_gateway, "invoke", lambda prompt: invocations.append(prompt) or "answer")
+
+    response = logged_in_client.post("/chat", json={"domain": "home", "session_id": "fed", "query": "anything"})
+
+    assert response.status_code == 504
+    assert "error" in response.get_json()
+    assert invocations == []
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.mark.parametrize("payload", [{"limit": "ten"}, {"before": "abc"}, {"limit": [5]}, {"before": True}])
+def test_bad_history_paging_is_a_400(logged_in_client, payload):
+    response = logged_in_client.post("/get_session_history", json={"domain": "law", "session_id": "s1", **payload})
+    assert response.status_code == 400
+    assert "must be an integer" in response.get_json()["error"]
+
+
+def test_numeric_strings_are_accepted(logged_in_client):
+    logged_in_client.post("/create_new_session", json={"domain": "law", "session_id": "paged"})
+    response = logged_in_client.post(
+        "/get_session_history", json={"domain": "law", "session_id": "paged", "limit": "5", "before": "0"}
+    )
+    assert response.status_code == 200
+    assert response.get_json() == {"history": [], "next_cursor": None}
+
+
+def test_bad_session_paging_is_a_400(logged_in_client):
+    response = logged_in_client.post("/get_all_sessions", json={"domain": "law", "offset": "first"})
+    assert response.status_code == 400
+
+
+def test_null_session_paging_uses_the_defaults(logged_in_client):
+    response = logged_in_client.post("/get_all_sessions", json={"domain": "law", "offset": None, "limit": None})
+    assert response.status_code == 200
+    assert "sessions" in response.get_json()
@@ -0,0 +1,72 @@
+import os
+
+from embedding_cache import FAKE_EMBEDDING_MODEL, HashingEmbeddings
+from index_builder import build_index_incrementally, entry_chunk_ids, load_manifest
+
+
+def load_lines(path):
+    """One chunk per non-empty line"""
+    with open(path, "r", encoding="utf-8") as f:
+        texts = [line.strip() for line in f if line.strip()]
+    return texts, [{"source": os.path.basename(path)} for _ in texts]
+
+
+def write(folder, name, lines, mtime):
+    path = os.path.join(folder, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def build(index_dir, files):
+    return build_index_incrementally(index_dir, files, load_lines, HashingEmbeddings(), FAKE_EMBEDDING_MODEL, batch_size=2)
+
+
+def load(index_dir):
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS.load_local(index_dir, HashingEmbeddings(), allow_dangerous_deserialization=True)
+
+
+def test_incremental_builds_add_update_remove_and_merge(tmp_path):
+    source, index_dir = str(tmp_path / "source"), str(tmp_path / "index")
+    os.makedirs(source)
+    files = {
+        "a.txt": write(source, "a.txt", ["alpha one", "alpha two"], 1_000),
+        "b.txt": write(source, "b.txt", ["bravo one", "bravo two", "bravo three"], 1_000),
+    }
+    summary = build(index_dir, files)
+    assert (summary["added"], summary["chunks_added"]) == (2, 5)
+
+    # b changes, a goes away, c is new: c merges into the loaded index, stale chunks of a and old b are deleted
+    files["b.txt"] = write(source, "b.txt", ["bravo rewritten"], 2_000)
+    del files["a.txt"]
+    files["c.txt"] = write(source, "c.txt", ["charlie one", "charlie two"], 2_000)
+    summary = build(index_dir, files)
+    assert (summary["added"], summary["updated"], summary["removed"]) == (1, 1, 1)
+
+    manifest = load_manifest(index_dir)
+    expected_ids = {chunk_id for rel_path, entry in manifest["files"].items() for chunk_id in entry_chunk_ids(rel_path, entry)}
+    vectorstore = load(index_dir)
+    assert set(vectorstore.index_to_docstore_id.values()) == expected_ids
+    assert vectorstore.index.ntotal == 3
+    texts = sorted(vectorstore.docstore.search(chunk_id).page_content for chunk_id in expected_ids)
+    assert texts == ["bravo rewritten", "charlie one", "charlie two"]
+
+    summary = build(index_dir, files)
+    assert summary["unchanged"] == 2 and summary["chunks_added"] == 0
+
+
+def test_touched_file_with_same_content_is_not_reembedded(tmp_path):
+    source, index_dir = str(tmp_path / "source"), str(tmp_path / "index")
+    os.makedirs(source)
+    files = {"a.txt": write(source, "a.txt", ["alpha one"], 1_000)}
+    build(index_dir, files)
+
+    os.utime(files["a.txt"], (5_000, 5_000))
+    summary = build(index_dir, files)
+
+    assert summary["unchanged"] == 1 and summary["chunks_added"] == 0
+    assert load_manifest(index_dir)["files"]["a.txt"]["mtime"] == 5_000
+    assert load(index_dir).index.ntotal == 1
@@ -0,0 +1,57 @@
+import pandas as pd
+
+import ingest
+
+
+def write_csv(path, columns, rows):
+    pd.DataFrame([[f"{column}-{row}" for column in columns] for row in range(rows)], columns=columns).to_csv(
+        path, index=False
+    )
+    return str(path)
+
+
+def test_wide_csv_packs_rows_under_a_shortened_header(tmp_path):
+    columns = [f"market_indicator_column_{i:03d}" for i in range(80)]
+    texts, metadatas = ingest.load_csv_chunks(write_csv(tmp_path / "wide.csv", columns, 20))
+
+    # 80 columns of ~30 chars make ~2.6k-char rows: a few pieces each, not one chunk per character
+    assert len(texts) < 20 * 5
+    header, full_header = ingest.chunk_header(columns)
+    assert len(header) <= ingest.MAX_CHUNK_HEADER
+    assert header.endswith("…")
+    for text, metadata in zip(texts, metadatas):
+        assert text.startswith(header + "\n")
+        assert len(text) - len(header) > 1
+        assert len(text) <= ingest.CHUNK_SIZE + 1
+        assert metadata["columns"] == full_header
+
+
+def test_single_column_csv(tmp_path):
+    texts, metadatas = ingest.load_csv_chunks(write_csv(tmp_path / "single.csv", ["note"], 300))
+
+    assert all(text.startswith("note\n") for text in texts)
+    assert "columns" not in metadatas[0]
+    assert metadatas[0]["rows"] == f"1-{texts[0].count(chr(10))}"
+    assert sum(text.count("\n") for text in texts) == 300
+    assert all(len(text) <= ingest.CHUNK_SIZE for text in texts)
+
+
+def greedy_groups(lengths, budget):
+    groups, group, used = [], 0, 0
+    for length in lengths:
+        if used and used + length > budget:
+            group += 1
+            used = 0
+        groups.append(group)
+        used += length
+    return groups
+
+
+def test_pack_rows_matches_greedy_packing():
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    for budget in (1, 50, 749, 5000):
+        lengths = rng.integers(1, 900, size=2000).tolist()
+        assert ingest._pack_rows(lengths, budget).tolist() == greedy_groups(lengths, budget)
+    assert ingest._pack_rows([], 100).tolist() == []
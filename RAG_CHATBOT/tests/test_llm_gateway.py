@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+from llm import FakeLLM, LLMBusyError, LLMGateway, LLMTimeoutError
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.005)
+
+
+def call_in_threads(gateway, count):
+    results, errors = [], []
+
+    def call(i):
+        try:
+            results.append(gateway.invoke(f"prompt {i}"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrency_is_capped(counting_llm):
+    llm = counting_llm(delay=0.05)
+    gateway = LLMGateway(llm, max_concurrency=3, max_queue=20, timeout=5)
+    threads, results, errors = call_in_threads(gateway, 12)
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(results) == 12
+    assert llm.peak == 3
+    assert gateway.stats()["completed"] == 12
+    gateway.shutdown()
+
+
+def test_full_queue_is_rejected():
+    gateway = LLMGateway(FakeLLM(delay=0.3), max_concurrency=1, max_queue=1, timeout=5)
+    threads, results, errors = call_in_threads(gateway, 1)
+    wait_for(lambda: gateway.stats()["in_flight"] == 1)
+    more, _, _ = call_in_threads(gateway, 1)
+    threads += more
+    wait_for(lambda: gateway.stats()["queue_depth"] == 1)
+
+    with pytest.raises(LLMBusyError):
+        gateway.invoke("one too many")
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert gateway.stats()["rejected"] == 1
+    gateway.shutdown()
+
+
+def test_slow_call_times_out():
+    gateway = LLMGateway(FakeLLM(delay=1.0), max_concurrency=1, max_queue=4, timeout=0.1)
+    start = time.perf_counter()
+    with pytest.raises(LLMTimeoutError):
+        gateway.invoke("slow")
+    assert time.perf_counter() - start < 0.5
+    assert gateway.stats()["timeouts"] == 1
+    gateway.shutdown()
+
+
+def test_chat_returns_503_when_the_gateway_is_full(chat_app, logged_in_client, monkeypatch):
+    monkeypatch.setattr(chat_app, "llm_gateway", LLMGateway(FakeLLM(delay=0), max_concurrency=1, max_queue=0))
+    response = logged_in_client.post("/chat", json={"domain": "law", "session_id": "busy", "query": "busy gateway"})
+    assert response.status_code == 503
+    assert "busy" in response.get_json()["error"]
+
+
+def test_chat_returns_504_when_the_model_is_too_slow(chat_app, logged_in_client, monkeypatch):
+    gateway = LLMGateway(FakeLLM(delay=1.0), max_concurrency=1, max_queue=4, timeout=0.1)
+    monkeypatch.setattr(chat_app, "llm_gateway", gateway)
+    response = logged_in_client.post("/chat", json={"domain": "law", "session_id": "slow", "query": "slow model"})
+    assert response.status_code == 504
+    gateway.shutdown()
@@ -0,0 +1,8 @@
+def test_multiprocess_metrics_keep_the_stats_gauges(chat_app, logged_in_client, monkeypatch, tmp_path):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    body = logged_in_client.get("/metrics").get_data(as_text=True)
+
+    gauges = [line for line in body.splitlines() if line.startswith("intellisphere_llm_")]
+    assert gauges
+    assert all('pid="' in line for line in gauges)
@@ -0,0 +1,52 @@
+import pytest
+
+from embedding_cache import HashingEmbeddings
+from mmap_docstore import PositionMap, convert_index, has_current_docstore, load_mmap_vectorstore
+
+
+@pytest.fixture
+def pickled_index(tmp_path):
+    from langchain_community.vectorstores import FAISS
+
+    texts = ["stamp duty on property", "income tax slabs", "ünïcode chunk ✓", ""]
+    metadatas = [{"source": f"doc{i}.pdf", "page": i} for i in range(len(texts))]
+    vectorstore = FAISS.from_texts(texts, HashingEmbeddings(), metadatas=metadatas, ids=[f"id-{i}" for i in range(len(texts))])
+    vectorstore.save_local(str(tmp_path))
+    return str(tmp_path), vectorstore
+
+
+def test_converted_docstore_round_trips_every_chunk(pickled_index):
+    index_dir, original = pickled_index
+
+    assert convert_index(index_dir) == 4
+    assert has_current_docstore(index_dir)
+    mapped = load_mmap_vectorstore(index_dir, HashingEmbeddings())
+
+    for position, docstore_id in original.index_to_docstore_id.items():
+        expected = original.docstore.search(docstore_id)
+        doc = mapped.docstore.search(mapped.index_to_docstore_id[position])
+        assert (doc.id, doc.page_content, doc.metadata) == (docstore_id, expected.page_content, expected.metadata)
+    assert mapped.similarity_search("income tax", k=1)[0].page_content == "income tax slabs"
+    assert "not found" in mapped.docstore.search(4)
+    mapped.docstore.close()
+
+
+def test_changed_pickle_makes_the_docstore_stale(pickled_index):
+    index_dir, original = pickled_index
+    convert_index(index_dir)
+
+    original.add_texts(["late addition"])
+    original.save_local(index_dir)
+
+    assert not has_current_docstore(index_dir)
+
+
+def test_position_map_behaves_like_the_id_dict():
+    positions = PositionMap(3)
+
+    assert dict(positions.items()) == {0: 0, 1: 1, 2: 2}
+    assert list(positions) == list(positions.keys()) == list(positions.values()) == [0, 1, 2]
+    assert len(positions) == 3
+    assert positions.get(3) is None and positions.get(-1, "missing") == "missing"
+    with pytest.raises(KeyError):
+        positions[3]
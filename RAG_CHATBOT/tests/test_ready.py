@@ -0,0 +1,20 @@
+def test_a_mismatched_domain_does_not_fail_readiness(chat_app, logged_in_client, monkeypatch):
+    monkeypatch.setitem(
+        chat_app.vectorstore_status, "health",
+        {"state": "mismatch", "load_seconds": None, "reason": "index was built with text-embedding-004"},
+    )
+    monkeypatch.setitem(chat_app.vectorstore_status, "law", {"state": "error", "load_seconds": None})
+
+    response = logged_in_client.get("/ready")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["ready"] is True
+    assert body["degraded"] == ["health", "law"]
+
+
+def test_a_loading_domain_fails_readiness(chat_app, logged_in_client, monkeypatch):
+    monkeypatch.setitem(chat_app.vectorstore_status, "finance", {"state": "loading", "load_seconds": None})
+
+    response = logged_in_client.get("/ready")
+    assert response.status_code == 503
+    assert response.get_json()["ready"] is False
@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+
+from vectorstore_cache import VectorStoreCache
+
+
+def make_index(folder, size):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "index.faiss"), "wb") as f:
+        f.write(b"x" * size)
+    return folder
+
+
+class CountingLoader:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, domain, index_path):
+        self.calls.append(domain)
+        time.sleep(self.delay)
+        return {"domain": domain, "load": len(self.calls)}
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_concurrent_misses_share_one_load(tmp_path):
+    loader = CountingLoader(delay=0.2)
+    cache = VectorStoreCache(loader)
+    index_path = make_index(str(tmp_path / "law"), 10)
+    barrier = threading.Barrier(8)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(cache.get("law", index_path))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == ["law"]
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_least_recently_used_index_is_evicted_over_budget(tmp_path):
+    evicted = []
+    cache = VectorStoreCache(CountingLoader(), max_bytes=250, on_evict=evicted.append)
+    paths = {domain: make_index(str(tmp_path / domain), 100) for domain in ("law", "health", "finance")}
+
+    cache.get("law", paths["law"])
+    cache.get("health", paths["health"])
+    cache.get("law", paths["law"])
+    cache.get("finance", paths["finance"])
+
+    assert evicted == ["health"]
+    assert cache.stats()["domains"] == ["law", "finance"]
+    assert cache.stats()["bytes"] == 200
+
+
+def test_changed_index_is_reloaded_once_it_is_stable(tmp_path):
+    loader = CountingLoader()
+    cache = VectorStoreCache(loader, check_interval=0)
+    index_path = make_index(str(tmp_path / "law"), 10)
+    first = cache.get("law", index_path)
+
+    # Still being written: each check sees a new signature, so nothing is reloaded
+    make_index(index_path, 20)
+    assert cache.get("law", index_path) is first
+    make_index(index_path, 30)
+    assert cache.get("law", index_path) is first
+    assert loader.calls == ["law"]
+
+    # Unchanged since the last check: reloaded in the background, old copy served meanwhile
+    assert cache.get("law", index_path) is first
+    wait_for(lambda: cache.stats()["reloads"] == 1)
+    assert cache.get("law", index_path) == {"domain": "law", "load": 2}
+    assert cache.stats()["bytes"] == 30
@@ -0,0 +1,61 @@
+import time
+
+import pytest
+from pymongo.errors import PyMongoError
+
+from chat_store import ChatHistoryStore, ChatStoreBusyError, WriteBehindChatStore
+
+mongomock = pytest.importorskip("mongomock")
+
+
+class BrokenCollection:
+    """A collection whose writes always fail, like a MongoDB that rejects them"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def bulk_write(self, *args, **kwargs):
+        raise PyMongoError("writes are failing")
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def broken_store(**kwargs):
+    db = mongomock.MongoClient()["test"]
+    store = ChatHistoryStore(BrokenCollection(db["chat_histories"]), db["chat_history_buckets"])
+    return WriteBehindChatStore(store, flush_interval=0.01, **kwargs)
+
+
+KEY = ChatHistoryStore.session_key("tester@example.com", "law", "s1")
+
+
+def test_failing_batch_is_dropped_after_max_attempts():
+    store = broken_store(max_attempts=3)
+    store.append_turn(KEY, {"user": "q", "bot": "a"})
+
+    assert store.flush(timeout=5)
+    stats = store.stats()
+    assert stats["failures"] == 3
+    assert stats["dropped_turns"] == 1
+    assert stats["queued_turns"] == 0
+    store.close()
+
+
+def test_group_durability_reports_a_dropped_turn():
+    store = broken_store(max_attempts=2, durability="group")
+    with pytest.raises(RuntimeError, match="not persisted"):
+        store.append_turn(KEY, {"user": "q", "bot": "a"})
+    store.close()
+
+
+def test_full_queue_rejects_after_enqueue_timeout():
+    store = broken_store(max_queue=1, max_attempts=1000, enqueue_timeout=0.1)
+    store.append_turn(KEY, {"user": "q1", "bot": "a1"})
+    start = time.monotonic()
+    with pytest.raises(ChatStoreBusyError):
+        store.append_turn(KEY, {"user": "q2", "bot": "a2"})
+    assert time.monotonic() - start < 1
+    assert store.stats()["rejected"] == 1
+    assert not store.flush(timeout=0.1)
+    store.close(timeout=0.1)
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+
+INDEX_FILES = ("index.faiss", "index.pkl", "manifest.json", "docstore.json")
+
+
+def index_signature(index_path):
+    """Fingerprint of the on-disk index files, used to notice a rebuilt index"""
+    signature = []
+    for name in INDEX_FILES:
+        try:
+            stat = os.stat(os.path.join(index_path, name))
+            signature.append((name, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            continue
+    return tuple(signature)
+
+
+def index_size_bytes(signature):
+    return sum(size for _, _, size in signature)
+
+
+class _Entry:
+    def __init__(self, vectorstore, index_path, signature):
+        self.vectorstore = vectorstore
+        self.index_path = index_path
+        self.signature = signature
+        self.size_bytes = index_size_bytes(signature)
+        self.checked_at = time.monotonic()
+        self.pending_signature = None
+
+
+class VectorStoreCache:
+    """Thread-safe LRU cache of loaded vectorstores with a memory budget and hot reload.
+
+    ``loader(domain, index_path)`` returns a vectorstore or None when no index exists.
+    Concurrent misses for the same domain share a single load. Every
+    ``check_interval`` seconds a hit compares the index files on disk with the
+    loaded copy; once a changed index has been stable for one interval it is
+    reloaded in the background and swapped in, while requests keep using the
+    old copy until the new one is ready.
+    """
+
+    def __init__(self, loader, max_bytes=0, check_interval=30.0, on_evict=None):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    def get(self, domain, index_path):
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is not None:
+                self._entries.move_to_end(domain)
+                self.hits += 1
+        if entry is not None:
+            self._maybe_reload(domain, entry)
+            return entry.vectorstore
+
+        with self._lock:
+            self.misses += 1
+        vectorstore, _ = self._flight.do(domain, lambda: self._load(domain, index_path))
+        return vectorstore
+
+    def _load(self, domain, index_path):
+        with self._lock:
+            entry = self._entries.get(domain)
+        if entry is not None:
+            return entry.vectorstore
+
+        signature = index_signature(index_path)
+        vectorstore = self.loader(domain, index_path)
+        if vectorstore is not None:
+            self._put(domain, _Entry(vectorstore, index_path, signature))
+        return vectorstore
+
+    def _put(self, domain, entry):
+        evicted = []
+        with self._lock:
+            self._entries[domain] = entry
+            self._entries.move_to_end(domain)
+            while self.max_bytes and len(self._entries) > 1 and self.total_bytes() > self.max_bytes:
+                cold_domain, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                evicted.append(cold_domain)
+        for cold_domain in evicted:
+            print(f"♻️ Evicted FAISS index for domain: {cold_domain}")
+            if self.on_evict:
+                self.on_evict(cold_domain)
+
+    def _maybe_reload(self, domain, entry):
+        now = time.monotonic()
+        if now - entry.checked_at < self.check_interval:
+            return
+        entry.checked_at = now
+        signature = index_signature(entry.index_path)
+        if not signature or signature == entry.signature:
+            entry.pending_signature = None
+            return
+        if signature != entry.pending_signature:
+            # Wait one more interval so we never load a half-written index
+            entry.pending_signature = signature
+            return
+        threading.Thread(
+            target=self._reload, args=(domain, entry.index_path), name=f"reload-{domain}", daemon=True
+        ).start()
+
+    def _reload(self, domain, index_path):
+        def load():
+            signature = index_signature(index_path)
+            vectorstore = self.loader(domain, index_path)
+            if vectorstore is None:
+                return None
+            with self._lock:
+                still_cached = domain in self._entries
+            if still_cached:
+                self._put(domain, _Entry(vectorstore, index_path, signature))
+                self.reloads += 1
+                print(f"🔄 Reloaded FAISS index for domain: {domain}")
+            return vectorstore
+
+        try:
+            self._flight.do(("reload", domain), load)
+        except Exception as e:
+            print(f"❌ Error reloading vectorstore for domain {domain}: {str(e)}")
+
+    def total_bytes(self):
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def evict(self, domain):
+        with self._lock:
+            return self._entries.pop(domain, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, domain):
+        with self._lock:
+            return domain in self._entries
+
+    def stats(self):
+        with self._lock:
+            return {
+                "domains": list(self._entries),
+                "bytes": self.total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+            }